@@ -1,8 +1,11 @@
-from flask import Flask, render_template_string, request, redirect, url_for
+from flask import Flask, render_template_string, request, redirect, url_for, jsonify, Response, stream_with_context, session
 from datetime import datetime
 import sys
 import os
+import json
+import hmac
 import traceback
+import uuid
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -18,27 +21,59 @@ except Exception as e:
     run_post_discharge_workflow = None
 
 try:
-    from logs import log_conversation # type: ignore
+    from logs import log_conversation, logger as conversation_logger # type: ignore
 except:
     log_conversation = None
+    conversation_logger = None
+
+from jobs import JobQueue, QueueFull # type: ignore
+from result_store import create_result_store # type: ignore
+from progress import report_progress # type: ignore
+from tracing import tracer, instrument_llm # type: ignore
+
+try:
+    # Same module instance crew.py records into (it puts agent_folder on sys.path)
+    from router import route_metrics # type: ignore
+    from agent_folder.crew import answer_cache # type: ignore
+except Exception:
+    route_metrics = None
+    answer_cache = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src', 'agent_folder'))
+from answer_schema import ClinicalAnswer, render_answer # type: ignore
+from patient_data.lookup import normalize_name # type: ignore
 
 # Import LLM for response formatting
 try:
-    from langchain_google_genai import ChatGoogleGenerativeAI
-    formatting_llm = ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash-exp",
-        temperature=0.3,
-    )
+    from stub_llm import StubChatModel, use_stub_llm # type: ignore
+    if use_stub_llm():
+        formatting_llm = StubChatModel()
+    else:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        formatting_llm = ChatGoogleGenerativeAI(
+            model="gemini-2.0-flash-exp",
+            temperature=0.3,
+        )
+    instrument_llm(formatting_llm, "formatting_llm")
     print("Response formatting LLM initialized")
 except Exception as e:
     print(f"Could not initialize formatting LLM: {e}")
     formatting_llm = None
 
 app = Flask(__name__)
-app.secret_key = "supersecretkey"
+# Signs the session cookie that scopes /patients/<name>/history; set it so
+# sessions survive restarts
+app.secret_key = os.getenv("FLASK_SECRET_KEY") or os.urandom(32)
+
+# Bearer token for staff access to any patient's history (unset: disabled)
+HISTORY_API_TOKEN = os.getenv("HISTORY_API_TOKEN", "")
+
+# Store results (bounded in-process LRU by default, SQLite when RESULT_STORE=sqlite)
+responses = create_result_store()
 
-# Store results
-responses = {}
+# Stream the final answer token-by-token to the progress page (set to 0 to
+# always wait for the complete formatted answer)
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "1") == "1"
 
 def extract_message_from_json(raw_text: str) -> str:
     """Extract actual messages from JSON log structure"""
@@ -94,9 +129,41 @@ def extract_message_from_json(raw_text: str) -> str:
     return raw_text
 
 
-def format_agent_response(raw_response: str, patient_name: str, user_query: str) -> str:
+def stream_llm_response(llm, prompt: str, on_token):
+    """
+    Stream the model's answer to on_token and return the full text, or None
+    if streaming failed (caller then invokes normally). A cut-off answer is
+    never returned: if tokens were already sent, the client is told to
+    discard them.
+    """
+    parts = []
+    try:
+        for chunk in llm.stream(prompt):
+            text = chunk.content if hasattr(chunk, 'content') else str(chunk)
+            if text:
+                parts.append(text)
+                on_token(text)
+    except Exception as e:
+        print(f"Streaming failed: {e}")
+        if parts:
+            report_progress("stream_reset", "The partial answer was discarded; generating it again.")
+        return None
+    return "".join(parts).strip()
+
+
+def stream_text(text: str, on_token, words_per_chunk: int = 8):
+    """Send an already complete answer to on_token in small chunks."""
+    words = text.split(" ")
+    for i in range(0, len(words), words_per_chunk):
+        chunk = " ".join(words[i:i + words_per_chunk])
+        on_token(chunk if i + words_per_chunk >= len(words) else chunk + " ")
+
+
+def format_agent_response(raw_response: str, patient_name: str, user_query: str, on_token=None) -> str:
     """
     Use LLM to clean up and format the agent's raw output.
+    If on_token is given, the formatted answer is streamed to it chunk by
+    chunk as the model generates it (falls back to a single invoke call).
     """
     # First, try to extract meaningful content from JSON
     extracted = extract_message_from_json(raw_response)
@@ -127,13 +194,18 @@ Your task:
 
 Write the cleaned response now (NO preamble, NO explanations, just the direct answer to the patient):"""
 
-        result = formatting_llm.invoke(formatting_prompt)
+        formatted = None
+        if on_token and STREAM_RESPONSES:
+            formatted = stream_llm_response(formatting_llm, formatting_prompt, on_token)
         
-        # Extract content
-        if hasattr(result, 'content'):
-            formatted = result.content.strip()
-        else:
-            formatted = str(result).strip()
+        if formatted is None:
+            result = formatting_llm.invoke(formatting_prompt)
+            
+            # Extract content
+            if hasattr(result, 'content'):
+                formatted = result.content.strip()
+            else:
+                formatted = str(result).strip()
         
         # Remove any remaining JSON markers
         formatted = formatted.replace('```json', '').replace('```', '').strip()
@@ -336,6 +408,16 @@ HTML_TEMPLATE = """
             color: #d32f2f;
         }
         
+        .progress-list {
+            list-style: none;
+            margin-top: 15px;
+            font-size: 14px;
+            color: #999;
+        }
+        .progress-list li.done {
+            color: #4caf50;
+        }
+        
         .btn-new {
             margin-top: 20px;
             background: #666;
@@ -352,7 +434,19 @@ HTML_TEMPLATE = """
     </div>
 
     <div class="container">
-        {% if not result %}
+        {% if job %}
+            <div class="loading active" id="jobDiv" data-job-id="{{ job.id }}"
+                 data-events-url="{{ url_for('job_events', job_id=job.id) }}"
+                 data-status-url="{{ url_for('job_status', job_id=job.id) }}">
+                <div class="spinner"></div>
+                <p>Your question for <strong>{{ job.patient_name }}</strong> is being processed...</p>
+                <ul class="progress-list" id="progressList"></ul>
+            </div>
+            <div class="response-box" id="liveResponse" style="display: none;">
+                <h3>Medical Guidance:</h3>
+                <div id="liveText"></div>
+            </div>
+        {% elif not result %}
             <p class="info-text">
                 Enter your full name and ask any question about your post-discharge care. 
                 Our AI will retrieve your medical records and provide personalized guidance.
@@ -441,6 +535,83 @@ HTML_TEMPLATE = """
                 document.getElementById('loadingDiv').classList.add('active');
             });
         }
+
+        // Follow a queued job: SSE progress stream, with status polling as fallback
+        const jobDiv = document.getElementById('jobDiv');
+        if (jobDiv) {
+            const labels = {
+                queued: 'Waiting for a free assistant',
+                started: 'Started',
+                record_fetched: 'Discharge record fetched',
+                retrieval_done: 'Medical references retrieved',
+                drafting: 'Drafting your answer',
+                formatting: 'Formatting the response',
+                done: 'Done'
+            };
+            const list = document.getElementById('progressList');
+            const shown = new Set();
+            const show = function(stage) {
+                if (shown.has(stage) || !labels[stage]) return;
+                shown.add(stage);
+                const item = document.createElement('li');
+                item.className = 'done';
+                item.textContent = '\u2713 ' + labels[stage];
+                list.appendChild(item);
+            };
+            const finish = function(data) {
+                if (data.result_url) {
+                    window.location = data.result_url;
+                } else {
+                    const item = document.createElement('li');
+                    item.textContent = 'Something went wrong: ' + (data.error || data.detail || 'unknown error');
+                    list.appendChild(item);
+                }
+            };
+            const poll = function() {
+                fetch(jobDiv.dataset.statusUrl).then(function(r) {
+                    // A 404 means another server process owns the job (or it expired)
+                    if (!r.ok) throw new Error(r.status === 404 ? 'this request is no longer being tracked' : 'HTTP ' + r.status);
+                    return r.json();
+                }).then(function(data) {
+                    (data.events || []).forEach(e => show(e.stage));
+                    if (data.partial_response) {
+                        liveBox.style.display = 'block';
+                        liveText.textContent = data.partial_response;
+                    }
+                    if (data.status === 'done' || data.status === 'failed') {
+                        finish(data);
+                    } else {
+                        setTimeout(poll, 2000);
+                    }
+                }).catch(err => finish({error: err.message}));
+            };
+            const liveBox = document.getElementById('liveResponse');
+            const liveText = document.getElementById('liveText');
+            const appendToken = function(text) {
+                liveBox.style.display = 'block';
+                liveText.textContent += text;
+            };
+            const resetTokens = function(detail) {
+                liveText.textContent = '';
+                liveBox.style.display = 'none';
+                const item = document.createElement('li');
+                item.textContent = detail;
+                list.appendChild(item);
+            };
+            if (window.EventSource) {
+                const source = new EventSource(jobDiv.dataset.eventsUrl);
+                source.addEventListener('token', e => appendToken(JSON.parse(e.data).detail));
+                source.addEventListener('stream_reset', e => resetTokens(JSON.parse(e.data).detail));
+                Object.keys(labels).forEach(function(stage) {
+                    source.addEventListener(stage, e => show(stage));
+                });
+                source.addEventListener('done', function(e) { source.close(); finish(JSON.parse(e.data)); });
+                source.addEventListener('failed', function(e) { source.close(); finish(JSON.parse(e.data)); });
+                source.onerror = function() { source.close(); poll(); };
+            } else {
+                poll();
+            }
+        }
     </script>
 </body>
 </html>
@@ -451,20 +622,32 @@ def home():
     result = request.args.get('result_id')
     result_data = None
     
-    if result and result in responses:
-        result_data = responses[result]
+    if result:
+        result_data = responses.get(result)
+    
+    job = None
+    job_id = request.args.get('job_id')
+    if job_id and not result_data:
+        job = job_queue.get(job_id)
     
-    return render_template_string(HTML_TEMPLATE, result=result_data)
+    return render_template_string(HTML_TEMPLATE, result=result_data, job=job)
 
 
-@app.route("/process", methods=["POST"])
-def process():
-    patient_name = request.form.get("patient_name", "").strip()
-    user_query = request.form.get("user_query", "").strip()
-    
-    if not patient_name or not user_query:
-        return redirect(url_for("home"))
-    
+def send_token(text: str):
+    """Forward a chunk of the answer to whoever follows this request's progress."""
+    report_progress("token", text)
+
+
+def handle_query(patient_name: str, user_query: str) -> str:
+    """Run the workflow for one question, store the result and return its id."""
+    # One trace per request; LLM, tool and workflow spans nest under it
+    with tracer.span("process", kind="request", patient_name=patient_name) as span:
+        result_id = _answer_query(patient_name, user_query)
+        span.setdefault("attributes", {})["result_id"] = result_id
+    return result_id
+
+
+def _answer_query(patient_name: str, user_query: str) -> str:
     result_data = {
         "patient_name": patient_name,
         "query": user_query,
@@ -495,13 +678,28 @@ def process():
                 print(raw_response[:500])
                 print(f"====================\n")
                 
-                if raw_response and len(raw_response.strip()) > 0:
-                    # Format the response using LLM
+                if crew_result.get("mode") == "fast_path":
+                    # Answered from the discharge record; already patient-ready
+                    if STREAM_RESPONSES:
+                        stream_text(raw_response, send_token)
+                    result_data["success"] = True
+                    result_data["response"] = raw_response
+                elif crew_result.get("structured"):
+                    # Schema-validated answer: render locally, no formatting LLM call
+                    rendered = render_answer(ClinicalAnswer(**crew_result["structured"]))
+                    if STREAM_RESPONSES:
+                        stream_text(rendered, send_token)
+                    result_data["success"] = True
+                    result_data["response"] = rendered
+                elif raw_response and len(raw_response.strip()) > 0:
+                    # Unstructured output: fall back to LLM formatting
                     print("Formatting response with LLM...")
+                    report_progress("formatting")
                     formatted_response = format_agent_response(
                         raw_response=raw_response,
                         patient_name=patient_name,
-                        user_query=user_query
+                        user_query=user_query,
+                        on_token=send_token
                     )
                     
                     result_data["success"] = True
@@ -514,6 +712,8 @@ def process():
                 
                 if "No record found" in error_msg or "not found" in error_msg.lower():
                     result_data["error"] = f"Patient record not found for '{patient_name}'. Please verify your complete name matches your discharge documents."
+                    if crew_result.get("candidates"):
+                        result_data["error"] += f" Did you mean: {', '.join(crew_result['candidates'])}?"
                 else:
                     result_data["error"] = f"Processing failed: {error_msg}"
                 
@@ -524,9 +724,9 @@ def process():
     else:
         result_data["error"] = "AI system not available. Please check configuration."
     
-    # Store result
-    result_id = f"{patient_name.replace(' ', '_')}_{int(datetime.now().timestamp())}"
-    responses[result_id] = result_data
+    # Store result under an unguessable id that is unique per answer
+    result_id = uuid.uuid4().hex
+    responses.set(result_id, result_data)
     
     # Log conversation
     if log_conversation and result_data["success"]:
@@ -536,15 +736,142 @@ def process():
                 {"role": "assistant", "content": result_data["response"], "timestamp": result_data["timestamp"]}
             ]
             log_conversation(patient_name, chat_log)
-            print(f"Conversation logged for {patient_name}")
+            print(f"Conversation queued for logging: {patient_name}")
         except Exception as e:
             print(f"Failed to log conversation: {e}")
     
-    return redirect(url_for("home", result_id=result_id))
+    return result_id
+
+
+# Jobs live in this process's memory: run the app as a single process
+# (threads are fine), or /jobs/<id> answers 404 on the other processes.
+job_queue = JobQueue(
+    handle_query,
+    max_workers=int(os.getenv("JOB_WORKERS", "4")),
+    max_pending=int(os.getenv("JOB_MAX_PENDING", "32")),
+)
+
+
+@app.route("/process", methods=["POST"])
+def process():
+    patient_name = request.form.get("patient_name", "").strip()
+    user_query = request.form.get("user_query", "").strip()
+    wants_json = request.accept_mimetypes.best == "application/json"
+    
+    if not patient_name or not user_query:
+        if wants_json:
+            return jsonify({"error": "patient_name and user_query are required"}), 400
+        return redirect(url_for("home"))
+    
+    # This browser may now read this patient's conversation history
+    session["patient_key"] = normalize_name(patient_name)
+
+    # Queue the work and return immediately; the page follows progress via SSE
+    try:
+        job = job_queue.submit(patient_name, user_query)
+    except QueueFull:
+        if wants_json:
+            return jsonify({"error": "Server busy, please retry shortly"}), 503
+        result_id = uuid.uuid4().hex
+        responses.set(result_id, {
+            "patient_name": patient_name,
+            "query": user_query,
+            "timestamp": datetime.now().strftime("%B %d, %Y at %I:%M %p"),
+            "success": False,
+            "response": "",
+            "error": "We are handling many requests right now. Please try again in a minute."
+        })
+        return redirect(url_for("home", result_id=result_id))
+    
+    if wants_json:
+        return jsonify({
+            "job_id": job.id,
+            "status_url": url_for("job_status", job_id=job.id),
+            "events_url": url_for("job_events", job_id=job.id)
+        }), 202
+    return redirect(url_for("home", job_id=job.id))
+
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    data = job.to_dict()
+    if job.result_id:
+        data["result_url"] = url_for("home", result_id=job.result_id)
+    return jsonify(data)
+
+
+@app.route("/jobs/<job_id>/events")
+def job_events(job_id):
+    """Server-sent events: one event per progress stage until the job finishes."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+
+    @stream_with_context
+    def stream():
+        sent = 0
+        while True:
+            events = job.wait_for_events(sent, timeout=15)
+            if not events:
+                if job.finished:
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            for event in events:
+                payload = dict(event)
+                if event["stage"] == "done":
+                    payload["result_url"] = url_for("home", result_id=job.result_id)
+                yield f"event: {event['stage']}\ndata: {json.dumps(payload)}\n\n"
+            sent += len(events)
+            if job.finished and sent >= len(job.events):
+                return
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def can_read_history(patient_name: str) -> bool:
+    """The session's own patient, or staff with the HISTORY_API_TOKEN bearer token."""
+    if HISTORY_API_TOKEN and hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {HISTORY_API_TOKEN}"
+    ):
+        return True
+    return session.get("patient_key") == normalize_name(patient_name)
+
+
+@app.route("/patients/<patient_name>/history")
+def patient_history(patient_name):
+    """Paginated conversation history, newest first (?limit=20&before=<next_before>)."""
+    from conversation_store import get_store # type: ignore
+    if not can_read_history(patient_name):
+        return jsonify({"error": "Not allowed to read this patient's history"}), 403
+    limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+    before = request.args.get("before", type=int)
+    return jsonify(get_store().history(patient_name, limit=limit, before=before))
+
+
+@app.route("/metrics")
+def metrics():
+    """Latency per route (fast path by intent vs. full crew) and per traced span."""
+    return jsonify({
+        "routes": route_metrics.summary() if route_metrics else {},
+        "spans": tracer.summary(),
+        "jobs": job_queue.stats(),
+        "result_store": responses.stats(),
+        "semantic_cache": answer_cache.stats() if answer_cache else {},
+        "conversation_log": conversation_logger.stats() if conversation_logger else {}
+    })
 
 
 @app.route("/reset", methods=["POST"])
 def reset():
+    session.pop("patient_key", None)
     return redirect(url_for("home"))
 
 
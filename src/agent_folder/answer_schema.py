@@ -0,0 +1,104 @@
+import json
+import re
+from typing import List, Optional
+
+from pydantic import BaseModel, ValidationError
+
+# Structured output of the clinical task. The agent is asked to reply with a
+# JSON object in this shape, which is validated and rendered locally instead
+# of being sent through a second "clean this up" LLM call.
+
+
+class Citation(BaseModel):
+    source: str
+    page: Optional[int] = None
+    section: Optional[str] = None
+    url: Optional[str] = None
+
+
+class ClinicalAnswer(BaseModel):
+    answer: str
+    citations: List[Citation] = []
+    warnings: List[str] = []
+    follow_up: List[str] = []
+
+
+OUTPUT_FORMAT_INSTRUCTIONS = """
+Reply with ONLY a JSON object (no markdown, no commentary) in exactly this shape:
+{
+  "answer": "Direct, concise answer to the patient in plain sentences, addressed to them.",
+  "citations": [{"source": "reference file or site name", "page": 12, "section": "section heading", "url": null}],
+  "warnings": ["Warning signs or safety notes that need attention"],
+  "follow_up": ["Recommended follow-up steps or things to do to feel better"]
+}
+"""
+
+# CrewAI fills task descriptions and expected outputs with
+# str.format(**inputs), so literal braces in task text must be doubled.
+TASK_OUTPUT_FORMAT_INSTRUCTIONS = OUTPUT_FORMAT_INSTRUCTIONS.replace("{", "{{").replace("}", "}}")
+
+CLINICIAN_REMINDER = "Please contact your care team or a licensed clinician for definitive medical advice."
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+
+
+def parse_clinical_answer(raw_text: str):
+    """
+    Parse and validate the agent's output. Returns a ClinicalAnswer, or None
+    if the output is not a valid structured answer.
+    """
+    if not raw_text:
+        return None
+    cleaned = _FENCE.sub("", raw_text.strip()).strip()
+
+    # Tolerate prose around the object by taking the outermost braces
+    start, end = cleaned.find("{"), cleaned.rfind("}")
+    if start == -1 or end <= start:
+        return None
+    try:
+        data = json.loads(cleaned[start:end + 1])
+        if not isinstance(data, dict):
+            return None
+        answer = ClinicalAnswer(**data)
+    except (json.JSONDecodeError, ValidationError, TypeError):
+        return None
+    return answer if answer.answer.strip() else None
+
+
+def format_citation(citation: Citation) -> str:
+    parts = [citation.source]
+    if citation.page:
+        parts.append(f"p. {citation.page}")
+    if citation.section:
+        parts.append(f"section \"{citation.section}\"")
+    if citation.url:
+        parts.append(citation.url)
+    return ", ".join(parts)
+
+
+def render_answer(answer: ClinicalAnswer) -> str:
+    """Plain-text rendering for the patient page."""
+    sections = [answer.answer.strip()]
+    if answer.warnings:
+        sections.append("Important warnings:\n" + "\n".join(f"- {w}" for w in answer.warnings))
+    if answer.follow_up:
+        sections.append("Next steps:\n" + "\n".join(f"- {step}" for step in answer.follow_up))
+    if answer.citations:
+        sections.append("Sources:\n" + "\n".join(
+            f"[{i}] {format_citation(c)}" for i, c in enumerate(answer.citations, start=1)
+        ))
+    sections.append(CLINICIAN_REMINDER)
+    return "\n\n".join(sections)
+
+
+def answer_to_dict(answer: ClinicalAnswer) -> dict:
+    # pydantic v2 renamed dict() to model_dump()
+    if hasattr(answer, "model_dump"):
+        return answer.model_dump()
+    return answer.dict()
+
+
+__all__ = [
+    "Citation", "ClinicalAnswer", "OUTPUT_FORMAT_INSTRUCTIONS", "TASK_OUTPUT_FORMAT_INSTRUCTIONS",
+    "parse_clinical_answer", "render_answer", "answer_to_dict",
+]
@@ -3,6 +3,8 @@ import os
 import sys
 from dotenv import load_dotenv
 import json
+import threading
+import time
 
 load_dotenv()
 
@@ -10,13 +12,40 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
-from agents import receptionist_agent, clinical_agent
+from agents import clinical_agent, make_clinical_agent, make_receptionist_agent
 from tasks import (
-    fetch_patient_discharge_task,
-    followup_questionnaire_task,  # Re-added for initialization
-    clinical_query_task, 
-    rag_indexing_task
+    followup_questionnaire_task,
+    make_clinical_session_task,
+    make_initialization_tasks,
 )
+from router import try_fast_path, route_metrics
+from session import SessionManager
+from tools import database_tool
+from progress import report_progress
+from tracing import tracer
+from answer_schema import parse_clinical_answer, answer_to_dict
+from semantic_cache import SemanticAnswerCache
+import hashlib
+
+# Agents are built once per worker thread and reused: they keep per-run
+# state (memory, executor), so concurrent jobs must not share them. Tasks and
+# the Crew are rebuilt for every kickoff, because kickoff formats each task's
+# description and expected output in place with that run's inputs.
+_worker = threading.local()
+
+# Discharge summary and follow-up assessment cached per patient session
+session_manager = SessionManager(fetch_record=database_tool._run)
+
+# Changing the clinical prompts invalidates semantically cached answers
+_session_task = make_clinical_session_task()
+PROMPT_VERSION = hashlib.sha256("\n".join([
+    _session_task.description,
+    _session_task.expected_output,
+    clinical_agent.goal,
+    clinical_agent.backstory,
+]).encode("utf-8")).hexdigest()[:16]
+
+answer_cache = SemanticAnswerCache(prompt_version=PROMPT_VERSION)
 
 def extract_crew_output(result):
     """Extract meaningful text from CrewAI result"""
@@ -49,30 +78,59 @@ def extract_crew_output(result):
         return str(result)
 
 
-def create_initialization_crew():
+def get_worker_agents():
+    """This worker's (receptionist, clinical) agents, built on first use."""
+    if getattr(_worker, "agents", None) is None:
+        _worker.agents = (make_receptionist_agent(), make_clinical_agent())
+    return _worker.agents
+
+
+def create_initialization_crew(receptionist=None, clinical=None):
     """Crew for initial setup: fetch records, ask follow-up questions, index RAG"""
+    receptionist = receptionist or make_receptionist_agent()
+    clinical = clinical or make_clinical_agent()
     crew = Crew(
-        agents=[receptionist_agent, clinical_agent],
-        tasks=[
-            fetch_patient_discharge_task,
-            followup_questionnaire_task,  # Asks questions ONCE
-            rag_indexing_task
-        ],
+        agents=[receptionist, clinical],
+        # Fetch, follow-up questionnaire (asks questions ONCE), RAG indexing
+        tasks=make_initialization_tasks(receptionist, clinical),
         verbose=False
     )
     return crew
 
 
-def create_chat_crew():
+def create_chat_crew(clinical=None):
     """Crew for answering user questions using RAG"""
+    clinical = clinical or make_clinical_agent()
     crew = Crew(
-        agents=[clinical_agent],
-        tasks=[clinical_query_task],
+        agents=[clinical],
+        tasks=[make_clinical_session_task(clinical)],
         verbose=False  # Disable verbose
     )
     return crew
 
 
+def get_chat_crew():
+    """A chat crew with fresh tasks around this worker's clinical agent."""
+    _, clinical = get_worker_agents()
+    return create_chat_crew(clinical)
+
+
+def get_initialization_crew():
+    """An initialization crew with fresh tasks around this worker's agents."""
+    return create_initialization_crew(*get_worker_agents())
+
+
+def extract_followup_assessment(result):
+    """Output of followup_questionnaire_task from an initialization run."""
+    for task_output in getattr(result, "tasks_output", None) or []:
+        if getattr(task_output, "description", "") == followup_questionnaire_task.description:
+            return str(getattr(task_output, "raw", "")).strip()
+    outputs = getattr(result, "tasks_output", None) or []
+    if len(outputs) >= 2:
+        return str(getattr(outputs[1], "raw", "")).strip()
+    return ""
+
+
 def run_post_discharge_workflow(patient_name: str, user_query: str = None):
     """
     Main workflow function:
@@ -86,33 +144,87 @@ def run_post_discharge_workflow(patient_name: str, user_query: str = None):
         if user_query:
             # ===== CHAT MODE - Answer user's question =====
             print(f"\n💬 Answering: {user_query[:50]}...")
-            
-            crew = create_chat_crew()
-            result = crew.kickoff(inputs={
-                "patient_name": patient_name,
-                "user_query": user_query
-            })
+
+            # Plain record lookups are answered locally, without any LLM call
+            with tracer.span("fast_path", kind="workflow"):
+                fast_answer = try_fast_path(patient_name, user_query)
+            if fast_answer:
+                intent, answer = fast_answer
+                print(f"⚡ Fast path: {intent}")
+                report_progress("record_fetched", "answered from discharge summary")
+                return {
+                    "success": True,
+                    "message": answer,
+                    "patient_name": patient_name,
+                    "mode": "fast_path",
+                    "route": intent
+                }
+
+            start = time.perf_counter()
+            # Discharge summary is fetched once per session, without the receptionist
+            with tracer.span("session", kind="workflow"):
+                session, error = session_manager.get_or_create(patient_name)
+            if session is None:
+                # Unknown name: pass on the database tool's close matches
+                return {
+                    "success": False,
+                    "error": error.get("message", "No record found"),
+                    "candidates": [c["patient_name"] for c in error.get("candidates", [])],
+                }
+            report_progress("record_fetched")
+
+            # Same question (semantically) already answered for this diagnosis
+            diagnosis = session.record.get("primary_diagnosis", "")
+            with tracer.span("semantic_cache", kind="workflow"):
+                cached = answer_cache.lookup(diagnosis, user_query, session.record)
+            if cached:
+                print("🗂️ Semantic cache hit")
+                route_metrics.record("semantic_cache", time.perf_counter() - start)
+                return {
+                    "success": True,
+                    "message": cached.get("answer", ""),
+                    "structured": cached,
+                    "patient_name": patient_name,
+                    "mode": "semantic_cache",
+                    "route": "semantic_cache"
+                }
+
+            crew = get_chat_crew()
+            report_progress("drafting")
+            with tracer.span("crew_kickoff", kind="workflow", mode="chat"):
+                result = crew.kickoff(inputs=session.crew_inputs(user_query))
+            session.questions_answered += 1
             
             response_text = extract_crew_output(result)
+            route_metrics.record("crew", time.perf_counter() - start)
+            # Validated structured answer, if the agent followed the schema
+            structured = parse_clinical_answer(response_text)
+            if structured:
+                answer_cache.store(diagnosis, user_query, answer_to_dict(structured), session.record)
             
             return {
                 "success": True,
                 "message": response_text,
+                "structured": answer_to_dict(structured) if structured else None,
                 "patient_name": patient_name,
-                "mode": "chat"
+                "mode": "chat",
+                "route": "crew"
             }
         
         else:
             # ===== INITIALIZATION MODE - Load patient + Ask follow-up questions =====
             print(f"\n🚀 Initializing session for: {patient_name}")
             
-            crew = create_initialization_crew()
-            result = crew.kickoff(inputs={
-                "patient_name": patient_name,
-                "context": f"Patient {patient_name} just started consultation. Fetch discharge summary and conduct initial follow-up assessment."
-            })
+            crew = get_initialization_crew()
+            with tracer.span("crew_kickoff", kind="workflow", mode="initialization"):
+                result = crew.kickoff(inputs={
+                    "patient_name": patient_name,
+                    "context": f"Patient {patient_name} just started consultation. Fetch discharge summary and conduct initial follow-up assessment."
+                })
             
             response_text = extract_crew_output(result)
+            # Later chat questions reuse this instead of re-running the receptionist
+            session_manager.store_assessment(patient_name, extract_followup_assessment(result))
             
             # The response should contain the follow-up questions and assessment
             return {
@@ -0,0 +1,205 @@
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+from patient_data.lookup import get_lookup
+
+# Local intent router in front of the crew. Questions that are nothing more
+# than a request for one discharge_summaries field ("What medications should
+# I take?", "When is my follow-up?") are served straight from the patient
+# record. Everything else, including questions that merely mention a field
+# ("Is my medication causing this rash?"), goes to the crew.
+
+# "what are my", "when is the", "list my", "tell me about my", ...
+_REQUEST = (
+    r"(?:(?:what|when|where|which) (?:is|are|was|were)|list|show(?: me)?|tell me(?: about)?"
+    r"|give me|remind me (?:of|about)|what about) (?:my|the)(?: current| prescribed| discharge| new)? "
+)
+_TAIL = r"(?: again| for me| from (?:my|the) discharge(?: summary)?)?"
+
+
+def _field_request(nouns: str) -> str:
+    return _REQUEST + nouns + _TAIL
+
+
+_MEDICATION_NOUNS = r"(?:medications?|medicines?|meds|prescriptions?|pills|tablets|drugs)"
+
+FIELD_INTENTS = {
+    "medications": {
+        "requests": [
+            _field_request(_MEDICATION_NOUNS),
+            _MEDICATION_NOUNS.join((r"what ", r" (?:should|do|must) i (?:take|be taking)")),
+            _MEDICATION_NOUNS.join((r"what ", r" (?:am i on|was i prescribed|were prescribed)")),
+            r"what (?:am i|should i be) taking",
+        ],
+        "fields": ["medications"],
+        "title": "Your prescribed medications",
+    },
+    "follow_up": {
+        "requests": [
+            _field_request(r"(?:next )?(?:follow[- ]?ups?(?: appointments?| visits?| plan)?|appointments?"
+                           r"|visits?|check[- ]?ups?)"),
+            r"when (?:do|should) i (?:see|go back to) (?:my|the) doctor(?: again)?",
+            r"when (?:do|should) i (?:follow[- ]?up|come back)",
+            r"who (?:do|should) i follow[- ]?up with",
+        ],
+        "fields": ["follow_up"],
+        "title": "Your follow-up plan",
+    },
+    "dietary_restrictions": {
+        "requests": [
+            _field_request(r"(?:diet|dietary restrictions|diet restrictions|food restrictions)"),
+            r"what diet (?:should|do|must) i (?:need to )?(?:follow|be on|keep)",
+            r"what (?:foods? )?should i eat",
+        ],
+        "fields": ["dietary_restrictions"],
+        "title": "Your dietary restrictions",
+    },
+    "warning_signs": {
+        "requests": [
+            _field_request(r"(?:warning signs|red flags)"),
+            r"what (?:warning signs |signs |symptoms )?should i (?:watch|look) (?:out )?for",
+            r"when should i (?:call|go to|return to) (?:my doctor|the doctor|the hospital|the er|the emergency room)",
+        ],
+        "fields": ["warning_signs"],
+        "title": "Warning signs that need urgent attention",
+    },
+    "discharge_instructions": {
+        "requests": [
+            _field_request(r"(?:instructions|care plan)"),
+            r"what should i do(?: at home| now| after (?:my )?discharge)?",
+        ],
+        "fields": ["discharge_instructions"],
+        "title": "Your discharge instructions",
+    },
+    "diagnosis": {
+        "requests": [
+            _field_request(r"(?:diagnosis|condition)"),
+            r"why was i (?:admitted|in (?:the )?hospital)",
+            r"what (?:condition|illness) do i have",
+            r"what (?:was|am|were) i diagnosed with",
+        ],
+        "fields": ["primary_diagnosis", "discharge_date"],
+        "title": "Your diagnosis",
+    },
+}
+
+# Greetings and politeness around the request itself
+_POLITE_PREFIX = re.compile(r"^(?:(?:hi|hello|hey|ok|okay|so|please|can you|could you|would you)[,]?\s+)+")
+_POLITE_SUFFIX = re.compile(r"(?:\s+please)+$")
+
+_compiled_intents = {
+    intent: [re.compile(pattern) for pattern in spec["requests"]]
+    for intent, spec in FIELD_INTENTS.items()
+}
+
+CLINICIAN_REMINDER = (
+    "This information comes directly from your discharge summary. If anything is unclear, "
+    "or you notice new or worsening symptoms, please contact your care team."
+)
+
+
+def normalize_question(user_query: str) -> str:
+    """Lowercase, single-spaced, without end punctuation or polite wrapping."""
+    text = " ".join(user_query.lower().split()).strip(" ?!.")
+    text = _POLITE_SUFFIX.sub("", _POLITE_PREFIX.sub("", text))
+    return text.strip(" ,?!.")
+
+
+def classify(user_query: str):
+    """
+    Return the field intent when user_query is a direct request for one
+    discharge field, or None when the question should go to the crew.
+    """
+    text = normalize_question(user_query)
+    matched = [
+        intent for intent, patterns in _compiled_intents.items()
+        if any(pattern.fullmatch(text) for pattern in patterns)
+    ]
+    return matched[0] if len(matched) == 1 else None
+
+
+def render_answer(intent: str, record: dict) -> str:
+    spec = FIELD_INTENTS[intent]
+    name = record.get("patient_name", "")
+    lines = [f"Hello {name}. {spec['title']}:", ""]
+
+    if intent == "medications":
+        medications = record.get("medications") or []
+        if medications:
+            lines.extend(
+                "- " + " ".join(part for part in (m["drug"], m["dose"], m["frequency"]) if part)
+                for m in medications
+            )
+        else:
+            lines.append("No medications are listed in your discharge summary.")
+    elif intent == "diagnosis":
+        lines.append(
+            f"You were discharged on {record.get('discharge_date')} with a primary diagnosis of "
+            f"{record.get('primary_diagnosis')}."
+        )
+    else:
+        value = record.get(spec["fields"][0])
+        lines.append(value if value else "Nothing is recorded for this in your discharge summary.")
+
+    lines.extend(["", CLINICIAN_REMINDER])
+    return "\n".join(lines)
+
+
+class RouteMetrics:
+    """Per-route request counts and latency (mean, p50, p95 over recent requests)."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._counts = defaultdict(int)
+
+    def record(self, route: str, seconds: float):
+        with self._lock:
+            self._samples[route].append(seconds)
+            self._counts[route] += 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            summary = {}
+            for route, samples in self._samples.items():
+                ordered = sorted(samples)
+                summary[route] = {
+                    "count": self._counts[route],
+                    "mean_ms": round(1000 * sum(ordered) / len(ordered), 2),
+                    "p50_ms": round(1000 * ordered[len(ordered) // 2], 2),
+                    "p95_ms": round(1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+                }
+            return summary
+
+
+route_metrics = RouteMetrics()
+
+
+def try_fast_path(patient_name: str, user_query: str):
+    """
+    Answer user_query from the patient's discharge record if it is a plain
+    field lookup. Returns (intent, answer) or None to fall back to the crew.
+    """
+    intent = classify(user_query)
+    if intent is None:
+        return None
+
+    start = time.perf_counter()
+    record = get_lookup().fetch_by_name(patient_name)
+    if record is None:
+        # Let the crew handle unknown names (fuzzy matching, clarification)
+        return None
+
+    answer = render_answer(intent, record)
+    route_metrics.record(f"fast_path:{intent}", time.perf_counter() - start)
+    return intent, answer
+
+
+__all__ = ["FIELD_INTENTS", "normalize_question", "classify", "render_answer", "try_fast_path", "route_metrics", "RouteMetrics"]
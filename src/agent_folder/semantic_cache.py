@@ -0,0 +1,220 @@
+import copy
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+from rag import runtime
+
+# Semantic answer cache: patients who share a primary diagnosis tend to ask
+# the same questions in different words. Final structured answers are stored
+# per diagnosis with the query embedding, and served again when a new query
+# is similar enough. Patient-specific values are replaced by placeholders on
+# store and filled in for the asking patient on a hit.
+
+SIMILARITY_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+MAX_ENTRIES_PER_DIAGNOSIS = int(os.getenv("SEMANTIC_CACHE_MAX_PER_DIAGNOSIS", "200"))
+ENTRY_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", str(7 * 86400)))
+
+# Record fields that may be quoted verbatim in an answer and can be
+# substituted for another patient with the same diagnosis.
+SUBSTITUTABLE_FIELDS = [
+    "patient_name", "discharge_date", "follow_up", "dietary_restrictions",
+    "warning_signs", "discharge_instructions",
+]
+# Shorter first names ("Al", "Jo") are too easily confused with other words
+# to be swapped for another patient's; answers that use them are not cached.
+MIN_FIRST_NAME_LENGTH = 3
+
+
+def _normalize_diagnosis(diagnosis: str) -> str:
+    return " ".join((diagnosis or "").lower().split())
+
+
+def _medication_names(record: dict) -> list:
+    """
+    Drug names (first word of each parsed medication) from a session record,
+    i.e. the database tool's output, whose "medications" entries are
+    {"drug", "dose", "frequency"} dicts.
+    """
+    names = []
+    for medication in record.get("medications") or []:
+        words = re.findall(r"[A-Za-z][A-Za-z-]{3,}", medication["drug"])
+        if words:
+            names.append(words[0])
+    return names
+
+
+def _placeholders(record: dict) -> list:
+    """(value, placeholder) pairs, longest values first so they win overlaps."""
+    pairs = []
+    for field in SUBSTITUTABLE_FIELDS:
+        value = (record.get(field) or "").strip()
+        # Short generic values ("None") would match ordinary words
+        if len(value) >= 6 and value.lower() not in ("none", "n/a"):
+            pairs.append((value, "{{" + field + "}}"))
+    first_name = (record.get("patient_name") or "").split(" ")[0]
+    if len(first_name) >= MIN_FIRST_NAME_LENGTH:
+        pairs.append((first_name, "{{first_name}}"))
+    return sorted(pairs, key=lambda pair: len(pair[0]), reverse=True)
+
+
+def _whole_words(value: str):
+    """Pattern for value as a whole word or phrase, never inside another word."""
+    return re.compile(r"(?<!\w)" + re.escape(value) + r"(?!\w)", re.IGNORECASE)
+
+
+def _map_strings(value, fn):
+    if isinstance(value, str):
+        return fn(value)
+    if isinstance(value, list):
+        return [_map_strings(item, fn) for item in value]
+    if isinstance(value, dict):
+        return {key: _map_strings(item, fn) for key, item in value.items()}
+    return value
+
+
+def templatize(answer: dict, record: dict):
+    """
+    Replace the patient's own values in answer with placeholders. Returns None
+    if the answer refers to the patient's medications, which differ between
+    patients with the same diagnosis and so make it unsafe to share.
+    """
+    text = str(answer).lower()
+    if any(name.lower() in text for name in _medication_names(record)):
+        return None
+    first_name = (record.get("patient_name") or "").split(" ")[0]
+    if first_name and len(first_name) < MIN_FIRST_NAME_LENGTH and _whole_words(first_name).search(str(answer)):
+        return None
+
+    patterns = [(_whole_words(value), placeholder) for value, placeholder in _placeholders(record)]
+
+    def replace(s):
+        for pattern, placeholder in patterns:
+            # A function, so backslashes in the placeholder are not expanded
+            s = pattern.sub(lambda match: placeholder, s)
+        return s
+
+    return _map_strings(copy.deepcopy(answer), replace)
+
+
+def personalize(template: dict, record: dict):
+    """
+    Fill the placeholders with this patient's values. Returns None if the
+    template needs a value this patient's record does not have.
+    """
+    values = {field: (record.get(field) or "").strip() for field in SUBSTITUTABLE_FIELDS}
+    values["first_name"] = (record.get("patient_name") or "").split(" ")[0]
+    missing = []
+
+    def substitute(match):
+        value = values.get(match.group(1), "")
+        if not value or value.lower() in ("none", "n/a"):
+            missing.append(match.group(1))
+        return value
+
+    def fill(s):
+        return re.sub(r"\{\{(\w+)\}\}", substitute, s)
+
+    answer = _map_strings(template, fill)
+    return None if missing else answer
+
+
+class SemanticAnswerCache:
+    def __init__(self, prompt_version: str, threshold: float = SIMILARITY_THRESHOLD,
+                 max_per_diagnosis: int = MAX_ENTRIES_PER_DIAGNOSIS, ttl: float = ENTRY_TTL):
+        self.prompt_version = prompt_version
+        self.threshold = threshold
+        self.max_per_diagnosis = max_per_diagnosis
+        self.ttl = ttl
+        self._entries = defaultdict(list)  # diagnosis -> [(unit vector, template, stored_at)]
+        self._version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _current_version(self):
+        return (self.prompt_version, runtime.collection_version())
+
+    def _check_version(self):
+        # Cached answers are stale once the RAG corpus or the prompts change
+        version = self._current_version()
+        if version != self._version:
+            if self._version is not None:
+                print("Semantic answer cache invalidated (corpus or prompts changed)")
+            self._entries.clear()
+            self._version = version
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def _unit(vector):
+        import numpy as np
+        vector = np.asarray(vector, dtype="float32")
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, diagnosis: str, user_query: str, record: dict):
+        """Personalized cached answer for a similar question, or None."""
+        import numpy as np
+        key = _normalize_diagnosis(diagnosis)
+        query_vector = self._unit(runtime.embed_query(user_query))
+
+        with self._lock:
+            self._check_version()
+            now = time.time()
+            entries = [e for e in self._entries.get(key, []) if now - e[2] < self.ttl]
+            self._entries[key] = entries
+            if not entries:
+                self.misses += 1
+                return None
+            scores = np.stack([e[0] for e in entries]) @ query_vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            template = entries[best][1]
+
+        answer = personalize(template, record)
+        with self._lock:
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return answer
+
+    def store(self, diagnosis: str, user_query: str, answer: dict, record: dict) -> bool:
+        template = templatize(answer, record)
+        if template is None:
+            return False
+        key = _normalize_diagnosis(diagnosis)
+        vector = self._unit(runtime.embed_query(user_query))
+        with self._lock:
+            self._check_version()
+            entries = self._entries[key]
+            entries.append((vector, template, time.time()))
+            if len(entries) > self.max_per_diagnosis:
+                del entries[0]
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "diagnoses": len(self._entries),
+                "entries": sum(len(e) for e in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "threshold": self.threshold,
+            }
+
+
+__all__ = ["SemanticAnswerCache", "templatize", "personalize"]
@@ -0,0 +1,114 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Local stand-in for SerpAPI's search.json endpoint. Returns deterministic
+# organic results so WebSearchTool can be exercised without network access:
+#   WebSearchTool(api_key="stub", endpoint=server.url)
+
+
+class _SerpStubHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so clients that pool connections reuse them
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        query = params.get("q", [""])[0]
+        self.server.request_count += 1
+        self.server.clients.add(self.client_address)
+
+        if self.server.delay:
+            threading.Event().wait(self.server.delay)
+
+        status = self.server.status
+        if status != 200:
+            body = {"error": f"Stub failure with HTTP {status}."}
+        elif not query:
+            status = 400
+            body = {"error": "Missing query `q` parameter."}
+        else:
+            num = int(params.get("num", ["5"])[0])
+            body = {
+                "search_parameters": {"q": query},
+                "organic_results": [
+                    {
+                        "position": i + 1,
+                        "title": f"Result {i + 1} for {query}",
+                        "link": f"https://example.org/{i + 1}",
+                        "snippet": f"Stub snippet {i + 1} about {query}.",
+                    }
+                    for i in range(num)
+                ],
+            }
+
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SerpStubServer:
+    """
+    Runs the stand-in server on a background thread (port 0 = any free port).
+    status, if not 200, is returned for every request with an error body.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0, status: int = 200):
+        self._server = ThreadingHTTPServer((host, port), _SerpStubHandler)
+        self._server.request_count = 0
+        self._server.clients = set()
+        self._server.delay = delay
+        self._server.status = status
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/search.json"
+
+    @property
+    def request_count(self) -> int:
+        return self._server.request_count
+
+    @property
+    def connection_count(self) -> int:
+        """Distinct client connections (address and port) seen so far."""
+        return len(self._server.clients)
+
+    @property
+    def status(self) -> int:
+        return self._server.status
+
+    @status.setter
+    def status(self, value: int):
+        self._server.status = value
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+__all__ = ["SerpStubServer"]
+
+
+if __name__ == "__main__":
+    with SerpStubServer(port=8765) as server:
+        print(f"SerpAPI stand-in listening at {server.url}")
+        threading.Event().wait()
@@ -0,0 +1,85 @@
+import json
+import os
+import sys
+import threading
+import time
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+from rag.cache import TTLCache
+from patient_data.lookup import normalize_name
+
+# Per-patient session context, so follow-up questions reuse the discharge
+# summary and initial assessment instead of re-running the receptionist.
+
+SESSION_TTL = float(os.getenv("PATIENT_SESSION_TTL", "3600"))
+MAX_SESSIONS = int(os.getenv("PATIENT_SESSION_MAX", "1000"))
+
+
+class PatientSession:
+    def __init__(self, record: dict):
+        self.patient_name = record["patient_name"]
+        self.record = record
+        self.discharge_summary = json.dumps(record, indent=2)
+        self.followup_assessment = ""
+        self.created_at = time.time()
+        self.questions_answered = 0
+
+    def crew_inputs(self, user_query: str) -> dict:
+        return {
+            "patient_name": self.patient_name,
+            "user_query": user_query,
+            "discharge_summary": self.discharge_summary,
+            "followup_assessment": self.followup_assessment or "No follow-up assessment recorded yet.",
+        }
+
+
+class SessionManager:
+    def __init__(self, fetch_record, ttl: float = SESSION_TTL, max_sessions: int = MAX_SESSIONS):
+        """
+        fetch_record(patient_name) -> JSON string in the database tool's
+        {"status": ..., "data"/"message": ...} format.
+        """
+        self._fetch_record = fetch_record
+        self._sessions = TTLCache(max_size=max_sessions, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, patient_name: str):
+        return self._sessions.get(normalize_name(patient_name))
+
+    def get_or_create(self, patient_name: str):
+        """
+        Return (session, None) for a known patient, fetching the discharge
+        summary once per session, or (None, error response) if no record
+        exists; the response is the database tool's error dict, with ranked
+        "candidates" when the name is close to known patients.
+        """
+        key = normalize_name(patient_name)
+        session = self._sessions.get(key)
+        if session is not None:
+            return session, None
+
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                return session, None
+
+            response = json.loads(self._fetch_record(patient_name))
+            if response.get("status") != "success":
+                return None, response
+
+            session = PatientSession(response["data"])
+            self._sessions.set(key, session)
+            return session, None
+
+    def store_assessment(self, patient_name: str, assessment: str):
+        session, _ = self.get_or_create(patient_name)
+        if session is not None:
+            session.followup_assessment = assessment
+
+    def stats(self) -> dict:
+        return self._sessions.stats()
+
+
+__all__ = ["PatientSession", "SessionManager"]
@@ -1,38 +1,46 @@
 from crewai import Task
 from agents import receptionist_agent, clinical_agent
+from answer_schema import TASK_OUTPUT_FORMAT_INSTRUCTIONS
 
 
 # RECEPTIONIST AGENT TASKS
 
-fetch_patient_discharge_task = Task(
-    name="Fetch Patient Discharge Report",
-    description=(
-        "You will take the patient name as input, Fetch the discharge report for patient: {patient_name}."
-        "The input 'patient_name' is passed from inputs, do not use {patient_name} literally. "
-        "Retrieve the discharge summary for the patient whose name is provided as input. Use the variable 'patient_name' passed from inputs, do not use {patient_name} literally."
-        "and ensure the correct patient data is fetched. Handle cases where multiple or no matches are found."
-    ),
-    agent=receptionist_agent,
-    expected_output=(
-        "A structured discharge summary containing patient name, admission details, diagnosis, treatment, "
-        "and discharge recommendations retrieved from the database."
-    ),
-)
+def make_fetch_patient_discharge_task(agent=receptionist_agent):
+    return Task(
+        name="Fetch Patient Discharge Report",
+        description=(
+            "You will take the patient name as input, Fetch the discharge report for patient: {patient_name}."
+            "The input 'patient_name' is passed from inputs, do not use {patient_name} literally. "
+            "Retrieve the discharge summary for the patient whose name is provided as input. Use the variable 'patient_name' passed from inputs, do not use {patient_name} literally."
+            "and ensure the correct patient data is fetched. Handle cases where multiple or no matches are found."
+        ),
+        agent=agent,
+        expected_output=(
+            "A structured discharge summary containing patient name, admission details, diagnosis, treatment, "
+            "and discharge recommendations retrieved from the database."
+        ),
+    )
 
-followup_questionnaire_task = Task(
-    name="Post-Discharge Follow-up Questionnaire",
-    description=(
-        "Using the discharge report, ask relevant follow-up questions related to the patient's current health status, "
-        "medication adherence, vital signs, and any complications post-discharge. Route clinical queries to the "
-        "Clinical AI Agent as needed."
-    ),
-    agent=receptionist_agent,
-    expected_output=(
-        "A structured record of follow-up responses and observations, with any medical questions redirected "
-        "to the Clinical AI Agent for detailed guidance."
-    ),
-    context=[fetch_patient_discharge_task]
-)
+
+def make_followup_questionnaire_task(fetch_task, agent=receptionist_agent):
+    return Task(
+        name="Post-Discharge Follow-up Questionnaire",
+        description=(
+            "Using the discharge report, ask relevant follow-up questions related to the patient's current health status, "
+            "medication adherence, vital signs, and any complications post-discharge. Route clinical queries to the "
+            "Clinical AI Agent as needed."
+        ),
+        agent=agent,
+        expected_output=(
+            "A structured record of follow-up responses and observations, with any medical questions redirected "
+            "to the Clinical AI Agent for detailed guidance."
+        ),
+        context=[fetch_task]
+    )
+
+
+fetch_patient_discharge_task = make_fetch_patient_discharge_task()
+followup_questionnaire_task = make_followup_questionnaire_task(fetch_patient_discharge_task)
 
 
 # CLINICAL AI AGENT TASKS
@@ -42,8 +50,12 @@ clinical_query_task = Task(
     description="""
     Answer the patient's question: {user_query}
     "To give a summary of all all the data you retieved while searching the results, in a consise manner."
-    Use the indexed discharge report and medical records for patient {patient_name}.
+    Use the indexed discharge report and medical records for patient {patient_name}: call the
+    RAG Knowledge Base Tool with patient_name set to the patient's name, and it returns the relevant
+    sections of their discharge summary together with the reference material.
     Provide accurate, personalized medical guidance based on their specific condition.
+    Every RAG Knowledge Base Tool excerpt comes with its citation (source, page, section); cite those directly
+    instead of searching again for sources.
     Do not return {user_query} and {patient_name} literally; use the actual inputs provided.
     """,
     expected_output="""
@@ -58,18 +70,63 @@ clinical_query_task = Task(
     context=[followup_questionnaire_task, fetch_patient_discharge_task]
 )
 
-rag_indexing_task = Task(
-    name="Build RAG Knowledge Base",
-    description=(
-        "Process nephrology reference materials, chunk them, generate embeddings, and store them in a vector database. "
-        "Implement semantic retrieval for clinical question answering. Include citations in all responses."
-    ),
-    agent=clinical_agent,
-    expected_output=(
-        "A functional RAG pipeline capable of retrieving and generating nephrology-based answers."
-    ),
-    context=[clinical_query_task]
-)
+
+def make_clinical_session_task(agent=clinical_agent):
+    """
+    Clinical question task for a warm chat crew. The discharge summary and
+    follow-up assessment come in through kickoff inputs from the patient's
+    session instead of via upstream receptionist tasks, so each worker can
+    keep its own copy and reuse it across requests.
+    """
+    return Task(
+        name="Clinical Question Answering (session)",
+        description="""
+        Answer the patient's question: {user_query}
+        The patient is {patient_name}. Their discharge summary, already retrieved from the hospital database:
+        {discharge_summary}
+
+        Follow-up assessment from the start of this session:
+        {followup_assessment}
+
+        Do not fetch the discharge summary again. Provide accurate, personalized medical guidance based on
+        their specific condition, using the RAG Knowledge Base Tool for clinical background.
+        Every RAG Knowledge Base Tool excerpt comes with its citation (source, page, section); cite those directly
+        instead of searching again for sources.
+        """,
+        expected_output=(
+            "A structured answer, brief and quick, with the direct response, safety warnings, "
+            "follow-up recommendations and citations.\n" + TASK_OUTPUT_FORMAT_INSTRUCTIONS
+        ),
+        agent=agent,
+    )
+
+
+def make_rag_indexing_task(agent=clinical_agent):
+    return Task(
+        name="Build RAG Knowledge Base",
+        description=(
+            "Process nephrology reference materials, chunk them, generate embeddings, and store them in a vector database. "
+            "Implement semantic retrieval for clinical question answering. Include citations in all responses."
+        ),
+        agent=agent,
+        expected_output=(
+            "A functional RAG pipeline capable of retrieving and generating nephrology-based answers."
+        ),
+        context=[clinical_query_task]
+    )
+
+
+rag_indexing_task = make_rag_indexing_task()
+
+
+def make_initialization_tasks(receptionist, clinical) -> list:
+    """Fetch, follow-up questionnaire and RAG tasks for one worker's own agents."""
+    fetch_task = make_fetch_patient_discharge_task(receptionist)
+    return [
+        fetch_task,
+        make_followup_questionnaire_task(fetch_task, receptionist),
+        make_rag_indexing_task(clinical),
+    ]
 
 logging_task = Task(
     name="System Interaction Logging",
@@ -88,6 +145,11 @@ __all__ = [
     "fetch_patient_discharge_task",
     "followup_questionnaire_task",
     "clinical_query_task",
+    "make_clinical_session_task",
     "rag_indexing_task",
+    "make_fetch_patient_discharge_task",
+    "make_followup_questionnaire_task",
+    "make_rag_indexing_task",
+    "make_initialization_tasks",
     "logging_task",
 ]
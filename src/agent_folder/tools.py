@@ -4,12 +4,17 @@ from crewai_tools import BaseTool
 parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.append(parent_dir)
 from patient_data.database_tool import PatientDatabaseRetrievalTool
+from rag.runtime import similarity_search, similarity_search_batch
+from rag.hybrid import hybrid_search, hybrid_search_batch
+from rag.retrieve import format_results
+from rag.patient_context import patient_context_search
+from progress import report_progress
+from tracing import traced_tool
 import requests
 import json
-from pydantic import Field
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.vectorstores import Chroma
-from pydantic import PrivateAttr
+import re
+from pydantic import Field, PrivateAttr
+from web_search_support import SearchError, SerpClient
 
 class WebSearchTool(BaseTool):
     name: str = "Web Search Tool"
@@ -19,21 +24,36 @@ class WebSearchTool(BaseTool):
     )
 
     api_key: str = Field(default=None, description="SerpAPI key for authentication")
-    endpoint: str = Field(default="https://serpapi.com/search.json")
+    endpoint: str = Field(default=os.getenv("SERPAPI_ENDPOINT", "https://serpapi.com/search.json"))
+    timeout: float = Field(default=10.0, description="HTTP timeout in seconds")
+    requests_per_second: float = Field(default=1.0, description="Sustained SerpAPI request rate")
+    burst: int = Field(default=5, description="Requests allowed in a burst")
+    cache_ttl: float = Field(default=86400, description="Seconds a cached search result stays valid")
+    cache_path: str = Field(
+        default=os.getenv(
+            "WEB_SEARCH_CACHE_PATH",
+            os.path.join(os.path.dirname(__file__), "web_search_cache.db")
+        )
+    )
+
+    _client: SerpClient = PrivateAttr()
+
+    def __init__(self, **data):
+        super().__init__(**data)
+        self._client = SerpClient(
+            self.api_key, self.endpoint, timeout=self.timeout,
+            requests_per_second=self.requests_per_second, burst=self.burst,
+            cache_path=self.cache_path, cache_ttl=self.cache_ttl,
+        )
 
+    @traced_tool
     def _run(self, query: str) -> str:
         """Perform a web search using SerpAPI."""
         try:
-            params = {
-                "q": query,
-                "api_key": self.api_key,
-                "num": 5
-            }
-            response = requests.get(self.endpoint, params=params)
-            data = response.json()
-
-            if "error" in data:
-                return json.dumps({"status": "error", "message": data["error"]}, indent=2)
+            try:
+                data, cached = self._client.search(query, num=5)
+            except SearchError as e:
+                return json.dumps({"status": "error", "message": str(e)}, indent=2)
 
             results = [
                 {
@@ -49,6 +69,7 @@ class WebSearchTool(BaseTool):
                 "source": "web_search",
                 "query": query,
                 "results": results,
+                "cached": cached,
                 "note": "Information fetched via SerpAPI web search"
             }, indent=2)
 
@@ -66,29 +87,76 @@ class KnowledgeBaseTool(BaseTool):
     name: str = "RAG Knowledge Base Tool"
     description: str = (
         "Queries the hospital's document knowledge base (vector DB) "
-        "to retrieve relevant information for patient care and clinical queries."
+        "to retrieve relevant information for patient care and clinical queries. "
+        "Each excerpt is preceded by its citation (source file, page and section). "
+        "Pass patient_name to also get the matching sections of that patient's discharge summary."
     )
 
     top_k: int = Field(default=3, description="Number of top results to return")
+    retrieval_mode: str = Field(
+        default=os.getenv("RAG_RETRIEVAL_MODE", "hybrid"),
+        description="'hybrid' (BM25 + vector, RRF) or 'vector' (similarity only)"
+    )
+
+    patient_k: int = Field(default=2, description="Discharge summary sections to include per query")
+
+    @traced_tool
+    def _run(self, query_text: str, patient_name: str = None) -> str:
+        # Shared, lazily loaded model/Chroma handle with cached embeddings and results
+        if self.retrieval_mode == "hybrid":
+            results = hybrid_search(query_text, k=self.top_k)
+        else:
+            results = similarity_search(query_text, k=self.top_k)
+        if patient_name:
+            # Patient-specific sections first, from the per-patient store
+            results = patient_context_search(patient_name, query_text, k=self.patient_k) + list(results)
+        report_progress("retrieval_done", query_text)
+        output = format_results(results, max_chars=500)
+        return output  
+
 
-    _db: Chroma = PrivateAttr()  # <-- declare as private
+class BatchKnowledgeBaseTool(BaseTool):
+    name: str = "RAG Knowledge Base Batch Tool"
+    description: str = (
+        "Runs several knowledge base lookups in one call (e.g. the diagnosis, each medication "
+        "and a dietary restriction). Pass the questions separated by newlines or semicolons. "
+        "Returns cited excerpts grouped per question, without repeating the same excerpt."
+    )
 
-    def __init__(self):
-        super().__init__()
-        embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-        persist_directory = "rag_db"
-        self._db = Chroma(persist_directory=persist_directory, embedding_function=embedding_model)
+    top_k: int = Field(default=3, description="Number of top results per question")
+    retrieval_mode: str = Field(
+        default=os.getenv("RAG_RETRIEVAL_MODE", "hybrid"),
+        description="'hybrid' (BM25 + vector, RRF) or 'vector' (similarity only), as for KnowledgeBaseTool"
+    )
 
-    def _run(self, query_text: str) -> str:
-        results = self._db.similarity_search(query_text, k=self.top_k)
-        output = "\n\n".join([res.page_content[:500] for res in results])
-        return output  
+    @traced_tool
+    def _run(self, queries: str) -> str:
+        if isinstance(queries, (list, tuple)):
+            query_list = [str(query).strip() for query in queries]
+        else:
+            query_list = [query.strip() for query in re.split(r"[\n;]", queries)]
+        query_list = [query for query in query_list if query]
+        if not query_list:
+            return "No questions provided."
+
+        # Same ranking as the single-query tool, so both return the same excerpts
+        if self.retrieval_mode == "hybrid":
+            batches = hybrid_search_batch(query_list, k=self.top_k)
+        else:
+            batches = similarity_search_batch(query_list, k=self.top_k)
+        report_progress("retrieval_done", f"{len(query_list)} questions")
+        sections = []
+        for query, results in zip(query_list, batches):
+            body = format_results(results, max_chars=500) if results else "(no additional excerpts)"
+            sections.append(f"### {query}\n{body}")
+        return "\n\n".join(sections)
 
 
 rag_tool = KnowledgeBaseTool()
+rag_batch_tool = BatchKnowledgeBaseTool()
 database_tool = PatientDatabaseRetrievalTool()
 web_search_tool = WebSearchTool(api_key=serp_api_key)
 
 
 
-__all__ = ["database_tool", "web_search_tool", "rag_tool"]
+__all__ = ["database_tool", "web_search_tool", "rag_tool", "rag_batch_tool"]
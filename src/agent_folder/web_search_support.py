@@ -0,0 +1,143 @@
+import json
+import sqlite3
+import threading
+import time
+
+import requests
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: allows `rate` requests per second on average,
+    with bursts of up to `capacity` requests.
+    """
+
+    def __init__(self, rate: float = 1.0, capacity: int = 5):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: float = None) -> bool:
+        """Take one token, waiting up to `timeout` seconds (None = forever)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class SearchCache:
+    """SQLite-backed cache of web search responses with a time-to-live."""
+
+    def __init__(self, path: str, ttl: float = 86400):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS web_search_cache (
+                cache_key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+        """)
+
+    @staticmethod
+    def make_key(endpoint: str, query: str, num: int) -> str:
+        normalized = " ".join(query.lower().split())
+        return f"{endpoint}|{num}|{normalized}"
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM web_search_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, response: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO web_search_cache (cache_key, response, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(response), time.time())
+            )
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM web_search_cache WHERE created_at < ?", (time.time() - self.ttl,)
+            )
+        return cursor.rowcount
+
+
+class SearchError(Exception):
+    """A search that produced no usable results; its response is not cached."""
+
+
+class SerpClient:
+    """
+    SerpAPI client for WebSearchTool: one pooled HTTP session, a token bucket
+    in front of the API and a cache of successful responses.
+    """
+
+    def __init__(self, api_key: str, endpoint: str, timeout: float = 10.0,
+                 requests_per_second: float = 1.0, burst: int = 5,
+                 cache_path: str = ":memory:", cache_ttl: float = 86400):
+        self.api_key = api_key
+        self.endpoint = endpoint
+        self.timeout = timeout
+        # One pooled session so repeated searches reuse the TLS connection
+        self.session = requests.Session()
+        self.limiter = TokenBucket(rate=requests_per_second, capacity=burst)
+        self.cache = SearchCache(cache_path, ttl=cache_ttl)
+
+    def search(self, query: str, num: int = 5) -> tuple:
+        """Return (response dict, cached) or raise SearchError."""
+        cache_key = SearchCache.make_key(self.endpoint, query, num)
+        data = self.cache.get(cache_key)
+        if data is not None:
+            return data, True
+
+        if not self.limiter.acquire(timeout=self.timeout):
+            raise SearchError("Web search rate limit reached, try again shortly.")
+
+        params = {"q": query, "api_key": self.api_key, "num": num}
+        response = self.session.get(self.endpoint, params=params, timeout=self.timeout)
+        if not response.ok:
+            raise SearchError(f"SerpAPI returned HTTP {response.status_code}: {self._error_message(response)}")
+        data = response.json()
+        if "error" in data:
+            raise SearchError(data["error"])
+
+        self.cache.set(cache_key, data)
+        return data, False
+
+    @staticmethod
+    def _error_message(response) -> str:
+        # SerpAPI explains most failures in an "error" field
+        try:
+            return response.json().get("error") or response.reason
+        except ValueError:
+            return response.reason
+
+
+__all__ = ["TokenBucket", "SearchCache", "SearchError", "SerpClient"]
@@ -0,0 +1,305 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from patient_data.lookup import normalize_name
+
+# Queryable copy of the conversation log. Sessions written by
+# ConversationLogger (and any existing conversation_logs*.jsonl[.gz] files)
+# are stored one row per message, indexed by patient and time, so "this
+# patient's last N messages" is an index range scan instead of a scan of the
+# whole log. Sessions are keyed by their session_id (older log lines without
+# one: by a hash of the line), so importing the same log twice, or a log the
+# writer already mirrored, adds nothing.
+
+CONVERSATION_STORE_PATH = os.getenv("CONVERSATION_STORE_PATH", "conversations.sqlite3")
+IMPORT_CHUNK_SIZE = 5000
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS sessions (
+        id INTEGER PRIMARY KEY,
+        entry_hash TEXT NOT NULL UNIQUE,
+        patient_name TEXT NOT NULL,
+        patient_key TEXT NOT NULL,
+        session_start TEXT,
+        session_end TEXT,
+        logged_at REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY,
+        session_id INTEGER NOT NULL REFERENCES sessions (id),
+        patient_key TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        content TEXT NOT NULL,
+        timestamp TEXT,
+        logged_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_sessions_patient_time ON sessions (patient_key, logged_at)",
+    "CREATE INDEX IF NOT EXISTS idx_messages_patient_time ON messages (patient_key, logged_at, id)",
+    # Byte offset already imported per log file, for incremental imports
+    """
+    CREATE TABLE IF NOT EXISTS imported_files (
+        path TEXT PRIMARY KEY,
+        offset INTEGER NOT NULL
+    )
+    """,
+]
+
+
+def _logged_at(entry: dict, default: float) -> float:
+    """session_end is written as "%H:%M %d-%m-%Y"; older entries may lack it."""
+    try:
+        return datetime.strptime(entry.get("session_end", ""), "%H:%M %d-%m-%Y").timestamp()
+    except ValueError:
+        return default
+
+
+class ConversationStore:
+    def __init__(self, path: str = CONVERSATION_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        for statement in SCHEMA:
+            conn.execute(statement)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    # --- writes ---------------------------------------------------------------
+
+    def add_lines(self, lines: list, default_time: float = None) -> int:
+        """Store raw JSONL log lines; returns the number of new sessions."""
+        conn = self._conn()
+        default_time = default_time or time.time()
+        added = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                patient_name = entry.get("patient_name") or ""
+                logged_at = _logged_at(entry, default_time)
+                entry_key = entry.get("session_id") or hashlib.sha1(line.encode("utf-8")).hexdigest()
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO sessions (entry_hash, patient_name, patient_key, session_start, "
+                    "session_end, logged_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (entry_key, patient_name, normalize_name(patient_name),
+                     entry.get("session_start"), entry.get("session_end"), logged_at)
+                )
+                if not cursor.rowcount:
+                    continue  # already stored
+                session_id = cursor.lastrowid
+                conn.executemany(
+                    "INSERT INTO messages (session_id, patient_key, seq, role, content, timestamp, logged_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (session_id, normalize_name(patient_name), seq, message.get("role", ""),
+                         message.get("content", ""), message.get("timestamp"), logged_at)
+                        for seq, message in enumerate(entry.get("messages", []))
+                    ]
+                )
+                added += 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def import_file(self, path: str) -> int:
+        """
+        Import a conversation log (.jsonl or .jsonl.gz). Plain files are
+        imported incrementally from the last imported byte offset.
+        """
+        path = os.path.abspath(path)
+        conn = self._conn()
+        compressed = path.endswith(".gz")
+        row = conn.execute("SELECT offset FROM imported_files WHERE path = ?", (path,)).fetchone()
+        offset = row["offset"] if row else 0
+        if compressed and row:
+            return 0  # rotated logs never change
+        if not compressed and offset > os.path.getsize(path):
+            offset = 0  # file was rotated and restarted
+
+        added = 0
+        opener = gzip.open if compressed else open
+        with opener(path, "rb") as f:
+            f.seek(offset)
+            chunk = []
+            while True:
+                line = f.readline()
+                if not line or not line.endswith(b"\n"):
+                    break  # a partially written last line is picked up next time
+                chunk.append(line.decode("utf-8"))
+                offset += len(line)
+                if len(chunk) >= IMPORT_CHUNK_SIZE:
+                    added += self.add_lines(chunk)
+                    chunk = []
+            added += self.add_lines(chunk)
+
+        conn.execute("INSERT OR REPLACE INTO imported_files (path, offset) VALUES (?, ?)", (path, offset))
+        return added
+
+    # --- reads ----------------------------------------------------------------
+
+    def history(self, patient_name: str, limit: int = 20, before: int = None) -> dict:
+        """
+        Most recent messages first, paginated by cursor: pass the returned
+        next_before to get the page of older messages.
+        """
+        key = normalize_name(patient_name)
+        if before is None:
+            rows = self._conn().execute(
+                "SELECT id, session_id, role, content, timestamp, logged_at FROM messages "
+                "WHERE patient_key = ? ORDER BY logged_at DESC, id DESC LIMIT ?",
+                (key, limit + 1)
+            ).fetchall()
+        else:
+            cursor = self._conn().execute("SELECT logged_at FROM messages WHERE id = ?", (before,)).fetchone()
+            if cursor is None:
+                return {"messages": [], "next_before": None}
+            rows = self._conn().execute(
+                "SELECT id, session_id, role, content, timestamp, logged_at FROM messages "
+                "WHERE patient_key = ? AND (logged_at < ? OR (logged_at = ? AND id < ?)) "
+                "ORDER BY logged_at DESC, id DESC LIMIT ?",
+                (key, cursor["logged_at"], cursor["logged_at"], before, limit + 1)
+            ).fetchall()
+        page = [dict(row) for row in rows[:limit]]
+        return {
+            "messages": page,
+            "next_before": page[-1]["id"] if len(rows) > limit else None,
+        }
+
+    def recent_exchanges(self, patient_name: str, n: int = 10) -> list:
+        """Last n (question, answer) pairs, oldest first, e.g. as agent context."""
+        messages = list(reversed(self.history(patient_name, limit=2 * n)["messages"]))
+        exchanges = []
+        for question, answer in zip(messages, messages[1:]):
+            if question["role"] == "user" and answer["role"] == "assistant" and \
+                    question["session_id"] == answer["session_id"]:
+                exchanges.append({"question": question["content"], "answer": answer["content"],
+                                  "timestamp": question["timestamp"]})
+        return exchanges[-n:]
+
+    def stats(self) -> dict:
+        conn = self._conn()
+        return {
+            "sessions": conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0],
+            "messages": conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0],
+            "bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ConversationStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ConversationStore()
+    return _store
+
+
+def benchmark(sessions: int = 200_000, patients: int = 5_000, lookups: int = 200):
+    """
+    Build a synthetic log, then time "last 10 messages for a patient" by
+    scanning the JSONL vs. an indexed store query.
+    """
+    import random
+    import tempfile
+
+    rng = random.Random(0)
+    answer = "Keep to your fluid limit and low-potassium diet. " * 20
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, "conversation_logs.jsonl")
+        base = datetime(2025, 1, 1).timestamp()
+        with open(log_path, "w") as f:
+            for i in range(sessions):
+                end = datetime.fromtimestamp(base + i * 60).strftime("%H:%M %d-%m-%Y")
+                f.write(json.dumps({
+                    "patient_name": f"Patient {rng.randrange(patients)}",
+                    "session_start": end[:5],
+                    "session_end": end,
+                    "messages": [
+                        {"role": "user", "content": f"Question {i}?", "timestamp": end},
+                        {"role": "assistant", "content": answer, "timestamp": end},
+                    ],
+                }) + "\n")
+        size = os.path.getsize(log_path)
+        print(f"Synthetic log: {sessions:,} sessions, {size / 1e6:,.0f} MB")
+
+        store = ConversationStore(os.path.join(tmp, "conversations.sqlite3"))
+        start = time.perf_counter()
+        store.import_file(log_path)
+        elapsed = time.perf_counter() - start
+        print(f"Import: {elapsed:.1f}s ({sessions / elapsed:,.0f} sessions/s)")
+
+        names = [f"Patient {rng.randrange(patients)}" for _ in range(lookups)]
+
+        def scan(name):
+            found = []
+            with open(log_path) as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if entry["patient_name"] == name:
+                        found.extend(entry["messages"])
+            return found[-10:]
+
+        scans = min(5, lookups)
+        start = time.perf_counter()
+        for name in names[:scans]:
+            scan(name)
+        scan_ms = (time.perf_counter() - start) / scans * 1000
+
+        start = time.perf_counter()
+        for name in names:
+            store.history(name, limit=10)
+        store_ms = (time.perf_counter() - start) / lookups * 1000
+        print(f"Last 10 messages: JSONL scan {scan_ms:,.1f} ms, indexed store {store_ms:.3f} ms")
+
+
+__all__ = ["ConversationStore", "get_store", "benchmark", "CONVERSATION_STORE_PATH"]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Conversation history store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    import_cmd = sub.add_parser("import", help="import conversation log files (.jsonl / .jsonl.gz)")
+    import_cmd.add_argument("paths", nargs="+")
+    bench_cmd = sub.add_parser("benchmark", help="history lookups on a synthetic log")
+    bench_cmd.add_argument("--sessions", type=int, default=200_000)
+    args = parser.parse_args()
+
+    if args.command == "import":
+        for log_path in args.paths:
+            print(f"{log_path}: {get_store().import_file(log_path)} new sessions")
+        print(get_store().stats())
+    else:
+        benchmark(sessions=args.sessions)
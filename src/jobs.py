@@ -0,0 +1,136 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from progress import set_reporter
+
+# Background job queue for /process: requests are handed to a bounded pool of
+# worker threads and clients follow progress by polling or server-sent events.
+
+
+class QueueFull(Exception):
+    """Raised when the number of queued and running jobs reaches max_pending."""
+
+
+class Job:
+    def __init__(self, patient_name: str):
+        self.id = uuid.uuid4().hex
+        self.patient_name = patient_name
+        self.status = "queued"
+        self.events = []
+        self.result_id = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def add_event(self, stage: str, detail: str = ""):
+        with self._cond:
+            self._append_event(stage, detail)
+
+    def _append_event(self, stage: str, detail: str):
+        # Caller holds self._cond
+        self.events.append({
+            "seq": len(self.events),
+            "stage": stage,
+            "detail": detail,
+            "time": round(time.time() - self.created_at, 3),
+        })
+        self._cond.notify_all()
+
+    def finish(self, status: str, result_id: str = None, error: str = None):
+        # Status and terminal event change together, so a waiter that sees
+        # the job finished also sees its done/failed event
+        with self._cond:
+            self.status = status
+            self.result_id = result_id
+            self.error = error
+            self.finished_at = time.time()
+            self._append_event(status, error or "")
+
+    def wait_for_events(self, after: int, timeout: float = 15.0) -> list:
+        """Events with seq >= after, waiting up to timeout for new ones."""
+        with self._cond:
+            self._cond.wait_for(lambda: len(self.events) > after or self.finished, timeout)
+            return self.events[after:]
+
+    def to_dict(self) -> dict:
+        # Streamed answer tokens are folded into partial_response rather than
+        # listed one event each; a stream_reset discards the tokens before it
+        events = list(self.events)
+        resets = [event["seq"] for event in events if event["stage"] == "stream_reset"]
+        streamed = events[resets[-1] + 1:] if resets else events
+        return {
+            "job_id": self.id,
+            "patient_name": self.patient_name,
+            "status": self.status,
+            "result_id": self.result_id,
+            "error": self.error,
+            "events": [event for event in events if event["stage"] != "token"],
+            "partial_response": "".join(event["detail"] for event in streamed if event["stage"] == "token"),
+        }
+
+
+class JobQueue:
+    def __init__(self, handler, max_workers: int = 4, max_pending: int = 32, retention: float = 3600):
+        """
+        handler(patient_name, user_query) runs on a worker thread and returns
+        the result id to show when the job is done.
+        """
+        self.handler = handler
+        self.max_pending = max_pending
+        self.retention = retention
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def submit(self, patient_name: str, user_query: str) -> Job:
+        with self._lock:
+            self._purge_finished()
+            if self._pending >= self.max_pending:
+                raise QueueFull(f"{self._pending} requests already in progress")
+            job = Job(patient_name)
+            self._jobs[job.id] = job
+            self._pending += 1
+
+        job.add_event("queued")
+        self._executor.submit(self._run, job, patient_name, user_query)
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, patient_name: str, user_query: str):
+        job.status = "running"
+        set_reporter(job.add_event)
+        try:
+            job.add_event("started")
+            result_id = self.handler(patient_name, user_query)
+            job.finish("done", result_id=result_id)
+        except Exception as e:
+            job.finish("failed", error=str(e))
+        finally:
+            set_reporter(None)
+            with self._lock:
+                self._pending -= 1
+
+    def _purge_finished(self):
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pending": self._pending, "max_pending": self.max_pending, "tracked": len(self._jobs)}
+
+
+__all__ = ["Job", "JobQueue", "QueueFull"]
@@ -1,30 +1,200 @@
+import atexit
+import gzip
 import json
+import os
+import queue
+import shutil
+import threading
+import time
+import uuid
 from datetime import datetime
 from pathlib import Path
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Conversation sessions are handed to a background writer thread through a
+# bounded queue, so request handlers never wait on disk. The writer appends
+# batches under a cross-process lock (several Flask workers share one file),
+# fsyncs once per batch and rotates the file by size or age, gzipping the
+# rotated copy.
+
+LOG_FILE = os.getenv("CONVERSATION_LOG_FILE", "conversation_logs.jsonl")
+LOG_QUEUE_SIZE = int(os.getenv("CONVERSATION_LOG_QUEUE_SIZE", "10000"))
+LOG_BATCH_SIZE = int(os.getenv("CONVERSATION_LOG_BATCH_SIZE", "256"))
+LOG_FLUSH_INTERVAL = float(os.getenv("CONVERSATION_LOG_FLUSH_INTERVAL", "1.0"))
+LOG_MAX_BYTES = int(os.getenv("CONVERSATION_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+LOG_ROTATE_INTERVAL = float(os.getenv("CONVERSATION_LOG_ROTATE_INTERVAL", str(24 * 3600)))
+# Mirror written sessions into the indexed history store (conversation_store.py)
+MIRROR_TO_STORE = os.getenv("CONVERSATION_STORE", "1") == "1"
+
+
+class FileLock:
+    """Exclusive advisory lock on a sidecar file, held across processes."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        os.close(self._fd)
+        self._fd = None
+
 
 class ConversationLogger:
-    def __init__(self, log_file: str = "conversation_logs.jsonl"):
+    def __init__(self, log_file: str = LOG_FILE, queue_size: int = LOG_QUEUE_SIZE,
+                 batch_size: int = LOG_BATCH_SIZE, flush_interval: float = LOG_FLUSH_INTERVAL,
+                 max_bytes: int = LOG_MAX_BYTES, rotate_interval: float = LOG_ROTATE_INTERVAL):
         self.log_file = Path(log_file)
         self.log_file.parent.mkdir(exist_ok=True)
-    
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self._lock = FileLock(self.log_file.with_name(self.log_file.name + ".lock"))
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file_id = None  # (device, inode) of the file this process is tracking
+        self._file_started = time.time()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+
     def log_session(self, patient_name: str, conversation: list):
+        """Queue a session for writing; never blocks the caller."""
         entry = {
+            # Unique per session, so identical sessions logged in the same
+            # minute stay distinct in the history store
+            "session_id": uuid.uuid4().hex,
             "patient_name": patient_name,
             "session_start": conversation[0]["timestamp"] if conversation else datetime.now().strftime("%H:%M"),
             "session_end": datetime.now().strftime("%H:%M %d-%m-%Y"),
             "messages": conversation
         }
-        
-        with open(self.log_file, 'a') as f:
-            f.write(json.dumps(entry) + '\n')
-        
-        print(f" Logged session for {patient_name}")
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(json.dumps(entry) + "\n")
+        except queue.Full:
+            self.dropped += 1
+            print(f"Conversation log queue full, dropped session for {patient_name}")
+
+    # --- writer thread -------------------------------------------------------
+
+    def _ensure_writer(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._thread_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="conversation-log-writer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Collect whatever else arrives within the flush interval
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            except OSError as e:
+                print(f"Failed to write conversation log: {e}")
+            if MIRROR_TO_STORE:
+                self._mirror(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write_batch(self, lines: list):
+        with self._lock:
+            self._maybe_rotate()
+            with open(self.log_file, "a") as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self.written += len(lines)
+
+    def _mirror(self, lines: list):
+        try:
+            from conversation_store import get_store
+            get_store().add_lines(lines)
+        except Exception as e:
+            print(f"Failed to index conversation log: {e}")
+
+    def _maybe_rotate(self):
+        """Called with the file lock held."""
+        try:
+            stat = self.log_file.stat()
+        except FileNotFoundError:
+            self._file_id = None
+            return
+        file_id = (stat.st_dev, stat.st_ino)
+        if file_id != self._file_id:
+            # New file, or another process rotated it
+            self._file_id = file_id
+            self._file_started = time.time()
+
+        too_big = stat.st_size >= self.max_bytes
+        too_old = time.time() - self._file_started >= self.rotate_interval and stat.st_size > 0
+        if not (too_big or too_old):
+            return
+
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        rotated = self.log_file.with_name(f"{self.log_file.stem}.{stamp}{self.log_file.suffix}")
+        n = 1
+        while rotated.exists() or Path(f"{rotated}.gz").exists():
+            rotated = self.log_file.with_name(f"{self.log_file.stem}.{stamp}-{n}{self.log_file.suffix}")
+            n += 1
+        os.replace(self.log_file, rotated)
+        with open(rotated, "rb") as src, gzip.open(f"{rotated}.gz", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(rotated)
+        self._file_id = None
+        self.rotations += 1
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until every queued session is on disk."""
+        if self._thread is None:
+            return True
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return not self._queue.unfinished_tasks
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+        }
 
 
 # Global logger instance
 logger = ConversationLogger()
+atexit.register(logger.flush)
 
 def log_conversation(patient_name: str, conversation: list):
-    """Log a conversation."""
-    logger.log_session(patient_name, conversation)
\ No newline at end of file
+    """Log a conversation (queued; written by a background thread)."""
+    logger.log_session(patient_name, conversation)
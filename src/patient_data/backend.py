@@ -1,12 +1,25 @@
-from flask import Flask, render_template_string, request, redirect, url_for, flash
+from flask import Flask, render_template_string, request, redirect, url_for, flash, jsonify
 import sqlite3
 import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from patient_data.bulk_import import detect_format, import_rows, iter_rows
+from rag.patient_context import PatientIndexer
 
 app = Flask(__name__)
 app.secret_key = "supersecretkey" 
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "hospital_discharge.db")
 
+# Uploads and request bodies larger than this are refused with 413 before
+# anything is read
+app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("IMPORT_MAX_BYTES", str(100 * 1024 * 1024)))
+
+# New records are rendered and embedded into the per-patient RAG store in the
+# background, so the clinical agent can retrieve them right away.
+patient_indexer = PatientIndexer(DB_PATH) if os.getenv("PATIENT_CONTEXT_INDEXING", "1") == "1" else None
+
 FORM_HTML = """
 <!doctype html>
 <html>
@@ -64,6 +77,11 @@ FORM_HTML = """
         
         <button type="submit">Submit</button>
     </form>
+    <h2 style="text-align: center; margin-top: 30px;">Bulk Import (CSV / JSON):</h2>
+    <form method="POST" action="/import" enctype="multipart/form-data">
+        <input type="file" name="file" accept=".csv,.json,.jsonl" required>
+        <button type="submit">Import</button>
+    </form>
 </body>
 </html>
 """
@@ -91,7 +109,10 @@ def add_patient():
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """, data)
             conn.commit()
+            patient_id = cursor.lastrowid
             conn.close()
+            if patient_indexer:
+                patient_indexer.enqueue([patient_id])
 
             flash(f"Patient '{data[0]}' added successfully!")
             return redirect(url_for("add_patient"))
@@ -102,5 +123,35 @@ def add_patient():
 
     return render_template_string(FORM_HTML)
 
+@app.route("/import", methods=["POST"])
+def bulk_import():
+    """
+    Bulk import discharge summaries from an uploaded file (form field "file")
+    or the request body (JSON array, JSON Lines or CSV by Content-Type).
+    Returns the import report (rows inserted, per-row errors, rows/sec);
+    a malformed upload gets 400 with the report and its "error".
+    Bodies over IMPORT_MAX_BYTES are rejected with 413.
+    """
+    upload = request.files.get("file")
+    if upload:
+        stream, fmt = upload.stream, detect_format(upload.filename, upload.mimetype)
+    else:
+        stream, fmt = request.stream, detect_format(content_type=request.mimetype)
+
+    report = import_rows(iter_rows(stream, fmt), DB_PATH,
+                         on_inserted=patient_indexer.enqueue if patient_indexer else None)
+
+    if upload and request.accept_mimetypes.best != "application/json":
+        if "error" in report:
+            flash(f"Error: {report['error']} ({report['inserted']} records before it were imported)")
+        else:
+            flash(f"Imported {report['inserted']} records, {report['failed']} rejected "
+                  f"({report['rows_per_sec']} rows/sec)")
+        return redirect(url_for("add_patient"))
+    # A malformed upload still reports the rows inserted before the error
+    if "error" in report:
+        return jsonify(report), 400
+    return jsonify(report), 200 if not report["failed"] else 207
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -1,65 +1,52 @@
 from crewai_tools import BaseTool
-import sqlite3
-import os
 import json
 
+from tracing import traced_tool
+
+from .lookup import get_lookup
+
 class PatientDatabaseRetrievalTool(BaseTool):
     name: str = "Patient Database Retrieval Tool"
     description: str = (
         "Fetches a patient's complete discharge report from a local SQLite database "
-        "based on their name. Returns medical, dietary, and follow-up details."
+        "based on their name. Returns medical, dietary, and follow-up details. "
+        "If there is no exact match, returns ranked candidate names (fuzzy match)."
     )
 
+    @traced_tool
     def _run(self, patient_name: str) -> str:
         """
         Fetches patient discharge details by name from hospital_discharge.db.
         """
         try:
-            # Path to local database
-            db_path = os.path.join(os.path.dirname(__file__), "hospital_discharge.db")
-
-            if not os.path.exists(db_path):
-                return json.dumps({
-                    "status": "error",
-                    "message": f"Database file not found at {db_path}"
-                }, indent=2)
-
-            # Connect to database
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-
-            # Query patient by name (case-insensitive)
-            cursor.execute("""
-                SELECT patient_name, discharge_date, primary_diagnosis, medications,
-                       dietary_restrictions, follow_up, warning_signs, discharge_instructions
-                FROM discharge_summaries
-                WHERE LOWER(patient_name) = LOWER(?)
-            """, (patient_name.strip(),))
-
-            record = cursor.fetchone()
-            conn.close()
+            record = get_lookup().fetch_by_name(patient_name)
 
             if record:
-                patient_data = {
-                    "patient_name": record[0],
-                    "discharge_date": record[1],
-                    "primary_diagnosis": record[2],
-                    "medications": record[3].split(", "),
-                    "dietary_restrictions": record[4],
-                    "follow_up": record[5],
-                    "warning_signs": record[6],
-                    "discharge_instructions": record[7]
-                }
-
+                # Medications are parsed once into the medications table, not split per request
                 return json.dumps({
                     "status": "success",
-                    "data": patient_data
+                    "data": record
                 }, indent=2)
             else:
-                return json.dumps({
+                # Offer ranked close matches so a typo resolves in this same call
+                candidates = get_lookup().search_by_name(patient_name)
+                response = {
                     "status": "error",
                     "message": f"No record found for patient '{patient_name}'."
-                }, indent=2)
+                }
+                if candidates:
+                    response["message"] += (
+                        " Did you mean one of the candidates below? Confirm the name with the "
+                        "patient, then call this tool again with the exact name."
+                    )
+                    response["candidates"] = candidates
+                return json.dumps(response, indent=2)
+
+        except FileNotFoundError as e:
+            return json.dumps({
+                "status": "error",
+                "message": str(e)
+            }, indent=2)
 
         except Exception as e:
             return json.dumps({
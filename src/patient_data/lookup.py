@@ -0,0 +1,344 @@
+import os
+import sqlite3
+import threading
+import time
+from difflib import SequenceMatcher
+
+from .medications import normalize_drug, sync_pending_medications
+from .migrations import migrate
+
+DB_PATH = os.path.join(os.path.dirname(__file__), "hospital_discharge.db")
+
+PATIENT_COLUMNS = (
+    "patient_name", "discharge_date", "primary_diagnosis", "medications",
+    "dietary_restrictions", "follow_up", "warning_signs", "discharge_instructions"
+)
+
+# Kept as module constants so sqlite3's per-connection statement cache
+# reuses the compiled statement on every lookup.
+LOOKUP_BY_NAME_SQL = f"""
+    SELECT id, medications_synced, {", ".join(PATIENT_COLUMNS)}
+    FROM discharge_summaries
+    WHERE patient_name_norm = ? COLLATE NOCASE
+    ORDER BY discharge_date DESC, id DESC
+    LIMIT 1
+"""
+
+LOOKUP_BY_ID_SQL = f"""
+    SELECT id, medications_synced, {", ".join(PATIENT_COLUMNS)}
+    FROM discharge_summaries
+    WHERE id = ?
+"""
+
+MEDICATIONS_SQL = """
+    SELECT drug, dose, frequency
+    FROM medications
+    WHERE discharge_id = ?
+    ORDER BY position
+"""
+
+PATIENTS_ON_DRUG_SQL = """
+    SELECT d.id, d.patient_name, d.discharge_date, m.drug, m.dose, m.frequency
+    FROM medications AS m
+    JOIN discharge_summaries AS d ON d.id = m.discharge_id
+    WHERE m.drug_norm = ?
+    ORDER BY d.discharge_date DESC
+    LIMIT ?
+"""
+
+# Candidates are pre-ranked by bm25 over shared trigrams, then re-scored
+# in Python on the (small) candidate set.
+FUZZY_SEARCH_SQL = """
+    SELECT d.id, d.patient_name, d.discharge_date, d.primary_diagnosis
+    FROM patient_name_fts
+    JOIN discharge_summaries AS d ON d.id = patient_name_fts.rowid
+    WHERE patient_name_fts MATCH ?
+    ORDER BY rank
+    LIMIT ?
+"""
+
+TRIGRAM_FREQUENCY_SQL = "SELECT term, doc FROM patient_name_fts_vocab"
+
+# How long the in-memory trigram frequency table may be reused before it is
+# reloaded. Stale frequencies only affect which trigrams are queried, never
+# correctness: unseen trigrams are treated as the rarest.
+TRIGRAM_FREQUENCY_TTL = 600
+
+
+def normalize_name(patient_name: str) -> str:
+    """Normalize a patient name the same way the migration backfills it."""
+    return patient_name.strip().lower()
+
+
+def name_trigrams(patient_name: str) -> list:
+    """Distinct trigrams of the normalized name, in order of appearance."""
+    name = " ".join(normalize_name(patient_name).split())
+    seen = []
+    for i in range(len(name) - 2):
+        gram = name[i:i + 3]
+        if gram not in seen:
+            seen.append(gram)
+    return seen
+
+
+class PatientLookup:
+    """
+    Indexed patient lookup over hospital_discharge.db.
+
+    Connections are pooled per thread (sqlite3 connections must not be shared
+    across threads), opened in WAL mode so readers never block the backend's
+    writes, and the schema is migrated once per process on first use.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._migrate_lock = threading.Lock()
+        self._migrated = False
+        self._frequencies = None
+        self._frequencies_loaded_at = 0.0
+        self._frequencies_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if not os.path.exists(self.db_path):
+            raise FileNotFoundError(f"Database file not found at {self.db_path}")
+
+        conn = sqlite3.connect(
+            self.db_path,
+            isolation_level=None,
+            cached_statements=128,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Return this thread's pooled connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._ensure_migrated(conn)
+            self._local.conn = conn
+        return conn
+
+    def _ensure_migrated(self, conn: sqlite3.Connection):
+        if self._migrated:
+            return
+        with self._migrate_lock:
+            if not self._migrated:
+                migrate(conn)
+                self._migrated = True
+
+    def close(self):
+        """Close the calling thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def fetch_by_name(self, patient_name: str):
+        """
+        Return the discharge record for patient_name as a dict,
+        or None if there is no match (the latest discharge if the name has
+        several). "discharge_id" is the row id; "medications" holds the parsed
+        medications as {"drug", "dose", "frequency"} dicts, not the raw text.
+        """
+        row = self.get_connection().execute(LOOKUP_BY_NAME_SQL, (normalize_name(patient_name),)).fetchone()
+        return self._record_from_row(row)
+
+    def fetch_by_id(self, discharge_id: int):
+        """Discharge record with the given row id (same shape as fetch_by_name), or None."""
+        row = self.get_connection().execute(LOOKUP_BY_ID_SQL, (discharge_id,)).fetchone()
+        return self._record_from_row(row)
+
+    def _record_from_row(self, row):
+        if row is None:
+            return None
+        conn = self.get_connection()
+        discharge_id, synced = row[0], row[1]
+        record = {"discharge_id": discharge_id, **dict(zip(PATIENT_COLUMNS, row[2:]))}
+        if not synced:
+            # Inserted or edited by a client that only writes the text column
+            sync_pending_medications(conn, [discharge_id])
+        record["medications"] = self.fetch_medications(discharge_id)
+        return record
+
+    def fetch_medications(self, discharge_id: int) -> list:
+        rows = self.get_connection().execute(MEDICATIONS_SQL, (discharge_id,)).fetchall()
+        return [{"drug": drug, "dose": dose, "frequency": frequency} for drug, dose, frequency in rows]
+
+    def patients_on(self, drug: str, limit: int = 100) -> list:
+        """Patients with drug (generic name, case-insensitive) in their discharge medications."""
+        conn = self.get_connection()
+        sync_pending_medications(conn)
+        rows = conn.execute(PATIENTS_ON_DRUG_SQL, (normalize_drug(drug), limit)).fetchall()
+        return [
+            {"id": row[0], "patient_name": row[1], "discharge_date": row[2],
+             "drug": row[3], "dose": row[4], "frequency": row[5]}
+            for row in rows
+        ]
+
+    def _trigram_frequencies(self) -> dict:
+        """Document frequency per indexed trigram, cached for TRIGRAM_FREQUENCY_TTL."""
+        now = time.monotonic()
+        if self._frequencies is None or now - self._frequencies_loaded_at > TRIGRAM_FREQUENCY_TTL:
+            with self._frequencies_lock:
+                if self._frequencies is None or now - self._frequencies_loaded_at > TRIGRAM_FREQUENCY_TTL:
+                    self._frequencies = dict(
+                        self.get_connection().execute(TRIGRAM_FREQUENCY_SQL).fetchall()
+                    )
+                    self._frequencies_loaded_at = now
+        return self._frequencies
+
+    def _selective_trigrams(self, trigrams: list, max_terms: int, posting_budget: int) -> list:
+        """
+        Pick the rarest trigrams, stopping once their combined document count
+        would exceed posting_budget (the first trigram is always kept).
+        """
+        frequencies = self._trigram_frequencies()
+        ranked = sorted(trigrams, key=lambda gram: frequencies.get(gram, 0))
+
+        selected = []
+        total = 0
+        for gram in ranked[:max_terms]:
+            total += frequencies.get(gram, 0)
+            if selected and total > posting_budget:
+                break
+            selected.append(gram)
+        return selected
+
+    def search_by_name(self, patient_name: str, limit: int = 5, min_score: float = 0.5,
+                       pool_size: int = 50, max_terms: int = 8, posting_budget: int = 5000):
+        """
+        Fuzzy / partial name search using the trigram index.
+
+        Only the rarest trigrams of the name are matched (at most `max_terms`,
+        and about `posting_budget` indexed rows), so common fragments
+        ("son", "ohn") do not turn the query into a scan.
+        Returns up to `limit` candidates as dicts sorted by descending
+        similarity score (0..1). Names shorter than three characters
+        cannot be matched by trigrams and return an empty list.
+        """
+        trigrams = self._selective_trigrams(
+            name_trigrams(patient_name), max_terms, posting_budget
+        )
+        if not trigrams:
+            return []
+
+        match_query = " OR ".join('"' + gram.replace('"', '""') + '"' for gram in trigrams)
+        rows = self.get_connection().execute(
+            FUZZY_SEARCH_SQL, (match_query, pool_size)
+        ).fetchall()
+
+        query = " ".join(normalize_name(patient_name).split())
+        candidates = []
+        for record_id, name, discharge_date, diagnosis in rows:
+            candidate = " ".join(normalize_name(name).split())
+            # Partial queries ("robert") should score well against one word
+            score = max(
+                SequenceMatcher(None, query, part).ratio()
+                for part in [candidate] + candidate.split()
+            )
+            if score >= min_score:
+                candidates.append({
+                    "id": record_id,
+                    "patient_name": name,
+                    "discharge_date": discharge_date,
+                    "primary_diagnosis": diagnosis,
+                    "score": round(score, 3),
+                })
+
+        candidates.sort(key=lambda c: c["score"], reverse=True)
+        return candidates[:limit]
+
+
+_default_lookup = None
+_default_lock = threading.Lock()
+
+
+def get_lookup() -> PatientLookup:
+    """Process-wide lookup engine for the default database."""
+    global _default_lookup
+    if _default_lookup is None:
+        with _default_lock:
+            if _default_lookup is None:
+                _default_lookup = PatientLookup()
+    return _default_lookup
+
+
+def benchmark(sizes=(10_000, 100_000, 1_000_000), lookups=1000):
+    """
+    Compare the original LOWER() full-scan query against the indexed lookup
+    on synthetic tables of the given sizes. Prints mean latency per lookup.
+    """
+    import random
+    import tempfile
+    import time
+
+    schema_path = os.path.join(os.path.dirname(__file__), "patient_data.sql")
+    with open(schema_path) as f:
+        create_table = f.read().split(";")[0]
+
+    legacy_sql = f"""
+        SELECT {", ".join(PATIENT_COLUMNS)}
+        FROM discharge_summaries
+        WHERE LOWER(patient_name) = LOWER(?)
+    """
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            conn = sqlite3.connect(path)
+            conn.execute(create_table)
+            rows = (
+                (f"Patient {i:07d}", "2024-01-01", "Chronic Kidney Disease",
+                 "Drug A 10mg daily, Drug B 5mg daily", "Low sodium", "Nephrology in 1 week",
+                 "Reduced urine output", "Rest")
+                for i in range(size)
+            )
+            conn.executemany(f"""
+                INSERT INTO discharge_summaries ({", ".join(PATIENT_COLUMNS)})
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            conn.commit()
+
+            names = [f"PATIENT {random.randrange(size):07d}" for _ in range(lookups)]
+            legacy_runs = max(1, lookups // 50)
+
+            start = time.perf_counter()
+            for name in names[:legacy_runs]:
+                conn.execute(legacy_sql, (name,)).fetchone()
+            legacy_ms = (time.perf_counter() - start) * 1000 / legacy_runs
+            conn.close()
+
+            lookup = PatientLookup(path)
+            lookup.get_connection()  # migrate outside the timed loop
+            lookup._trigram_frequencies()
+            start = time.perf_counter()
+            for name in names:
+                assert lookup.fetch_by_name(name) is not None
+            indexed_ms = (time.perf_counter() - start) * 1000 / lookups
+
+            typos = [name.replace("PATIENT", "PATEINT") for name in names[:legacy_runs]]
+            start = time.perf_counter()
+            for name in typos:
+                lookup.search_by_name(name)
+            fuzzy_ms = (time.perf_counter() - start) * 1000 / legacy_runs
+            lookup.close()
+
+            print(
+                f"{size:>9,} rows | LOWER() scan: {legacy_ms:8.3f} ms | "
+                f"indexed: {indexed_ms:8.4f} ms | speedup: {legacy_ms / indexed_ms:,.0f}x | "
+                f"fuzzy: {fuzzy_ms:8.3f} ms"
+            )
+
+
+__all__ = [
+    "PatientLookup", "get_lookup", "normalize_name", "name_trigrams", "benchmark", "DB_PATH"
+]
+
+
+if __name__ == "__main__":
+    # Run from src/: python -m patient_data.lookup
+    benchmark()
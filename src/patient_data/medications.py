@@ -0,0 +1,112 @@
+import re
+import sqlite3
+
+# Parsing of the free-text medications column into (drug, dose, frequency)
+# rows of the medications child table. The column stays the source of truth
+# for clients that only know the original schema (backend.py's form): rows
+# they insert or edit are flagged medications_synced = 0 by triggers, and
+# sync_pending_medications parses just those rows on the next read.
+
+# Split on commas outside parentheses, except thousands separators ("10,000")
+_SPLIT = re.compile(r",(?![^(]*\))(?!\d{3}\b)")
+_DOSE = re.compile(
+    r"\d[\d,.]*\s*(?:mg|mcg|g|ml|units?|puffs?|tablets?|%)(?![a-z])",
+    re.IGNORECASE,
+)
+_FREQUENCY = re.compile(
+    r"\b(?:once|twice|three times|four times|every|daily|nightly|weekly|PRN|as directed|as needed)\b",
+    re.IGNORECASE,
+)
+
+
+def parse_medication(entry: str) -> dict:
+    """Split one medication entry, e.g. "Metformin 500mg twice daily"."""
+    raw = " ".join(entry.strip().strip('"').split())
+    dose_match = _DOSE.search(raw)
+    frequency_match = _FREQUENCY.search(raw)
+
+    # The drug name ends where the dose, a parenthetical or the frequency begins
+    ends = [len(raw), raw.find("(") if "(" in raw else len(raw)]
+    if dose_match:
+        ends.append(dose_match.start())
+    if frequency_match:
+        ends.append(frequency_match.start())
+    drug_end = min(ends)
+    # Keep a brand name in parentheses with the drug: "Erythropoietin (Procrit)"
+    brand = re.match(r"\s*\([A-Za-z][A-Za-z -]*\)", raw[drug_end:])
+    if brand and not _FREQUENCY.search(brand.group(0)) and "dose" not in brand.group(0).lower():
+        drug_end += brand.end()
+    drug = raw[:drug_end].strip() or raw
+
+    dose = dose_match.group(0).strip() if dose_match else None
+    rest = raw[drug_end:]
+    if dose:
+        rest = rest.replace(dose_match.group(0), " ", 1)
+    rest = re.sub(r"\(\s*\)", " ", rest)
+    if not dose:
+        # "Warfarin (dose per INR protocol)"
+        dosing = re.search(r"\((dose[^)]*)\)", rest, re.IGNORECASE)
+        if dosing:
+            dose = dosing.group(1).strip()
+            rest = rest.replace(dosing.group(0), " ")
+    frequency = " ".join(rest.replace("(", " ").replace(")", " ").split()) or None
+
+    return {"drug": drug, "dose": dose, "frequency": frequency, "raw": raw}
+
+
+def parse_medications(text: str) -> list:
+    """Parse the comma-separated medications column into a list of dicts."""
+    if not text or not text.strip():
+        return []
+    return [parse_medication(entry) for entry in _SPLIT.split(text) if entry.strip().strip('"')]
+
+
+def normalize_drug(drug: str) -> str:
+    """Lowercased generic name, without a parenthesized brand name."""
+    return " ".join(re.sub(r"\([^)]*\)", " ", drug).lower().split())
+
+
+def sync_pending_medications(conn: sqlite3.Connection, ids: list = None) -> int:
+    """
+    Parse the medications column of rows flagged as not yet synced (all of
+    them, or only those in ids) into the medications table. Returns the
+    number of discharge rows processed.
+    """
+    where = "medications_synced = 0"
+    params = []
+    if ids is not None:
+        where += f" AND id IN ({', '.join('?' for _ in ids)})"
+        params = list(ids)
+    # Cheap check first so the common case (nothing pending) takes no write lock
+    if conn.execute(f"SELECT 1 FROM discharge_summaries WHERE {where} LIMIT 1", params).fetchone() is None:
+        return 0
+
+    own_transaction = not conn.in_transaction
+    if own_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Re-read under the write lock so a concurrent edit is not lost
+        pending = conn.execute(f"SELECT id, medications FROM discharge_summaries WHERE {where}", params).fetchall()
+        rows = []
+        for discharge_id, text in pending:
+            for position, medication in enumerate(parse_medications(text)):
+                rows.append((discharge_id, position, medication["drug"], normalize_drug(medication["drug"]),
+                             medication["dose"], medication["frequency"], medication["raw"]))
+        pending_ids = [(discharge_id,) for discharge_id, _ in pending]
+
+        conn.executemany("DELETE FROM medications WHERE discharge_id = ?", pending_ids)
+        conn.executemany(
+            "INSERT INTO medications (discharge_id, position, drug, drug_norm, dose, frequency, raw) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        conn.executemany("UPDATE discharge_summaries SET medications_synced = 1 WHERE id = ?", pending_ids)
+        if own_transaction:
+            conn.execute("COMMIT")
+    except Exception:
+        if own_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    return len(pending)
+
+
+__all__ = ["parse_medication", "parse_medications", "normalize_drug", "sync_pending_medications"]
@@ -0,0 +1,177 @@
+import sqlite3
+
+from .medications import sync_pending_medications
+
+# Schema migrations applied on top of patient_data.sql.
+# Each entry is (version, description, list of steps); a step is an SQL
+# statement or a callable taking the connection, for data migrations that
+# need Python. The applied version is tracked with PRAGMA user_version so
+# migrations run only once.
+
+MIGRATIONS = [
+    (
+        1,
+        "Normalized patient name column with a NOCASE index",
+        [
+            "ALTER TABLE discharge_summaries ADD COLUMN patient_name_norm TEXT",
+            "UPDATE discharge_summaries SET patient_name_norm = LOWER(TRIM(patient_name))",
+            """
+            CREATE INDEX IF NOT EXISTS idx_discharge_patient_name_norm
+            ON discharge_summaries (patient_name_norm COLLATE NOCASE)
+            """,
+            # Keep the column in sync for rows written by backend.py and other
+            # clients that only know about the original schema.
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_discharge_name_norm_insert
+            AFTER INSERT ON discharge_summaries
+            BEGIN
+                UPDATE discharge_summaries
+                SET patient_name_norm = LOWER(TRIM(NEW.patient_name))
+                WHERE id = NEW.id;
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_discharge_name_norm_update
+            AFTER UPDATE OF patient_name ON discharge_summaries
+            BEGIN
+                UPDATE discharge_summaries
+                SET patient_name_norm = LOWER(TRIM(NEW.patient_name))
+                WHERE id = NEW.id;
+            END
+            """,
+        ],
+    ),
+    (
+        2,
+        "Trigram full-text index over patient names for fuzzy search",
+        [
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS patient_name_fts USING fts5(
+                patient_name,
+                content='discharge_summaries',
+                content_rowid='id',
+                tokenize='trigram'
+            )
+            """,
+            "INSERT INTO patient_name_fts(patient_name_fts) VALUES ('rebuild')",
+            # Per-trigram document frequencies, used to query only the rarest
+            # (most selective) trigrams of a name.
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS patient_name_fts_vocab
+            USING fts5vocab(patient_name_fts, 'row')
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_patient_name_fts_insert
+            AFTER INSERT ON discharge_summaries
+            BEGIN
+                INSERT INTO patient_name_fts(rowid, patient_name)
+                VALUES (NEW.id, NEW.patient_name);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_patient_name_fts_delete
+            AFTER DELETE ON discharge_summaries
+            BEGIN
+                INSERT INTO patient_name_fts(patient_name_fts, rowid, patient_name)
+                VALUES ('delete', OLD.id, OLD.patient_name);
+            END
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_patient_name_fts_update
+            AFTER UPDATE OF patient_name ON discharge_summaries
+            BEGIN
+                INSERT INTO patient_name_fts(patient_name_fts, rowid, patient_name)
+                VALUES ('delete', OLD.id, OLD.patient_name);
+                INSERT INTO patient_name_fts(rowid, patient_name)
+                VALUES (NEW.id, NEW.patient_name);
+            END
+            """,
+        ],
+    ),
+    (
+        3,
+        "Normalized medications child table (drug, dose, frequency)",
+        [
+            """
+            CREATE TABLE IF NOT EXISTS medications (
+                id INTEGER PRIMARY KEY,
+                discharge_id INTEGER NOT NULL REFERENCES discharge_summaries (id) ON DELETE CASCADE,
+                position INTEGER NOT NULL,
+                drug TEXT NOT NULL,
+                drug_norm TEXT NOT NULL,
+                dose TEXT,
+                frequency TEXT,
+                raw TEXT NOT NULL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_medications_discharge ON medications (discharge_id, position)",
+            "CREATE INDEX IF NOT EXISTS idx_medications_drug_norm ON medications (drug_norm)",
+            # Rows whose medications text has not been parsed yet. New rows
+            # start unsynced; the partial index keeps finding them cheap.
+            "ALTER TABLE discharge_summaries ADD COLUMN medications_synced INTEGER NOT NULL DEFAULT 0",
+            """
+            CREATE INDEX IF NOT EXISTS idx_discharge_medications_pending
+            ON discharge_summaries (id) WHERE medications_synced = 0
+            """,
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_discharge_medications_update
+            AFTER UPDATE OF medications ON discharge_summaries
+            BEGIN
+                UPDATE discharge_summaries SET medications_synced = 0 WHERE id = NEW.id;
+            END
+            """,
+            # Foreign keys are off by default in SQLite, so cascade by trigger
+            """
+            CREATE TRIGGER IF NOT EXISTS trg_discharge_medications_delete
+            AFTER DELETE ON discharge_summaries
+            BEGIN
+                DELETE FROM medications WHERE discharge_id = OLD.id;
+            END
+            """,
+            sync_pending_medications,
+        ],
+    ),
+]
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Apply any pending migrations to the connected database.
+    Returns the schema version after migrating.
+    """
+    current = get_schema_version(conn)
+
+    for version, description, statements in MIGRATIONS:
+        if version <= current:
+            continue
+
+        print(f"Applying migration {version}: {description}")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Another process may have migrated while we waited for the lock
+            if get_schema_version(conn) >= version:
+                conn.execute("COMMIT")
+                current = version
+                continue
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.execute("COMMIT")
+        except Exception:
+            # BEGIN itself may have failed (e.g. busy), leaving nothing to roll back
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        current = version
+
+    return current
+
+
+__all__ = ["MIGRATIONS", "get_schema_version", "migrate"]
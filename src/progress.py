@@ -0,0 +1,24 @@
+import threading
+
+# Progress reporting for the request running on the current thread.
+# The job queue installs a reporter per job; the workflow and tools call
+# report_progress() without needing to know whether anyone is listening.
+
+_current = threading.local()
+
+
+def set_reporter(reporter):
+    """Install reporter(stage, detail) for this thread (None to clear)."""
+    _current.reporter = reporter
+
+
+def report_progress(stage: str, detail: str = ""):
+    reporter = getattr(_current, "reporter", None)
+    if reporter is not None:
+        try:
+            reporter(stage, detail)
+        except Exception as e:
+            print(f"Progress reporter failed: {e}")
+
+
+__all__ = ["set_reporter", "report_progress"]
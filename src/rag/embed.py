@@ -1,36 +1,339 @@
+"""
+Ingest reference PDFs into the rag_db vector store.
+
+Pages are extracted in a process pool and streamed through the splitter one
+page at a time; chunks are embedded and upserted in fixed-size batches, so
+memory stays flat regardless of PDF size.
+
+Indexing is incremental: chunk ids are content hashes, so unchanged chunks
+are skipped, chunks that disappeared from a file are deleted, and files whose
+bytes have not changed since the last run are not even extracted. Files are
+identified by their path relative to the project root, so reference PDFs
+with the same name in different folders are indexed separately.
+
+Usage (from the project root):
+    python src/rag/embed.py path/to/comprehensive-clinical-nephrology.pdf
+"""
+import argparse
+import hashlib
+import json
 import os
-import PyPDF2
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.vectorstores import Chroma
-from langchain.schema import Document
+import re
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+from rag import runtime
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+MANIFEST_NAME = "ingest_manifest.json"
+# Bump when the chunk metadata layout changes so unchanged files are revisited
+METADATA_VERSION = 3
+# Ids per delete call, to stay under the store's maximum batch size
+DELETE_BATCH_SIZE = 5000
+
+# One PdfReader per worker process, opened on its first page
+_reader = None
+_reader_path = None
+
+
+def _extract_page(args):
+    global _reader, _reader_path
+    pdf_path, page_number = args
+    if _reader is None or _reader_path != pdf_path:
+        import PyPDF2
+        _reader = PyPDF2.PdfReader(pdf_path)
+        _reader_path = pdf_path
+    return page_number, _reader.pages[page_number].extract_text() or ""
+
+
+def count_pages(pdf_path: str) -> int:
+    import PyPDF2
+    with open(pdf_path, "rb") as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def iter_pages(pdf_path: str, workers: int = None):
+    """
+    Yield (page_number, text) in page order. At most a few pages per worker
+    are in flight, so extracted text never piles up in memory.
+    """
+    workers = workers or os.cpu_count() or 1
+    total = count_pages(pdf_path)
+    window = workers * 4
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        next_page = 0
+        while next_page < total or pending:
+            while next_page < total and len(pending) < window:
+                pending.append(pool.submit(_extract_page, (pdf_path, next_page)))
+                next_page += 1
+            yield pending.popleft().result()
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_path(pdf_path: str) -> str:
+    """Path of pdf_path relative to the project root, with "/" separators."""
+    path = os.path.abspath(pdf_path)
+    try:
+        path = os.path.relpath(path, PROJECT_ROOT)
+    except ValueError:  # another drive on Windows
+        pass
+    return path.replace(os.sep, "/")
+
+
+def chunk_id(source: str, page: int, text: str) -> str:
+    """Content-addressed id: identical text on the same page keeps its vector."""
+    return hashlib.sha256(f"{source}\0{page}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+
+# Section headings: numbered ("12.3 Acute Kidney Injury"), ALL CAPS, or short
+# Title Case lines without sentence punctuation.
+NUMBERED_HEADING = re.compile(r"^(chapter\s+)?\d+(\.\d+)*\.?\s+[A-Z][^.!?]{2,80}$", re.IGNORECASE)
+
+
+def is_heading(line: str) -> bool:
+    line = line.strip()
+    if not 4 <= len(line) <= 80 or line[-1] in ".,;:!?" or not line[0].isalnum():
+        return False
+    if NUMBERED_HEADING.match(line):
+        return True
+    words = [word for word in line.split() if word.isalpha()]
+    if len(words) < 2 or len(words) > 10:
+        return False
+    if line.isupper():
+        return True
+    minor = {"and", "or", "of", "the", "in", "on", "for", "to", "with", "a", "an", "by"}
+    return all(word[0].isupper() or word in minor for word in words)
+
+
+def find_headings(text: str) -> list:
+    """(offset, heading) pairs for heading-like lines of a page, in order."""
+    headings = []
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        if is_heading(line):
+            headings.append((offset, line.strip()))
+        offset += len(line)
+    return headings
+
+
+def iter_chunks(pdf_path: str, chunk_size: int = 1000, chunk_overlap: int = 200,
+                workers: int = None):
+    """
+    Yield (chunk_id, text, metadata) for each chunk, page by page. Metadata
+    carries the citation: source file, page number and the section heading
+    in effect where the chunk starts (headings carry over page breaks), plus
+    source_path, which tells files with the same name apart.
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, add_start_index=True
+    )
+    source = os.path.basename(pdf_path)
+    path = source_path(pdf_path)
+    section = ""
+
+    for page_number, text in iter_pages(pdf_path, workers):
+        page = page_number + 1
+        headings = find_headings(text)
+        for doc in splitter.create_documents([text]):
+            offset = doc.metadata.get("start_index", 0)
+            while headings and headings[0][0] <= offset:
+                section = headings.pop(0)[1]
+            content_hash = chunk_id(path, page, doc.page_content)
+            metadata = {
+                "source": source,
+                "source_path": path,
+                "page": page,
+                "section": section,
+                "offset": offset,
+                "content_hash": content_hash,
+            }
+            yield content_hash, doc.page_content, metadata
+        # Headings after the last chunk start still apply to the next page
+        if headings:
+            section = headings[-1][1]
+
+
+def load_manifest(persist_directory: str) -> dict:
+    path = os.path.join(persist_directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(persist_directory: str, manifest: dict):
+    path = os.path.join(persist_directory, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def existing_chunk_ids(collection, pdf_path: str) -> set:
+    """
+    Ids of the stored chunks of pdf_path. Chunks indexed before source_path
+    was recorded are matched by file name alone.
+    """
+    path = source_path(pdf_path)
+    stored = collection.get(where={"source": os.path.basename(pdf_path)}, include=["metadatas"])
+    return {
+        stored_id for stored_id, metadata in zip(stored["ids"], stored["metadatas"])
+        if (metadata or {}).get("source_path", path) == path
+    }
+
+
+def delete_chunks(collection, ids: list):
+    for start in range(0, len(ids), DELETE_BATCH_SIZE):
+        collection.delete(ids=ids[start:start + DELETE_BATCH_SIZE])
+
+
+def ingest(pdf_paths, persist_directory: str = None, batch_size: int = 64,
+           chunk_size: int = 1000, chunk_overlap: int = 200, workers: int = None,
+           force: bool = False, prune: bool = False) -> dict:
+    """
+    Incrementally index pdf_paths into the Chroma store.
+
+    Only chunks whose content hash is not yet stored are embedded; stored
+    chunks of a file that no longer appear in it are deleted. With prune=True,
+    vectors of sources not listed in pdf_paths are deleted as well.
+    Returns counts of added, unchanged and deleted chunks.
+    """
+    persist_directory = persist_directory or runtime.PERSIST_DIRECTORY
+    vectorstore = runtime.get_vectorstore(persist_directory)
+    collection = vectorstore._collection
+    manifest = load_manifest(persist_directory)
+    stats = {"added": 0, "unchanged": 0, "deleted": 0, "skipped_files": 0}
+    settings = {
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "metadata_version": METADATA_VERSION,
+    }
+
+    def flush(batch):
+        ids, texts, metadatas = zip(*batch)
+        # add_texts embeds the whole batch in one call and upserts by id
+        vectorstore.add_texts(texts=list(texts), metadatas=list(metadatas), ids=list(ids))
+        stats["added"] += len(batch)
+        print(f"  {stats['added']} chunks embedded", end="\r")
+
+    def refresh(batch):
+        # Unchanged text keeps its vector; only citation metadata is rewritten
+        ids, _, metadatas = zip(*batch)
+        collection.update(ids=list(ids), metadatas=list(metadatas))
+
+    for pdf_path in pdf_paths:
+        source = source_path(pdf_path)
+        digest = file_hash(pdf_path)
+        entry = manifest.get(source, {})
+        if not force and entry.get("file_hash") == digest and entry.get("settings") == settings:
+            print(f"Skipping {pdf_path} (unchanged)")
+            stats["skipped_files"] += 1
+            continue
+
+        print(f"Indexing {pdf_path}...")
+        stored = existing_chunk_ids(collection, pdf_path)
+        seen = set()
+        batch = []
+        unchanged = []
+        for chunk in iter_chunks(pdf_path, chunk_size, chunk_overlap, workers):
+            content_hash = chunk[0]
+            if content_hash in seen:
+                continue
+            seen.add(content_hash)
+            if content_hash in stored:
+                stats["unchanged"] += 1
+                unchanged.append(chunk)
+                if len(unchanged) >= batch_size * 8:
+                    refresh(unchanged)
+                    unchanged = []
+                continue
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+        if unchanged:
+            refresh(unchanged)
+
+        removed = list(stored - seen)
+        delete_chunks(collection, removed)
+        stats["deleted"] += len(removed)
 
-def load_pdf_text(file_path):
-    text = ""
-    with open(file_path, "rb") as f:
-        reader = PyPDF2.PdfReader(f)
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-    return text
+        manifest[source] = {
+            "file_hash": digest,
+            "settings": settings,
+            "chunks": len(seen),
+            "indexed_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        save_manifest(persist_directory, manifest)
+        print(f"  {source}: {len(seen)} chunks")
 
-pdf_path = r"C:\Users\shrey\OneDrive\Desktop\Projects\AI_medical_assistant\comprehensive-clinical-nephrology.pdf"
+    if prune:
+        keep = {source_path(path) for path in pdf_paths}
+        stored = collection.get(include=["metadatas"])
+        stale = [
+            stored_id for stored_id, metadata in zip(stored["ids"], stored["metadatas"])
+            if (metadata or {}).get("source_path") not in keep
+        ]
+        delete_chunks(collection, stale)
+        stats["deleted"] += len(stale)
+        for source in list(manifest):
+            if source not in keep:
+                del manifest[source]
+        save_manifest(persist_directory, manifest)
 
-print("Loading PDF...")
-pdf_text = load_pdf_text(pdf_path)
+    runtime.invalidate_caches(persist_directory)
+    return stats
 
-# Wrap text in a Document object
-documents = [Document(page_content=pdf_text)]
 
-print("Splitting into chunks...")
-splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-docs = splitter.split_documents(documents)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Embed reference PDFs into the RAG vector store.")
+    parser.add_argument("pdfs", nargs="+", help="PDF files to ingest")
+    parser.add_argument("--persist-dir", default=runtime.PERSIST_DIRECTORY,
+                        help="Chroma persist directory (default: %(default)s)")
+    parser.add_argument("--batch-size", type=int, default=64, help="Chunks per embedding batch")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Page extraction processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-extract files even if their contents have not changed")
+    parser.add_argument("--prune", action="store_true",
+                        help="Delete vectors of sources not listed on the command line "
+                             "(including chunks from the old single-document index)")
+    args = parser.parse_args(argv)
 
-print("Generating embeddings...")
-embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    stats = ingest(
+        args.pdfs,
+        persist_directory=args.persist_dir,
+        batch_size=args.batch_size,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        workers=args.workers,
+        force=args.force,
+        prune=args.prune,
+    )
+    print(
+        f"Indexing complete: {stats['added']} added, {stats['unchanged']} unchanged, "
+        f"{stats['deleted']} deleted, {stats['skipped_files']} files skipped."
+    )
 
-persist_directory = "rag_db"
-print("Saving embeddings to ChromaDB...")
-vectorstore = Chroma.from_documents(docs, embedding_model, persist_directory=persist_directory)
-vectorstore.persist()
 
-print("Embedding and storage complete.")
+if __name__ == "__main__":
+    main()
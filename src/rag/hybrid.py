@@ -0,0 +1,295 @@
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from rag import runtime
+
+# Hybrid retrieval: a local BM25 inverted index catches exact drug names and
+# lab terms ("Carvedilol", "eGFR") that MiniLM similarity misses; its ranking
+# is fused with the vector ranking by reciprocal rank fusion (RRF).
+
+RRF_K = 60
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from", "how",
+    "i", "if", "in", "is", "it", "my", "of", "on", "or", "should", "that", "the", "to",
+    "what", "when", "which", "with", "you", "your",
+}
+
+
+def tokenize(text: str) -> list:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """In-memory Okapi BM25 inverted index over the collection's chunks."""
+
+    def __init__(self, ids, documents, metadatas, k1: float = 1.5, b: float = 0.75):
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.metadatas = list(metadatas)
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)  # term -> [(doc index, term frequency)]
+        self.doc_lengths = []
+
+        for index, text in enumerate(self.documents):
+            counts = Counter(tokenize(text or ""))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                self.postings[term].append((index, frequency))
+
+        total = len(self.documents)
+        self.avg_length = (sum(self.doc_lengths) / total) if total else 0.0
+        self.idf = {
+            term: math.log(1 + (total - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def search(self, query_text: str, k: int = 20) -> list:
+        """Return up to k (doc index, score) pairs, best first."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query_text)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for index, frequency in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[index] / (self.avg_length or 1))
+                scores[index] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+_indexes = {}
+_index_lock = threading.Lock()
+
+
+def get_bm25_index(persist_directory: str = None) -> BM25Index:
+    """
+    BM25 index for the collection, rebuilt when the collection changes on disk.
+    With the quantized backend it is built from the export's chunk table, so
+    workers never open Chroma.
+    """
+    persist_directory = persist_directory or runtime.PERSIST_DIRECTORY
+    quantized = runtime._quantized_index(persist_directory)
+    if quantized is not None:
+        version = ("quantized", quantized.manifest["exported_at"])
+    else:
+        version = runtime.collection_version(persist_directory)
+    cached = _indexes.get(persist_directory)
+    if cached is None or cached[0] != version:
+        with _index_lock:
+            cached = _indexes.get(persist_directory)
+            if cached is None or cached[0] != version:
+                start = time.perf_counter()
+                if quantized is not None:
+                    index = BM25Index(*quantized.all_chunks())
+                else:
+                    collection = runtime.get_vectorstore(persist_directory)._collection
+                    data = collection.get(include=["documents", "metadatas"])
+                    index = BM25Index(data["ids"], data["documents"], data["metadatas"])
+                print(f"Built BM25 index over {len(index)} chunks in {time.perf_counter() - start:.2f}s")
+                cached = (version, index)
+                _indexes[persist_directory] = cached
+    return cached[1]
+
+
+def _vector_ranking(query_text: str, n: int, persist_directory: str) -> list:
+    quantized = runtime._quantized_index(persist_directory)
+    if quantized is not None:
+        return quantized.search(query_text, k=n)
+    collection = runtime.get_vectorstore(persist_directory)._collection
+    result = collection.query(
+        query_embeddings=[runtime.embed_query(query_text)],
+        n_results=n,
+        include=["documents", "metadatas"],
+    )
+    return list(zip(result["ids"][0], result["documents"][0], result["metadatas"][0]))
+
+
+def _vector_rankings(query_texts: list, n: int, persist_directory: str) -> list:
+    """_vector_ranking for several queries: one embedding pass and one collection query."""
+    embeddings = runtime.embed_queries(query_texts)
+    quantized = runtime._quantized_index(persist_directory)
+    if quantized is not None:
+        return [quantized.chunks([row for row, _ in quantized.search_vector(embedding, n)])
+                for embedding in embeddings]
+    collection = runtime.get_vectorstore(persist_directory)._collection
+    result = collection.query(
+        query_embeddings=embeddings,
+        n_results=n,
+        include=["documents", "metadatas"],
+    )
+    return [list(zip(ids, documents, metadatas))
+            for ids, documents, metadatas in zip(result["ids"], result["documents"], result["metadatas"])]
+
+
+def _cache_key(query_text: str, candidates: int, rerank: bool, persist_directory: str) -> tuple:
+    # The fused ranking is cached whole, so lookups with any k <= candidates share it
+    return ("hybrid", persist_directory, runtime.normalize_query(query_text), candidates, rerank)
+
+
+def _fuse(query_text: str, vector_hits: list, candidates: int, rerank: bool, persist_directory: str) -> list:
+    """RRF of vector_hits and the BM25 ranking; the top `candidates` documents, best first."""
+    from langchain.schema import Document
+
+    fused = defaultdict(float)
+    chunks = {}
+
+    for rank, (chunk_id, text, metadata) in enumerate(vector_hits):
+        fused[chunk_id] += 1.0 / (RRF_K + rank + 1)
+        chunks[chunk_id] = (text, metadata)
+
+    index = get_bm25_index(persist_directory)
+    for rank, (doc_index, _) in enumerate(index.search(query_text, candidates)):
+        chunk_id = index.ids[doc_index]
+        fused[chunk_id] += 1.0 / (RRF_K + rank + 1)
+        chunks.setdefault(chunk_id, (index.documents[doc_index], index.metadatas[doc_index]))
+
+    ranked = sorted(fused, key=fused.get, reverse=True)[:candidates]
+
+    if rerank and ranked:
+        scores = runtime.get_cross_encoder().predict(
+            [(query_text, chunks[chunk_id][0]) for chunk_id in ranked]
+        )
+        ranked = [chunk_id for _, chunk_id in sorted(zip(scores, ranked), reverse=True)]
+
+    return [Document(page_content=chunks[chunk_id][0], metadata=chunks[chunk_id][1] or {})
+            for chunk_id in ranked]
+
+
+def hybrid_search(query_text: str, k: int = 3, candidates: int = 20, rerank: bool = None,
+                  persist_directory: str = None) -> list:
+    """
+    Top-k documents by RRF over the BM25 and vector rankings (top `candidates`
+    of each). With rerank=True (default: RAG_RERANK env var), the fused top
+    `candidates` are re-scored by the CPU cross-encoder before cutting to k.
+    """
+    persist_directory = persist_directory or runtime.PERSIST_DIRECTORY
+    if rerank is None:
+        rerank = os.getenv("RAG_RERANK", "0") == "1"
+    runtime.check_collection_version(persist_directory)
+
+    key = _cache_key(query_text, candidates, rerank, persist_directory)
+    ranked = runtime.result_cache.get(key)
+    if ranked is None:
+        vector_hits = _vector_ranking(query_text, candidates, persist_directory)
+        ranked = _fuse(query_text, vector_hits, candidates, rerank, persist_directory)
+        runtime.result_cache.set(key, ranked)
+    return ranked[:k]
+
+
+def hybrid_search_batch(query_texts: list, k: int = 3, dedupe: bool = True, candidates: int = 20,
+                        rerank: bool = None, persist_directory: str = None) -> list:
+    """
+    hybrid_search for several queries. The vector rankings of all uncached
+    queries come from one batched collection query; each query is then fused
+    with BM25 and cached under the same key hybrid_search uses, so single and
+    batch lookups reuse each other's results. With dedupe=True a chunk is
+    returned only for the first query that retrieves it, topped up from
+    later-ranked hits. Returns one list of documents per query, in input order.
+    """
+    if not query_texts:
+        return []
+    persist_directory = persist_directory or runtime.PERSIST_DIRECTORY
+    if rerank is None:
+        rerank = os.getenv("RAG_RERANK", "0") == "1"
+    runtime.check_collection_version(persist_directory)
+
+    # Over-fetch so de-duplicated queries can still be filled up to k
+    n_results = k * min(len(query_texts), 4) if dedupe else k
+    candidates = max(candidates, n_results)
+
+    keys = [_cache_key(query_text, candidates, rerank, persist_directory) for query_text in query_texts]
+    rankings = [runtime.result_cache.get(key) for key in keys]
+    missing = {}
+    for key, query_text, ranked in zip(keys, query_texts, rankings):
+        if ranked is None:
+            missing.setdefault(key, query_text)
+    if missing:
+        fresh = {}
+        hits = _vector_rankings(list(missing.values()), candidates, persist_directory)
+        for (key, query_text), vector_hits in zip(missing.items(), hits):
+            fresh[key] = _fuse(query_text, vector_hits, candidates, rerank, persist_directory)
+            runtime.result_cache.set(key, fresh[key])
+        rankings = [ranked if ranked is not None else fresh[key] for key, ranked in zip(keys, rankings)]
+
+    seen = set()
+    batches = []
+    for ranked in rankings:
+        selected = []
+        for document in ranked[:n_results]:
+            chunk = (document.page_content, tuple(sorted((document.metadata or {}).items())))
+            if dedupe and chunk in seen:
+                continue
+            seen.add(chunk)
+            selected.append(document)
+            if len(selected) == k:
+                break
+        batches.append(selected)
+    return batches
+
+
+# Fixed question set: each question is paired with a term that a relevant
+# chunk must contain. Used to compare retrieval modes offline.
+BENCHMARK_QUESTIONS = [
+    ("What is the recommended dose of Carvedilol in heart failure with CKD?", "carvedilol"),
+    ("How is eGFR calculated?", "egfr"),
+    ("What foods should I avoid with chronic kidney disease?", "potassium"),
+    ("Can I take ibuprofen with kidney disease?", "nsaid"),
+    ("What does a high creatinine level mean?", "creatinine"),
+    ("How does Ramipril affect the kidneys?", "ace inhibitor"),
+    ("What are the signs of hyperkalemia?", "hyperkalemia"),
+    ("Why do I need a phosphate binder?", "phosphate"),
+    ("What causes acute kidney injury after an infection?", "acute kidney injury"),
+    ("How much fluid should a dialysis patient drink?", "fluid"),
+    ("What is erythropoietin used for in renal failure?", "erythropoietin"),
+    ("What blood pressure target is recommended in CKD?", "blood pressure"),
+]
+
+
+def benchmark(k: int = 5, persist_directory: str = None):
+    """Print recall@k and mean per-query latency for vector, hybrid and reranked modes."""
+    def vector(query):
+        return runtime.get_vectorstore(persist_directory).similarity_search_by_vector(
+            runtime.embed_query(query), k=k
+        )
+
+    modes = {
+        "vector": vector,
+        "hybrid": lambda query: hybrid_search(query, k=k, rerank=False, persist_directory=persist_directory),
+        "hybrid+rerank": lambda query: hybrid_search(query, k=k, rerank=True, persist_directory=persist_directory),
+    }
+
+    # Warm up models and the BM25 index so they are not timed
+    get_bm25_index(persist_directory)
+    runtime.get_cross_encoder()
+    for question, _ in BENCHMARK_QUESTIONS:
+        runtime.embed_query(question)
+
+    for name, search in modes.items():
+        runtime.result_cache.clear()
+        hits = 0
+        start = time.perf_counter()
+        for question, expected in BENCHMARK_QUESTIONS:
+            documents = search(question)
+            if any(expected in doc.page_content.lower() for doc in documents):
+                hits += 1
+        latency_ms = (time.perf_counter() - start) * 1000 / len(BENCHMARK_QUESTIONS)
+        print(f"{name:>14}: recall@{k} = {hits / len(BENCHMARK_QUESTIONS):.2f}, {latency_ms:7.1f} ms/query")
+
+
+__all__ = [
+    "BM25Index", "tokenize", "get_bm25_index", "hybrid_search", "hybrid_search_batch",
+    "benchmark", "BENCHMARK_QUESTIONS",
+]
+
+
+if __name__ == "__main__":
+    # Run from src/ so rag_db resolves: RAG_DB_DIR=../rag_db python -m rag.hybrid
+    benchmark()
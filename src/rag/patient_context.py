@@ -0,0 +1,205 @@
+import os
+import queue
+import sys
+import threading
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+from patient_data.lookup import PatientLookup, get_lookup, normalize_name
+from rag import runtime
+
+# Per-patient context documents. Each discharge summary is rendered into a
+# few short sections (diagnosis, medications, diet, ...) and embedded into a
+# separate Chroma store, tagged with its discharge row id. Retrieval filters
+# on the id of the discharge the database tool returns for the patient, so a
+# query only ever sees that one record: not an earlier discharge of the same
+# patient, nor another patient with the same name. Inserting patients never
+# touches the textbook collection (whose caches and BM25 index stay valid).
+#
+# Sections are usually written by backend.py, a separate process. Chroma
+# loads its vector index once per process, so app.py only ranks sections
+# added after it started by embedding them per query (see
+# patient_context_search) until it is restarted.
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+PATIENT_PERSIST_DIRECTORY = os.getenv("RAG_PATIENT_DB_DIR", os.path.join(PROJECT_ROOT, "rag_patient_db"))
+SOURCE_NAME = "Discharge summary"
+
+SECTIONS = [
+    ("Diagnosis", lambda r: f"{r['patient_name']} was discharged on {r['discharge_date']} "
+                            f"with a primary diagnosis of {r['primary_diagnosis']}."),
+    ("Medications", lambda r: "Discharge medications: " + "; ".join(
+        " ".join(part for part in (m["drug"], m["dose"], m["frequency"]) if part)
+        for m in r.get("medications") or []
+    ) if r.get("medications") else ""),
+    ("Dietary restrictions", lambda r: f"Dietary restrictions: {r['dietary_restrictions']}"
+                                       if r.get("dietary_restrictions") else ""),
+    ("Follow-up", lambda r: f"Follow-up: {r['follow_up']}" if r.get("follow_up") else ""),
+    ("Warning signs", lambda r: f"Warning signs to watch for: {r['warning_signs']}"
+                                if r.get("warning_signs") else ""),
+    ("Discharge instructions", lambda r: f"Discharge instructions: {r['discharge_instructions']}"
+                                         if r.get("discharge_instructions") else ""),
+]
+
+
+def render_patient_documents(discharge_id: int, record: dict) -> list:
+    """(chunk id, text, metadata) for each non-empty section of the record."""
+    documents = []
+    for section, render in SECTIONS:
+        text = render(record).strip()
+        if not text:
+            continue
+        documents.append((
+            f"patient-{discharge_id}-{section.lower().replace(' ', '-')}",
+            text,
+            {
+                "source": SOURCE_NAME,
+                "section": section,
+                "patient_key": normalize_name(record["patient_name"]),
+                "discharge_id": discharge_id,
+            },
+        ))
+    return documents
+
+
+def index_patients(discharge_ids, lookup: PatientLookup = None,
+                   persist_directory: str = PATIENT_PERSIST_DIRECTORY) -> int:
+    """
+    (Re-)embed the discharge summaries with the given row ids in one batch.
+    Returns the number of sections written.
+    """
+    lookup = lookup or PatientLookup()
+    collection = runtime.get_vectorstore(persist_directory)._collection
+    documents = []
+    for discharge_id in discharge_ids:
+        record = lookup.fetch_by_id(discharge_id)
+        if record is not None:
+            documents.extend(render_patient_documents(discharge_id, record))
+    for discharge_id in discharge_ids:
+        # Sections that became empty on edit must not linger
+        collection.delete(where={"discharge_id": discharge_id})
+    if not documents:
+        return 0
+
+    ids, texts, metadatas = zip(*documents)
+    collection.add(
+        ids=list(ids),
+        documents=list(texts),
+        metadatas=list(metadatas),
+        embeddings=runtime.get_embedding_model().embed_documents(list(texts)),
+    )
+    return len(documents)
+
+
+def _rank_locally(query_embedding: list, texts: list, metadatas: list, k: int) -> list:
+    """Cosine ranking of a handful of sections, embedded on the spot."""
+    def cosine(a, b):
+        dot = sum(x * y for x, y in zip(a, b))
+        norm = (sum(x * x for x in a) * sum(y * y for y in b)) ** 0.5
+        return dot / norm if norm else 0.0
+
+    embeddings = runtime.get_embedding_model().embed_documents(texts)
+    scored = sorted(zip(texts, metadatas, embeddings),
+                    key=lambda row: cosine(query_embedding, row[2]), reverse=True)
+    return [(text, metadata) for text, metadata, _ in scored[:k]]
+
+
+def patient_context_search(patient_name: str, query_text: str, k: int = 2, discharge_id: int = None,
+                           persist_directory: str = PATIENT_PERSIST_DIRECTORY) -> list:
+    """
+    Top-k sections of the patient's discharge summary for query_text. Only
+    the discharge with discharge_id is searched; by default that is the
+    record the database tool returns for patient_name (the latest one).
+    """
+    from langchain.schema import Document
+
+    if not os.path.exists(os.path.join(persist_directory, "chroma.sqlite3")):
+        return []
+    if discharge_id is None:
+        record = get_lookup().fetch_by_name(patient_name)
+        if record is None:
+            return []
+        discharge_id = record["discharge_id"]
+
+    collection = runtime.get_vectorstore(persist_directory)._collection
+    where = {"discharge_id": discharge_id}
+    # The metadata table is read from disk on every call, so this also sees
+    # sections written by other processes
+    stored = collection.get(where=where, include=["documents", "metadatas"])
+    if not stored["ids"]:
+        return []
+    query_embedding = runtime.embed_query(query_text)
+    try:
+        # hnswlib cannot return more filtered neighbours than exist
+        result = collection.query(
+            query_embeddings=[query_embedding],
+            n_results=min(k, len(stored["ids"])),
+            where=where,
+            include=["documents", "metadatas"],
+        )
+        rows = list(zip(result["documents"][0], result["metadatas"][0]))
+    except RuntimeError:
+        # Sections added by another process after this one loaded the
+        # vector index: hnswlib finds fewer than n_results of them
+        rows = []
+    if len(rows) < min(k, len(stored["ids"])):
+        rows = _rank_locally(query_embedding, stored["documents"], stored["metadatas"], k)
+    return [Document(page_content=text, metadata=metadata or {}) for text, metadata in rows]
+
+
+class PatientIndexer:
+    """Embeds newly inserted records on a background thread, batching bursts."""
+
+    def __init__(self, db_path: str = None, batch_size: int = 64):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.indexed = 0
+        self.failed = 0
+
+    def enqueue(self, discharge_ids):
+        for discharge_id in discharge_ids:
+            self._queue.put(discharge_id)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="patient-indexer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        lookup = PatientLookup(self.db_path) if self.db_path else PatientLookup()
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                index_patients(sorted(set(batch)), lookup)
+                self.indexed += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"Failed to index patient context for ids {batch}: {e}")
+            for _ in batch:
+                self._queue.task_done()
+
+    def join(self):
+        self._queue.join()
+
+
+__all__ = [
+    "render_patient_documents", "index_patients", "patient_context_search",
+    "PatientIndexer", "PATIENT_PERSIST_DIRECTORY",
+]
+
+
+if __name__ == "__main__":
+    # Backfill every existing record: python src/rag/patient_context.py
+    lookup = PatientLookup()
+    ids = [row[0] for row in lookup.get_connection().execute("SELECT id FROM discharge_summaries")]
+    for start in range(0, len(ids), 256):
+        index_patients(ids[start:start + 256], lookup)
+    print(f"Indexed discharge summaries for {len(ids)} patients into {PATIENT_PERSIST_DIRECTORY}")
@@ -0,0 +1,299 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+from rag import runtime
+
+# Compact, read-only export of the Chroma collection for serving:
+#   vectors.npy   int8 vectors (one row per chunk), opened with mmap so every
+#                 worker process shares the same pages through the OS cache
+#   scales.npy    float32 per-row dequantization scale
+#   chunks.sqlite3  row -> chunk id, text and metadata
+#   index.json    manifest (dimension, count, model, source collection version)
+# Vectors are L2-normalized before symmetric per-row int8 quantization, so
+# ranking by the dequantized dot product approximates Chroma's ranking for
+# the normalized MiniLM embeddings. Search scans the memory-mapped matrix in
+# blocks, which keeps per-query scratch memory bounded.
+
+QUANTIZED_INDEX_DIR = os.getenv("RAG_QUANTIZED_INDEX_DIR", os.path.join(runtime.PERSIST_DIRECTORY, "quantized"))
+FORMAT_VERSION = 1
+EXPORT_PAGE_SIZE = 5000
+SEARCH_BLOCK_ROWS = 65536
+
+
+def export_index(output_dir: str = QUANTIZED_INDEX_DIR, persist_directory: str = None) -> dict:
+    """Write the quantized index for the Chroma collection; returns the manifest."""
+    import numpy as np
+    from numpy.lib.format import open_memmap
+
+    persist_directory = persist_directory or runtime.PERSIST_DIRECTORY
+    collection = runtime.get_vectorstore(persist_directory)._collection
+    count = collection.count()
+    if not count:
+        raise ValueError(f"Collection in {persist_directory} is empty")
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Write to temporary names and swap in at the end, so running workers
+    # never see a half-written index
+    tmp = {name: os.path.join(output_dir, f".{name}.tmp")
+           for name in ("vectors.npy", "scales.npy", "chunks.sqlite3")}
+    if os.path.exists(tmp["chunks.sqlite3"]):
+        os.remove(tmp["chunks.sqlite3"])
+
+    def discard(message):
+        for path in tmp.values():
+            if os.path.exists(path):
+                os.remove(path)
+        raise ValueError(message)
+
+    vectors = scales = None
+    db = sqlite3.connect(tmp["chunks.sqlite3"])
+    db.execute("CREATE TABLE chunks (row INTEGER PRIMARY KEY, chunk_id TEXT NOT NULL, "
+               "document TEXT NOT NULL, metadata TEXT NOT NULL)")
+    row = 0
+    for offset in range(0, count, EXPORT_PAGE_SIZE):
+        page = collection.get(include=["embeddings", "documents", "metadatas"],
+                              limit=EXPORT_PAGE_SIZE, offset=offset)
+        if not page["ids"]:
+            break
+        if row + len(page["ids"]) > count:
+            db.close()
+            del vectors, scales
+            discard(f"Collection in {persist_directory} grew during export; run it again")
+        embeddings = np.asarray(page["embeddings"], dtype="float32")
+        if vectors is None:
+            vectors = open_memmap(tmp["vectors.npy"], mode="w+", dtype="int8", shape=(count, embeddings.shape[1]))
+            scales = open_memmap(tmp["scales.npy"], mode="w+", dtype="float32", shape=(count,))
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings /= np.where(norms == 0, 1, norms)
+        page_scales = np.abs(embeddings).max(axis=1) / 127.0
+        page_scales[page_scales == 0] = 1.0
+        n = len(embeddings)
+        vectors[row:row + n] = np.round(embeddings / page_scales[:, None]).astype("int8")
+        scales[row:row + n] = page_scales
+        db.executemany(
+            "INSERT INTO chunks (row, chunk_id, document, metadata) VALUES (?, ?, ?, ?)",
+            [(row + i, chunk_id, document or "", json.dumps(metadata or {}))
+             for i, (chunk_id, document, metadata) in
+             enumerate(zip(page["ids"], page["documents"], page["metadatas"]))]
+        )
+        row += n
+
+    db.commit()
+    db.close()
+    if vectors is None:
+        discard(f"Collection in {persist_directory} returned no chunks")
+    vectors.flush()
+    scales.flush()
+    dimension = vectors.shape[1]
+    del vectors, scales
+    if row != count:
+        # Unwritten rows would score 0 and have no chunk metadata
+        discard(f"Collection in {persist_directory} returned {row} of {count} chunks "
+                f"(changed during export?); run it again")
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "count": row,
+        "dimension": dimension,
+        "embedding_model": runtime.EMBEDDING_MODEL_NAME,
+        "collection_version": runtime.collection_version(persist_directory),
+        "exported_at": time.time(),
+    }
+    for name, path in tmp.items():
+        os.replace(path, os.path.join(output_dir, name))
+    with open(os.path.join(output_dir, "index.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class QuantizedIndex:
+    """Read-only searcher over an exported index directory."""
+
+    def __init__(self, index_dir: str = QUANTIZED_INDEX_DIR):
+        import numpy as np
+
+        with open(os.path.join(index_dir, "index.json")) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported quantized index format in {index_dir}")
+        self.index_dir = index_dir
+        self.vectors = np.load(os.path.join(index_dir, "vectors.npy"), mmap_mode="r")
+        self.scales = np.load(os.path.join(index_dir, "scales.npy"), mmap_mode="r")
+        self._chunks_path = os.path.join(index_dir, "chunks.sqlite3")
+        self._local = threading.local()
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self._chunks_path}?mode=ro", uri=True)
+            self._local.conn = conn
+        return conn
+
+    def is_stale(self, persist_directory: str = None) -> bool:
+        """True if the Chroma collection changed after this index was exported."""
+        return self.manifest.get("collection_version") != runtime.collection_version(persist_directory)
+
+    def search_vector(self, query_vector, k: int = 3) -> list:
+        """(row, score) pairs for the k best rows, best first."""
+        import numpy as np
+
+        query = np.asarray(query_vector, dtype="float32")
+        query = query / (np.linalg.norm(query) or 1.0)
+        best_rows = np.empty(0, dtype="int64")
+        best_scores = np.empty(0, dtype="float32")
+        for start in range(0, len(self.vectors), SEARCH_BLOCK_ROWS):
+            block = self.vectors[start:start + SEARCH_BLOCK_ROWS]
+            scores = (block.astype("float32") @ query) * self.scales[start:start + len(block)]
+            if len(scores) > k:
+                top = np.argpartition(-scores, k)[:k]
+            else:
+                top = np.arange(len(scores))
+            best_rows = np.concatenate([best_rows, top + start])
+            best_scores = np.concatenate([best_scores, scores[top]])
+            if len(best_rows) > k:
+                keep = np.argpartition(-best_scores, k)[:k]
+                best_rows, best_scores = best_rows[keep], best_scores[keep]
+        order = np.argsort(-best_scores)
+        return [(int(best_rows[i]), float(best_scores[i])) for i in order]
+
+    def chunks(self, rows: list) -> list:
+        """(chunk id, document, metadata) for the given rows, in the same order."""
+        if not rows:
+            return []
+        found = {
+            row: (chunk_id, document, json.loads(metadata))
+            for row, chunk_id, document, metadata in self._conn().execute(
+                f"SELECT row, chunk_id, document, metadata FROM chunks "
+                f"WHERE row IN ({', '.join('?' for _ in rows)})", rows
+            )
+        }
+        return [found[row] for row in rows]
+
+    def all_chunks(self):
+        """ids, documents, metadatas of every chunk (for building the BM25 index)."""
+        rows = self._conn().execute("SELECT chunk_id, document, metadata FROM chunks ORDER BY row").fetchall()
+        return [r[0] for r in rows], [r[1] for r in rows], [json.loads(r[2]) for r in rows]
+
+    def search(self, query_text: str, k: int = 3) -> list:
+        """Top-k (chunk id, document, metadata) for query_text."""
+        hits = self.search_vector(runtime.embed_query(query_text), k)
+        return self.chunks([row for row, _ in hits])
+
+
+_index = None
+_index_exported = None
+_index_lock = threading.Lock()
+_stale_reported = set()
+
+
+def get_quantized_index(index_dir: str = QUANTIZED_INDEX_DIR):
+    """
+    Process-wide QuantizedIndex, or None if no index has been exported or the
+    Chroma collection changed since the export; callers then search Chroma.
+    A new export is picked up on the next call.
+    """
+    global _index, _index_exported
+    try:
+        exported = os.stat(os.path.join(index_dir, "index.json")).st_mtime_ns
+    except OSError:
+        return None
+    if _index is None or _index_exported != exported:
+        with _index_lock:
+            if _index is None or _index_exported != exported:
+                _index = QuantizedIndex(index_dir)
+                _index_exported = exported
+    index = _index
+    if index.is_stale():
+        version = runtime.collection_version()
+        if version not in _stale_reported:
+            _stale_reported.add(version)
+            print("Quantized index is older than the Chroma collection; searching Chroma until it is re-exported")
+        return None
+    return index
+
+
+def query_knowledge_base(query_text, top_k=3):
+    """Same contract as rag.retrieve.query_knowledge_base, served from the quantized index."""
+    from langchain.schema import Document
+
+    print(f"Querying: {query_text}")
+    index = get_quantized_index()
+    if index is None:
+        raise FileNotFoundError(f"No current quantized index in {QUANTIZED_INDEX_DIR}; run quantized_index.py export")
+    return [Document(page_content=document, metadata=metadata)
+            for _, document, metadata in index.search(query_text, k=top_k)]
+
+
+def evaluate(index_dir: str = QUANTIZED_INDEX_DIR, k: int = 5, sample_chunks: int = 200,
+             persist_directory: str = None):
+    """
+    Recall@k of the quantized index against Chroma's own top-k, latency per
+    query and on-disk size vs. float32 vectors. Queries are the retrieval
+    benchmark questions plus a sample of chunk texts from the corpus.
+    """
+    import random
+
+    from rag.hybrid import BENCHMARK_QUESTIONS
+
+    index = QuantizedIndex(index_dir)
+    collection = runtime.get_vectorstore(persist_directory)._collection
+    ids, documents, _ = index.all_chunks()
+    rng = random.Random(0)
+    sampled = rng.sample(range(len(documents)), min(sample_chunks, len(documents)))
+    queries = [question for question, _ in BENCHMARK_QUESTIONS] + [documents[i][:300] for i in sampled]
+    embeddings = runtime.embed_queries(queries)
+
+    overlap, chroma_time, quantized_time = 0, 0.0, 0.0
+    for embedding in embeddings:
+        start = time.perf_counter()
+        expected = collection.query(query_embeddings=[embedding], n_results=k, include=[])["ids"][0]
+        chroma_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        rows = [row for row, _ in index.search_vector(embedding, k)]
+        quantized_time += time.perf_counter() - start
+        got = {chunk_id for chunk_id, _, _ in index.chunks(rows)}
+        overlap += len(got & set(expected)) / max(1, len(expected))
+
+    sizes = {name: os.path.getsize(os.path.join(index_dir, name))
+             for name in ("vectors.npy", "scales.npy", "chunks.sqlite3")}
+    float32_bytes = len(index) * index.vectors.shape[1] * 4
+    print(f"Chunks: {len(index):,}, dimension {index.vectors.shape[1]}")
+    print(f"Recall@{k} vs Chroma over {len(queries)} queries: {overlap / len(queries):.3f}")
+    print(f"Latency: Chroma {1000 * chroma_time / len(queries):.2f} ms/query, "
+          f"quantized {1000 * quantized_time / len(queries):.2f} ms/query")
+    print(f"Vectors: {sizes['vectors.npy'] / 1e6:.1f} MB int8 (+{sizes['scales.npy'] / 1e6:.2f} MB scales) "
+          f"vs {float32_bytes / 1e6:.1f} MB float32; metadata {sizes['chunks.sqlite3'] / 1e6:.1f} MB")
+
+
+__all__ = [
+    "export_index", "QuantizedIndex", "get_quantized_index", "query_knowledge_base",
+    "evaluate", "QUANTIZED_INDEX_DIR",
+]
+
+
+if __name__ == "__main__":
+    # Run from the project root: python src/rag/quantized_index.py export|evaluate
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Quantized memory-mapped vector index")
+    parser.add_argument("command", choices=["export", "evaluate"])
+    parser.add_argument("--dir", default=QUANTIZED_INDEX_DIR, help="index directory")
+    parser.add_argument("-k", type=int, default=5, help="k for recall@k")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        print(json.dumps(export_index(args.dir), indent=2))
+    else:
+        evaluate(args.dir, k=args.k)
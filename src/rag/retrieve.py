@@ -1,11 +1,39 @@
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.vectorstores import Chroma
-
-persist_directory = "rag_db"
-embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-db = Chroma(persist_directory=persist_directory, embedding_function=embedding_model)
+import os
+import sys
+parent_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+from rag.runtime import similarity_search, similarity_search_batch
 
 def query_knowledge_base(query_text, top_k=3):
     print(f"Querying: {query_text}")
-    results = db.similarity_search(query_text, k=top_k)
+    results = similarity_search(query_text, k=top_k)
     return results
+
+def query_knowledge_base_batch(query_texts, top_k=3, dedupe=True):
+    """
+    Run several queries with one batched embedding pass and one collection
+    query. Returns {query: [Document, ...]} in input order.
+    """
+    print(f"Querying {len(query_texts)} questions in one batch")
+    results = similarity_search_batch(list(query_texts), k=top_k, dedupe=dedupe)
+    return dict(zip(query_texts, results))
+
+
+def format_citation(metadata: dict) -> str:
+    """Human-readable citation for a chunk's metadata."""
+    metadata = metadata or {}
+    parts = [metadata.get("source") or "Nephrology reference index"]
+    if metadata.get("page"):
+        parts.append(f"p. {metadata['page']}")
+    if metadata.get("section"):
+        parts.append(f"section \"{metadata['section']}\"")
+    return ", ".join(parts)
+
+
+def format_results(results, max_chars=500):
+    """Numbered excerpts, each preceded by its citation."""
+    return "\n\n".join(
+        f"[{i}] Source: {format_citation(doc.metadata)}\n{doc.page_content[:max_chars]}"
+        for i, doc in enumerate(results, start=1)
+    )
@@ -0,0 +1,263 @@
+import os
+import re
+import threading
+
+from rag.cache import TTLCache
+
+# Shared retrieval runtime: one embedding model and one Chroma handle per
+# process, created on first use instead of at import time.
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+RERANKER_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+PERSIST_DIRECTORY = os.getenv("RAG_DB_DIR", "rag_db")
+# "chroma" (default) or "quantized": serve similarity search from the
+# memory-mapped int8 export (see rag/quantized_index.py)
+VECTOR_BACKEND = os.getenv("RAG_VECTOR_BACKEND", "chroma").lower()
+
+_lock = threading.RLock()
+_embedding_model = None
+_cross_encoder = None
+_vectorstores = {}
+
+# Query embeddings depend only on the model; result sets also depend on the
+# collection contents and are dropped whenever rag_db changes on disk.
+embedding_cache = TTLCache(
+    max_size=int(os.getenv("RAG_EMBEDDING_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("RAG_EMBEDDING_CACHE_TTL", "86400")),
+)
+result_cache = TTLCache(
+    max_size=int(os.getenv("RAG_RESULT_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("RAG_RESULT_CACHE_TTL", "3600")),
+)
+_collection_versions = {}
+
+
+def get_embedding_model():
+    """Return the process-wide MiniLM embedding model, loading it on first call."""
+    global _embedding_model
+    if _embedding_model is None:
+        with _lock:
+            if _embedding_model is None:
+                from langchain.embeddings import HuggingFaceEmbeddings
+                print(f"Loading embedding model {EMBEDDING_MODEL_NAME}...")
+                _embedding_model = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME)
+    return _embedding_model
+
+
+def get_cross_encoder():
+    """Return the process-wide CPU cross-encoder reranker, loading it on first call."""
+    global _cross_encoder
+    if _cross_encoder is None:
+        with _lock:
+            if _cross_encoder is None:
+                from sentence_transformers import CrossEncoder
+                print(f"Loading reranker {RERANKER_MODEL_NAME}...")
+                _cross_encoder = CrossEncoder(RERANKER_MODEL_NAME, device="cpu")
+    return _cross_encoder
+
+
+def get_vectorstore(persist_directory: str = None):
+    """Return the shared Chroma handle for persist_directory (default: rag_db)."""
+    persist_directory = persist_directory or PERSIST_DIRECTORY
+    db = _vectorstores.get(persist_directory)
+    if db is None:
+        with _lock:
+            db = _vectorstores.get(persist_directory)
+            if db is None:
+                from langchain.vectorstores import Chroma
+                db = Chroma(
+                    persist_directory=persist_directory,
+                    embedding_function=get_embedding_model()
+                )
+                _vectorstores[persist_directory] = db
+    return db
+
+
+def is_loaded() -> bool:
+    return _embedding_model is not None
+
+
+def normalize_query(query_text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace for cache keys."""
+    return " ".join(re.sub(r"[^\w\s]", " ", query_text.lower()).split())
+
+
+def collection_version(persist_directory: str = None):
+    """Modification time of the collection's sqlite file (None if missing)."""
+    path = os.path.join(persist_directory or PERSIST_DIRECTORY, "chroma.sqlite3")
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def invalidate_caches(persist_directory: str = None):
+    """Drop cached result sets, e.g. after re-indexing the collection."""
+    result_cache.clear()
+    _collection_versions.pop(persist_directory or PERSIST_DIRECTORY, None)
+
+
+def check_collection_version(persist_directory: str = None):
+    """Clear cached results if the collection changed on disk since the last check."""
+    persist_directory = persist_directory or PERSIST_DIRECTORY
+    version = collection_version(persist_directory)
+    if _collection_versions.get(persist_directory, version) != version:
+        print("RAG collection changed, clearing cached results")
+        result_cache.clear()
+    _collection_versions[persist_directory] = version
+
+
+def embed_query(query_text: str) -> list:
+    """
+    Embedding for query_text, served from the LRU cache when possible. The
+    cache is keyed on the normalized text, but the original text is embedded.
+    """
+    key = normalize_query(query_text)
+    embedding = embedding_cache.get(key)
+    if embedding is None:
+        embedding = get_embedding_model().embed_query(query_text)
+        embedding_cache.set(key, embedding)
+    return embedding
+
+
+def embed_queries(query_texts: list) -> list:
+    """
+    Embeddings for several queries; cache misses are embedded together in a
+    single batched forward pass (the first original text per cache key).
+    """
+    keys = [normalize_query(text) for text in query_texts]
+    embeddings = [embedding_cache.get(key) for key in keys]
+    missing = {}
+    for key, text, embedding in zip(keys, query_texts, embeddings):
+        if embedding is None:
+            missing.setdefault(key, text)
+    if missing:
+        fresh = dict(zip(missing, get_embedding_model().embed_documents(list(missing.values()))))
+        for key, embedding in fresh.items():
+            embedding_cache.set(key, embedding)
+        embeddings = [
+            embedding if embedding is not None else fresh[key]
+            for key, embedding in zip(keys, embeddings)
+        ]
+    return embeddings
+
+
+def similarity_search_batch(query_texts: list, k: int = 3, dedupe: bool = True,
+                            persist_directory: str = None) -> list:
+    """
+    Top-k documents for each query, searched in one batched collection query.
+    With dedupe=True a chunk is returned only for the first query that
+    retrieves it, and later queries are topped up from their next-best hits.
+    Returns one list of documents per query, in input order.
+    """
+    from langchain.schema import Document
+
+    if not query_texts:
+        return []
+    persist_directory = persist_directory or PERSIST_DIRECTORY
+    check_collection_version(persist_directory)
+
+    # Over-fetch so de-duplicated queries can still be filled up to k
+    n_results = k * min(len(query_texts), 4) if dedupe else k
+    collection = get_vectorstore(persist_directory)._collection
+    result = collection.query(
+        query_embeddings=embed_queries(query_texts),
+        n_results=n_results,
+        include=["documents", "metadatas"],
+    )
+
+    seen = set()
+    batches = []
+    for ids, documents, metadatas in zip(result["ids"], result["documents"], result["metadatas"]):
+        selected = []
+        for chunk_id, text, metadata in zip(ids, documents, metadatas):
+            if dedupe and chunk_id in seen:
+                continue
+            seen.add(chunk_id)
+            selected.append(Document(page_content=text, metadata=metadata or {}))
+            if len(selected) == k:
+                break
+        batches.append(selected)
+    return batches
+
+
+def _quantized_index(persist_directory: str):
+    """
+    The exported int8 index when RAG_VECTOR_BACKEND=quantized and one exists
+    for the default collection, else None (search Chroma).
+    """
+    if VECTOR_BACKEND != "quantized" or persist_directory != PERSIST_DIRECTORY:
+        return None
+    from rag.quantized_index import get_quantized_index
+    return get_quantized_index()
+
+
+def similarity_search(query_text: str, k: int = 3, persist_directory: str = None) -> list:
+    """
+    Top-k documents for query_text. Identical (after normalization) queries
+    are answered from cache until the TTL expires or the collection changes.
+    """
+    persist_directory = persist_directory or PERSIST_DIRECTORY
+    check_collection_version(persist_directory)
+
+    key = (persist_directory, normalize_query(query_text), k)
+    results = result_cache.get(key)
+    if results is None:
+        quantized = _quantized_index(persist_directory)
+        if quantized is not None:
+            from langchain.schema import Document
+            results = [Document(page_content=text, metadata=metadata)
+                       for _, text, metadata in quantized.search(query_text, k=k)]
+        else:
+            results = get_vectorstore(persist_directory).similarity_search_by_vector(
+                embed_query(query_text), k=k
+            )
+        result_cache.set(key, results)
+    return results
+
+
+def cache_stats() -> dict:
+    return {
+        "embeddings": embedding_cache.stats(),
+        "results": result_cache.stats(),
+    }
+
+
+def measure_startup(query_text: str = "foods to avoid with chronic kidney disease"):
+    """
+    Print how long importing the agent tools takes (should not load the model)
+    versus the first and second retrieval calls.
+    """
+    import sys
+    import time
+
+    src_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    sys.path.insert(0, src_dir)
+    sys.path.insert(0, os.path.join(src_dir, "agent_folder"))
+    # Use the package module, not __main__, so we observe the tools' runtime
+    from rag import runtime
+
+    start = time.perf_counter()
+    import tools  # noqa: F401
+    print(f"Import agent tools:   {time.perf_counter() - start:7.2f} s (model loaded: {runtime.is_loaded()})")
+
+    start = time.perf_counter()
+    runtime.similarity_search(query_text, k=3)
+    print(f"First retrieval:      {time.perf_counter() - start:7.2f} s")
+
+    start = time.perf_counter()
+    runtime.similarity_search(query_text, k=3)
+    print(f"Second retrieval:     {time.perf_counter() - start:7.2f} s (cached)")
+
+__all__ = [
+    "EMBEDDING_MODEL_NAME", "RERANKER_MODEL_NAME", "PERSIST_DIRECTORY",
+    "get_embedding_model", "get_cross_encoder", "get_vectorstore", "is_loaded",
+    "normalize_query", "collection_version", "check_collection_version", "invalidate_caches",
+    "embed_query", "embed_queries", "similarity_search", "similarity_search_batch",
+    "cache_stats", "measure_startup"
+]
+
+
+if __name__ == "__main__":
+    # Run from the project root: python src/rag/runtime.py
+    measure_startup()
@@ -0,0 +1,236 @@
+"""
+Offline replay benchmark.
+
+Replays the patient questions recorded in conversation_logs.jsonl through
+run_post_discharge_workflow and through the Flask app (/process + /jobs),
+with the deterministic stub LLM and the local SerpAPI stand-in, so no
+network or API key is needed. Reports p50/p95 latency, requests/sec at the
+chosen concurrency and time spent per tool (from the request traces).
+
+    python src/replay_benchmark.py --concurrency 4 --repeat 3
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SRC_DIR)
+DEFAULT_LOGS = os.path.join(ROOT_DIR, "conversation_logs.jsonl")
+
+
+def load_questions(path: str = DEFAULT_LOGS, limit: int = None) -> list:
+    """(patient_name, question) for every user message in the conversation log."""
+    questions = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            for message in entry.get("messages", []):
+                if message.get("role") == "user" and message.get("content", "").strip():
+                    questions.append((entry.get("patient_name", ""), message["content"].strip()))
+    return questions[:limit] if limit else questions
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_load(label: str, fn, questions: list, concurrency: int) -> dict:
+    """Call fn(patient_name, question) for every question on `concurrency` threads."""
+    latencies, failures = [], 0
+
+    def timed(item):
+        start = time.perf_counter()
+        ok = fn(*item)
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for elapsed, ok in pool.map(timed, questions):
+            latencies.append(elapsed)
+            failures += 0 if ok else 1
+    wall = time.perf_counter() - start
+
+    return {
+        "label": label,
+        "requests": len(questions),
+        "failures": failures,
+        "concurrency": concurrency,
+        "p50_ms": round(1000 * percentile(latencies, 50), 1),
+        "p95_ms": round(1000 * percentile(latencies, 95), 1),
+        "mean_ms": round(1000 * statistics.mean(latencies), 1) if latencies else 0.0,
+        "requests_per_sec": round(len(questions) / wall, 2) if wall else 0.0,
+    }
+
+
+def workflow_runner():
+    from agent_folder.crew import run_post_discharge_workflow
+    from tracing import tracer
+
+    def run(patient_name, question):
+        with tracer.span("replay", kind="request", patient_name=patient_name):
+            result = run_post_discharge_workflow(patient_name, question)
+        return bool(result and result.get("success"))
+    return run
+
+
+def app_runner(poll_interval: float = 0.01, timeout: float = 120):
+    sys.path.insert(0, ROOT_DIR)
+    import app as web_app
+
+    client = web_app.app.test_client()
+
+    def run(patient_name, question):
+        response = client.post(
+            "/process",
+            data={"patient_name": patient_name, "user_query": question},
+            headers={"Accept": "application/json"},
+        )
+        if response.status_code != 202:
+            return False
+        status_url = response.get_json()["status_url"]
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status = client.get(status_url).get_json()
+            if status["status"] in ("done", "failed"):
+                if status["status"] == "failed" or not status.get("result_id"):
+                    return False
+                result = web_app.responses.get(status["result_id"])
+                return bool(result and result.get("success"))
+            time.sleep(poll_interval)
+        return False
+    return run
+
+
+def tool_times() -> dict:
+    """Per-tool and per-LLM span totals recorded since the last reset."""
+    from tracing import tracer
+    return {
+        key: {"count": stats["count"], "mean_ms": stats["mean_ms"], "p95_ms": stats["p95_ms"]}
+        for key, stats in sorted(tracer.summary().items())
+        if key.startswith(("tool:", "llm:"))
+    }
+
+
+def compare_formatting(questions: list) -> dict:
+    """
+    Time to turn a structured clinical answer into the patient-facing text:
+    local rendering vs. the legacy formatting LLM call (stub latency).
+    """
+    sys.path.insert(0, ROOT_DIR)
+    import app as web_app
+    from agent_folder.answer_schema import ClinicalAnswer, render_answer
+
+    sample = ClinicalAnswer(
+        answer="Limit high-potassium foods such as bananas and oranges, and keep to your fluid limit.",
+        citations=[{"source": "nephrology_reference.pdf", "page": 412, "section": "Dietary potassium"}],
+        warnings=["Seek urgent care for chest pain or muscle weakness."],
+        follow_up=["Bring a food diary to your next nephrology visit."],
+    )
+    raw = json.dumps({"answer": sample.answer})
+
+    def time_each(fn):
+        samples = []
+        for patient_name, question in questions:
+            start = time.perf_counter()
+            fn(patient_name, question)
+            samples.append(time.perf_counter() - start)
+        return {"p50_ms": round(1000 * percentile(samples, 50), 3),
+                "p95_ms": round(1000 * percentile(samples, 95), 3)}
+
+    return {
+        "structured_render": time_each(lambda name, question: render_answer(sample)),
+        "legacy_llm_format": time_each(lambda name, question: web_app.format_agent_response(
+            raw_response=raw, patient_name=name, user_query=question)),
+    }
+
+
+def print_report(results: list, tools: dict, formatting: dict):
+    print(f"\n{'run':<10} {'reqs':>6} {'fail':>5} {'conc':>5} {'p50 ms':>10} {'p95 ms':>10} {'req/s':>8}")
+    for r in results:
+        print(f"{r['label']:<10} {r['requests']:>6} {r['failures']:>5} {r['concurrency']:>5} "
+              f"{r['p50_ms']:>10.1f} {r['p95_ms']:>10.1f} {r['requests_per_sec']:>8.2f}")
+    for label, spans in tools.items():
+        print(f"\nTime per tool/LLM ({label}):")
+        for key, stats in spans.items():
+            print(f"  {key:<45} {stats['count']:>6} calls  mean {stats['mean_ms']:>8.2f} ms  "
+                  f"p95 {stats['p95_ms']:>8.2f} ms")
+    if formatting:
+        print("\nAnswer formatting:")
+        for key, stats in formatting.items():
+            print(f"  {key:<20} p50 {stats['p50_ms']:>9.3f} ms  p95 {stats['p95_ms']:>9.3f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logs", default=DEFAULT_LOGS, help="conversation log to replay")
+    parser.add_argument("--mode", choices=["workflow", "app", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=1, help="replay the questions this many times")
+    parser.add_argument("--limit", type=int, default=None, help="use only the first N questions")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub LLM seconds per call")
+    parser.add_argument("--serp-delay", type=float, default=0.0, help="stub SerpAPI seconds per request")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    questions = load_questions(args.logs, args.limit) * args.repeat
+    if not questions:
+        parser.error(f"no user questions found in {args.logs}")
+
+    sys.path.insert(0, SRC_DIR)
+    from agent_folder.serp_stub import SerpStubServer
+
+    workdir = tempfile.mkdtemp(prefix="replay_")
+    with SerpStubServer(delay=args.serp_delay) as serp:
+        # Must be set before the app, agents and tools are imported
+        os.environ.update({
+            "LLM_BACKEND": "stub",
+            "STUB_LLM_LATENCY": str(args.llm_latency),
+            "SERPAPI_ENDPOINT": serp.url,
+            "SERP_API_KEY": "stub",
+            "WEB_SEARCH_CACHE_PATH": os.path.join(workdir, "web_search_cache.db"),
+            "TRACE_FILE": os.path.join(workdir, "traces.jsonl"),
+            # Keep stub conversations out of the real logs (and out of the replay input)
+            "CONVERSATION_LOG_FILE": os.path.join(workdir, "conversation_logs.jsonl"),
+            "CONVERSATION_STORE": "0",
+            "CONVERSATION_STORE_PATH": os.path.join(workdir, "conversations.sqlite3"),
+            "STREAM_RESPONSES": "0",
+            "JOB_MAX_PENDING": str(max(32, len(questions))),
+            "JOB_WORKERS": str(args.concurrency),
+        })
+        from tracing import tracer
+
+        results, tools = [], {}
+        runs = [("workflow", workflow_runner), ("app", app_runner)]
+        for label, make_runner in runs:
+            if args.mode not in (label, "both"):
+                continue
+            runner = make_runner()
+            tracer.reset()
+            results.append(run_load(label, runner, questions, args.concurrency))
+            tools[label] = tool_times()
+
+        formatting = compare_formatting(questions[:50]) if args.mode in ("app", "both") else {}
+        print(f"SerpAPI stand-in requests: {serp.request_count}")
+
+    print_report(results, tools, formatting)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"runs": results, "tools": tools, "formatting": formatting}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
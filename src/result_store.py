@@ -0,0 +1,182 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Stores for finished /process results, looked up by result id when the
+# patient's browser follows the redirect. The in-process store is bounded by
+# count, bytes and age; the SQLite store is shared by all workers on a host.
+
+
+class MemoryResultStore:
+    """In-process LRU store with TTL, evicting by item count and total size."""
+
+    def __init__(self, max_items: int = 10_000, max_bytes: int = 64 * 1024 * 1024, ttl: float = 3600):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._data = OrderedDict()  # result_id -> (value, size, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    @staticmethod
+    def _size(result_id: str, value: dict) -> int:
+        # Serialized size is a stable, cheap proxy for the memory a result holds
+        return len(result_id) + len(json.dumps(value, default=str))
+
+    def get(self, result_id: str):
+        with self._lock:
+            entry = self._data.get(result_id)
+            if entry is None:
+                return None
+            value, size, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(result_id)
+                return None
+            self._data.move_to_end(result_id)
+            return value
+
+    def set(self, result_id: str, value: dict):
+        size = self._size(result_id, value)
+        with self._lock:
+            if result_id in self._data:
+                self._remove(result_id)
+            self._data[result_id] = (value, size, time.monotonic() + self.ttl)
+            self._bytes += size
+            while self._data and (len(self._data) > self.max_items or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def _remove(self, result_id: str):
+        _, size, _ = self._data.pop(result_id)
+        self._bytes -= size
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "items": len(self._data),
+                "bytes": self._bytes,
+                "max_items": self.max_items,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+
+class SQLiteResultStore:
+    """Result store shared across worker processes through one SQLite file."""
+
+    def __init__(self, path: str, ttl: float = 3600, purge_interval: float = 60):
+        self.path = path
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._last_purge = 0.0
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                result_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_results_expires_at ON results (expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, result_id: str):
+        row = self._conn().execute(
+            "SELECT data FROM results WHERE result_id = ? AND expires_at > ?",
+            (result_id, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, result_id: str, value: dict):
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO results (result_id, data, expires_at) VALUES (?, ?, ?)",
+            (result_id, json.dumps(value, default=str), now + self.ttl)
+        )
+        if now - self._last_purge > self.purge_interval:
+            self._last_purge = now
+            self._conn().execute("DELETE FROM results WHERE expires_at <= ?", (now,))
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def stats(self) -> dict:
+        return {
+            "backend": "sqlite",
+            "items": len(self),
+            "bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+
+def create_result_store():
+    """
+    Store selected by RESULT_STORE: "memory" (default, single worker) or
+    "sqlite" (shared across workers, file at RESULT_STORE_PATH).
+    """
+    ttl = float(os.getenv("RESULT_STORE_TTL", "3600"))
+    if os.getenv("RESULT_STORE", "memory") == "sqlite":
+        path = os.getenv("RESULT_STORE_PATH", "results.sqlite3")
+        return SQLiteResultStore(path, ttl=ttl)
+    return MemoryResultStore(
+        max_items=int(os.getenv("RESULT_STORE_MAX_ITEMS", "10000")),
+        max_bytes=int(os.getenv("RESULT_STORE_MAX_BYTES", str(64 * 1024 * 1024))),
+        ttl=ttl,
+    )
+
+
+def benchmark(n: int = 100_000, response_chars: int = 1500):
+    """Python heap used after storing n results: plain dict vs the bounded stores."""
+    import tempfile
+    import tracemalloc
+
+    def make_result(i):
+        return {
+            "patient_name": f"Patient {i}",
+            "query": "What foods should I avoid with chronic kidney disease?",
+            "timestamp": "January 01, 2025 at 10:00 AM",
+            "success": True,
+            "response": "x" * response_chars,
+            "error": "",
+        }
+
+    def measure(name, store, put):
+        tracemalloc.start()
+        start = time.perf_counter()
+        for i in range(n):
+            put(store, f"Patient_{i}_{i}", make_result(i))
+        elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:>28}: {current / 1e6:8.1f} MB held, {peak / 1e6:8.1f} MB peak, "
+              f"{n / elapsed:10,.0f} writes/s")
+
+    measure("unbounded dict (old)", {}, lambda s, k, v: s.__setitem__(k, v))
+    measure("MemoryResultStore (defaults)", MemoryResultStore(), lambda s, k, v: s.set(k, v))
+    with tempfile.TemporaryDirectory() as tmp:
+        measure("SQLiteResultStore", SQLiteResultStore(os.path.join(tmp, "results.sqlite3")),
+                lambda s, k, v: s.set(k, v))
+
+
+__all__ = ["MemoryResultStore", "SQLiteResultStore", "create_result_store", "benchmark"]
+
+
+if __name__ == "__main__":
+    benchmark()
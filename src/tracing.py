@@ -0,0 +1,219 @@
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+# Lightweight request tracing. Each /process request is one trace; LLM calls,
+# tool runs and workflow stages inside it are spans with durations and token
+# counts. Finished spans are appended to a JSONL file using OTLP span field
+# names (traceId, spanId, startTimeUnixNano, ...) and aggregated in memory
+# for the /metrics endpoint.
+
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACING_ENABLED = os.getenv("TRACING", "1") == "1"
+
+
+class Tracer:
+    def __init__(self, path: str = TRACE_FILE, window: int = 1000):
+        self.path = path
+        self._local = threading.local()
+        self._file_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._durations = defaultdict(lambda: deque(maxlen=window))
+        self._counts = defaultdict(int)
+        self._errors = defaultdict(int)
+        self._tokens = defaultdict(lambda: {"input": 0, "output": 0})
+
+    # --- context -----------------------------------------------------------
+
+    def _stack(self) -> list:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def current_trace_id(self):
+        stack = self._stack()
+        return stack[0]["traceId"] if stack else None
+
+    def next_iteration(self) -> int:
+        """Number of LLM calls made so far in the current trace, plus one."""
+        stack = self._stack()
+        if not stack:
+            return 0
+        totals = stack[0]["attributes"]
+        totals["llm_calls"] = totals.get("llm_calls", 0) + 1
+        return totals["llm_calls"]
+
+    # --- spans -------------------------------------------------------------
+
+    def start_span(self, name: str, kind: str = "internal", **attributes) -> dict:
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        span = {
+            "traceId": parent["traceId"] if parent else uuid.uuid4().hex,
+            "spanId": uuid.uuid4().hex[:16],
+            "parentSpanId": parent["spanId"] if parent else "",
+            "name": name,
+            "kind": kind,
+            "startTimeUnixNano": time.time_ns(),
+            "_start": time.perf_counter(),
+            "attributes": dict(attributes),
+        }
+        stack.append(span)
+        return span
+
+    def end_span(self, span: dict, error: Exception = None, **attributes):
+        stack = self._stack()
+        if span["kind"] == "llm" and stack and stack[0] is not span:
+            # Roll token usage up into the request span
+            totals = stack[0]["attributes"]
+            for key in ("input_tokens", "output_tokens"):
+                totals[key] = totals.get(key, 0) + (attributes.get(key) or 0)
+        if span in stack:
+            # Also closes children left open by an exception
+            del stack[stack.index(span):]
+        span["attributes"].update(attributes)
+        span["endTimeUnixNano"] = time.time_ns()
+        duration = time.perf_counter() - span.pop("_start")
+        span["attributes"]["duration_ms"] = round(duration * 1000, 3)
+        span["status"] = {"code": "ERROR", "message": str(error)} if error else {"code": "OK"}
+        self._record(span, duration, error)
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", **attributes):
+        if not TRACING_ENABLED:
+            yield {}
+            return
+        span = self.start_span(name, kind, **attributes)
+        try:
+            yield span
+        except Exception as e:
+            self.end_span(span, error=e)
+            raise
+        self.end_span(span)
+
+    # --- export ------------------------------------------------------------
+
+    def _record(self, span: dict, duration: float, error):
+        key = f"{span['kind']}:{span['name']}"
+        attributes = span["attributes"]
+        with self._stats_lock:
+            self._durations[key].append(duration)
+            self._counts[key] += 1
+            if error:
+                self._errors[key] += 1
+            self._tokens[key]["input"] += attributes.get("input_tokens", 0) or 0
+            self._tokens[key]["output"] += attributes.get("output_tokens", 0) or 0
+
+        record = dict(span)
+        record["attributes"] = [
+            {"key": key, "value": value} for key, value in attributes.items()
+        ]
+        line = json.dumps(record, default=str)
+        try:
+            with self._file_lock:
+                with open(self.path, "a") as f:
+                    f.write(line + "\n")
+        except OSError as e:
+            print(f"Could not write trace span: {e}")
+
+    def reset(self):
+        """Forget the aggregated statistics (the JSONL file is kept)."""
+        with self._stats_lock:
+            self._durations.clear()
+            self._counts.clear()
+            self._errors.clear()
+            self._tokens.clear()
+
+    def summary(self) -> dict:
+        with self._stats_lock:
+            summary = {}
+            for key, samples in self._durations.items():
+                ordered = sorted(samples)
+                summary[key] = {
+                    "count": self._counts[key],
+                    "errors": self._errors[key],
+                    "mean_ms": round(1000 * sum(ordered) / len(ordered), 2),
+                    "p95_ms": round(1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 2),
+                    "input_tokens": self._tokens[key]["input"],
+                    "output_tokens": self._tokens[key]["output"],
+                }
+            return summary
+
+
+tracer = Tracer()
+
+
+def traced_tool(run):
+    """Decorator for BaseTool._run: one "tool" span per call, named after the tool."""
+    @functools.wraps(run)
+    def wrapper(self, *args, **kwargs):
+        with tracer.span(getattr(self, "name", type(self).__name__), kind="tool",
+                         input=str(args[0] if args else kwargs)[:200]):
+            return run(self, *args, **kwargs)
+    return wrapper
+
+
+def _usage_from_result(response) -> dict:
+    """Token counts from a langchain LLMResult, whichever field the provider filled."""
+    usage = {}
+    llm_output = getattr(response, "llm_output", None) or {}
+    for key in ("usage_metadata", "token_usage"):
+        if isinstance(llm_output.get(key), dict):
+            usage = llm_output[key]
+    if not usage:
+        for generations in getattr(response, "generations", []) or []:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                metadata = getattr(message, "usage_metadata", None) or \
+                    (getattr(generation, "generation_info", None) or {}).get("usage_metadata")
+                if metadata:
+                    usage = dict(metadata)
+    return {
+        "input_tokens": usage.get("input_tokens", usage.get("prompt_token_count", usage.get("prompt_tokens", 0))),
+        "output_tokens": usage.get("output_tokens", usage.get("candidates_token_count", usage.get("completion_tokens", 0))),
+    }
+
+
+def instrument_llm(llm, name: str):
+    """
+    Attach a tracing callback to a langchain chat model instance so every
+    call (from agents or direct invoke/stream) is recorded as an "llm" span.
+    """
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class TracingCallbackHandler(BaseCallbackHandler):
+        def __init__(self):
+            self._spans = {}
+
+        def _start(self, run_id, prompt_chars):
+            if TRACING_ENABLED:
+                self._spans[run_id] = tracer.start_span(
+                    name, kind="llm", iteration=tracer.next_iteration(), prompt_chars=prompt_chars
+                )
+
+        def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+            self._start(run_id, sum(len(p) for p in prompts))
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._start(run_id, sum(len(str(m.content)) for batch in messages for m in batch))
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            span = self._spans.pop(run_id, None)
+            if span:
+                tracer.end_span(span, **_usage_from_result(response))
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            span = self._spans.pop(run_id, None)
+            if span:
+                tracer.end_span(span, error=error)
+
+    llm.callbacks = list(llm.callbacks or []) + [TracingCallbackHandler()]
+    return llm
+
+
+__all__ = ["Tracer", "tracer", "traced_tool", "instrument_llm", "TRACE_FILE"]
@@ -0,0 +1,21 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+# The app imports its modules relative to src/ and src/agent_folder/
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+for path in (os.path.join(ROOT, "src"), os.path.join(ROOT, "src", "agent_folder")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+DISCHARGE_DB = os.path.join(ROOT, "src", "patient_data", "hospital_discharge.db")
+
+
+@pytest.fixture
+def discharge_db(tmp_path):
+    """Copy of the sample discharge database, so migrations and writes stay local."""
+    path = tmp_path / "hospital_discharge.db"
+    shutil.copy(DISCHARGE_DB, path)
+    return str(path)
@@ -0,0 +1,48 @@
+import json
+import os
+
+import pytest
+
+from answer_schema import (
+    OUTPUT_FORMAT_INSTRUCTIONS, TASK_OUTPUT_FORMAT_INSTRUCTIONS, parse_clinical_answer, render_answer,
+)
+
+AGENT_OUTPUT = json.dumps({
+    "answer": "Limit high-potassium foods such as bananas and oranges, and keep to your fluid limit.",
+    "citations": [{"source": "nephrology_reference.pdf", "page": 412, "section": "Dietary potassium"}],
+    "warnings": ["Seek urgent care for chest pain or muscle weakness."],
+    "follow_up": ["Bring a food diary to your next nephrology visit."],
+})
+
+
+def test_task_format_instructions_survive_crewai_interpolation():
+    expected_output = "A structured answer for {patient_name}.\n" + TASK_OUTPUT_FORMAT_INSTRUCTIONS
+    filled = expected_output.format(patient_name="Maria Lopez", user_query="What can I eat?")
+    assert filled == "A structured answer for Maria Lopez.\n" + OUTPUT_FORMAT_INSTRUCTIONS
+
+
+def test_structured_render_keeps_every_part_of_the_answer():
+    rendered = render_answer(parse_clinical_answer("```json\n" + AGENT_OUTPUT + "\n```"))
+    data = json.loads(AGENT_OUTPUT)
+    for text in [data["answer"], *data["warnings"], *data["follow_up"]]:
+        assert text in rendered
+    assert "nephrology_reference.pdf, p. 412" in rendered
+
+
+def test_structured_render_matches_llm_formatting_path(monkeypatch):
+    """The local renderer must not lose content the formatting-LLM path kept."""
+    pytest.importorskip("flask")
+    pytest.importorskip("langchain_core")
+    monkeypatch.setenv("LLM_BACKEND", "stub")
+    monkeypatch.setenv("STUB_LLM_LATENCY", "0")
+    monkeypatch.setenv("TRACING", "0")
+    monkeypatch.chdir(os.path.join(os.path.dirname(__file__), ".."))
+    import app as web_app
+
+    legacy = web_app.format_agent_response(AGENT_OUTPUT, "Maria Lopez", "What foods should I avoid?")
+    structured = render_answer(parse_clinical_answer(AGENT_OUTPUT))
+
+    legacy_data = json.loads(web_app.extract_message_from_json(legacy))
+    assert legacy_data["answer"] in structured
+    for text in legacy_data["warnings"] + legacy_data["follow_up"]:
+        assert text in structured
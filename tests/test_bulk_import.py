@@ -0,0 +1,81 @@
+import io
+import json
+import sqlite3
+
+import pytest
+
+from patient_data import bulk_import
+from patient_data.bulk_import import ImportFormatError, _iter_json_array, import_rows, iter_rows
+
+ROWS = [
+    {"patient_name": f"Import Patient {i}", "discharge_date": "2024-03-0%d" % (i + 1),
+     "primary_diagnosis": "Chronic Kidney Disease", "medications": "Furosemide 40mg daily", "score": 10 ** i}
+    for i in range(5)
+]
+
+
+def test_json_array_is_read_in_pieces():
+    text = json.dumps(ROWS, indent=2)
+    stream = io.StringIO(text[text.index("[") + 1:])
+    # Tiny reads split strings, objects and numbers across buffer boundaries
+    assert list(_iter_json_array(stream, read_size=3)) == ROWS
+    assert list(iter_rows(io.BytesIO(b"  [1, 23, []]"), "json")) == [1, 23, []]
+    assert list(iter_rows(io.BytesIO(b"[]"), "json")) == []
+
+
+def test_json_object_uploads_still_accepted():
+    assert list(iter_rows(io.BytesIO(json.dumps({"records": ROWS}).encode()), "json")) == ROWS
+    assert list(iter_rows(io.BytesIO(json.dumps(ROWS[0]).encode()), "json")) == [ROWS[0]]
+
+
+@pytest.mark.parametrize("body", [b"[1, 2", b"[1 2]", b"[1,]", b'[{"a": ]', b"{"])
+def test_malformed_json_is_a_format_error(body):
+    with pytest.raises(ImportFormatError):
+        list(iter_rows(io.BytesIO(body), "json"))
+
+
+def test_import_reports_invalid_rows(discharge_db):
+    rows = ROWS[:2] + [{"patient_name": "No Date", "primary_diagnosis": "CKD"}]
+    report = import_rows(iter_rows(io.BytesIO(json.dumps(rows).encode()), "json"), discharge_db)
+    assert report["inserted"] == 2
+    assert report["errors"] == [{"row": 3, "error": "missing required field(s): discharge_date"}]
+
+
+def test_busy_database_fails_rows_without_rollback_error(discharge_db, monkeypatch):
+    import_rows(ROWS[:1], discharge_db)  # migrate before taking the lock
+
+    class NoWaitLookup(bulk_import.PatientLookup):
+        def _connect(self):
+            conn = super()._connect()
+            conn.execute("PRAGMA busy_timeout=0")
+            return conn
+
+    monkeypatch.setattr(bulk_import, "PatientLookup", NoWaitLookup)
+    holder = sqlite3.connect(discharge_db, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    try:
+        report = import_rows(ROWS[1:3], discharge_db)
+    finally:
+        holder.execute("ROLLBACK")
+        holder.close()
+
+    assert report["inserted"] == 0
+    assert [error["row"] for error in report["errors"]] == [1, 2]
+    assert all(error["error"].startswith("database unavailable") for error in report["errors"])
+
+
+def test_malformed_json_keeps_rows_before_the_error(discharge_db):
+    body = json.dumps(ROWS)[:-1] + ', {"patient_name": ]'
+    inserted = []
+    report = import_rows(iter_rows(io.BytesIO(body.encode()), "json"), discharge_db, chunk_size=2,
+                         on_inserted=inserted.extend)
+    assert report["error"].startswith("invalid JSON")
+    assert report["inserted"] == 5 and len(inserted) == 5
+
+
+def test_import_file_passes_new_ids_on(discharge_db, tmp_path):
+    path = tmp_path / "discharges.jsonl"
+    path.write_text("\n".join(json.dumps(row) for row in ROWS[:3]))
+    inserted = []
+    report = bulk_import.import_file(str(path), discharge_db, on_inserted=inserted.extend)
+    assert report["inserted"] == 3 and len(inserted) == 3
@@ -0,0 +1,35 @@
+import json
+
+from conversation_store import ConversationStore
+
+
+def session_line(patient_name, content, session_id=None, end="10:30 01-03-2025"):
+    entry = {"patient_name": patient_name, "session_start": "10:29", "session_end": end,
+             "messages": [{"role": "user", "content": content, "timestamp": end},
+                          {"role": "assistant", "content": "Keep to your fluid limit.", "timestamp": end}]}
+    if session_id:
+        entry["session_id"] = session_id
+    return json.dumps(entry) + "\n"
+
+
+def test_identical_sessions_with_distinct_ids_are_kept(tmp_path):
+    store = ConversationStore(str(tmp_path / "conversations.sqlite3"))
+    assert store.add_lines([session_line("Alice Johnson", "How much water?", "a"),
+                            session_line("Alice Johnson", "How much water?", "b")]) == 2
+    assert store.add_lines([session_line("Alice Johnson", "How much water?", "a")]) == 0
+    assert store.stats()["sessions"] == 2
+
+
+def test_reimport_is_idempotent_and_history_pages(tmp_path):
+    log = tmp_path / "conversation_logs.jsonl"
+    log.write_text("".join(session_line("Alice Johnson", f"Question {i}?", end=f"10:{i:02d} 01-03-2025")
+                           for i in range(5)))
+    store = ConversationStore(str(tmp_path / "conversations.sqlite3"))
+    assert store.import_file(str(log)) == 5
+    assert store.import_file(str(log)) == 0
+
+    first = store.history("alice johnson", limit=5)
+    second = store.history("Alice Johnson", limit=5, before=first["next_before"])
+    assert [m["content"] for m in first["messages"][:2]] == ["Keep to your fluid limit.", "Question 4?"]
+    assert len(second["messages"]) == 5 and second["next_before"] is None
+    assert store.recent_exchanges("Alice Johnson", n=2)[-1]["question"] == "Question 4?"
@@ -0,0 +1,159 @@
+import os
+
+import pytest
+
+from rag import embed
+
+
+class FakeCollection:
+    """In-memory stand-in for the Chroma collection calls ingest() makes."""
+
+    def __init__(self):
+        self.items = {}
+        self.delete_calls = []
+
+    def get(self, where=None, include=()):
+        ids = [chunk_id for chunk_id, (_, metadata) in self.items.items()
+               if all(metadata.get(key) == value for key, value in (where or {}).items())]
+        return {"ids": ids, "metadatas": [self.items[chunk_id][1] for chunk_id in ids]}
+
+    def update(self, ids, metadatas):
+        for chunk_id, metadata in zip(ids, metadatas):
+            self.items[chunk_id] = (self.items[chunk_id][0], metadata)
+
+    def delete(self, ids):
+        self.delete_calls.append(len(ids))
+        for chunk_id in ids:
+            del self.items[chunk_id]
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self._collection = FakeCollection()
+        self.add_calls = []
+
+    def add_texts(self, texts, metadatas, ids):
+        self.add_calls.append(len(ids))
+        for chunk_id, text, metadata in zip(ids, texts, metadatas):
+            self._collection.items[chunk_id] = (text, metadata)
+
+
+def line_chunks(pdf_path, chunk_size=1000, chunk_overlap=200, workers=None):
+    """Each line of the test "PDF" is one chunk on page 1."""
+    source, path = os.path.basename(pdf_path), embed.source_path(pdf_path)
+    with open(pdf_path) as f:
+        for line in f.read().splitlines():
+            yield embed.chunk_id(path, 1, line), line, {"source": source, "source_path": path, "page": 1}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = FakeVectorStore()
+    monkeypatch.setattr(embed.runtime, "get_vectorstore", lambda persist_directory: store)
+    monkeypatch.setattr(embed, "iter_chunks", line_chunks)
+    return store
+
+
+def write_pdf(path, lines):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("\n".join(lines))
+    return str(path)
+
+
+def test_chunks_are_embedded_in_batches(store, tmp_path):
+    pdf = write_pdf(tmp_path / "docs" / "book.pdf", [f"chunk {i}" for i in range(5)])
+    stats = embed.ingest([pdf], persist_directory=str(tmp_path), batch_size=2)
+    assert stats["added"] == 5
+    assert store.add_calls == [2, 2, 1]
+
+
+def test_reindexing_embeds_only_changed_chunks(store, tmp_path):
+    pdf = write_pdf(tmp_path / "docs" / "book.pdf", ["potassium", "sodium", "fluids"])
+    embed.ingest([pdf], persist_directory=str(tmp_path))
+
+    stats = embed.ingest([pdf], persist_directory=str(tmp_path))
+    assert stats["skipped_files"] == 1 and store.add_calls == [3]
+
+    write_pdf(tmp_path / "docs" / "book.pdf", ["potassium", "fluids", "phosphate"])
+    stats = embed.ingest([pdf], persist_directory=str(tmp_path))
+    assert (stats["added"], stats["unchanged"], stats["deleted"]) == (1, 2, 1)
+    assert sorted(text for text, _ in store._collection.items.values()) == ["fluids", "phosphate", "potassium"]
+
+
+def test_same_file_name_in_two_folders(store, tmp_path):
+    first = write_pdf(tmp_path / "a" / "book.pdf", ["dialysis"])
+    second = write_pdf(tmp_path / "b" / "book.pdf", ["transplant"])
+    embed.ingest([first], persist_directory=str(tmp_path))
+    embed.ingest([second], persist_directory=str(tmp_path))
+
+    assert sorted(text for text, _ in store._collection.items.values()) == ["dialysis", "transplant"]
+    manifest = embed.load_manifest(str(tmp_path))
+    assert set(manifest) == {embed.source_path(first), embed.source_path(second)}
+    assert embed.ingest([first, second], persist_directory=str(tmp_path))["skipped_files"] == 2
+
+
+def test_removed_chunks_are_deleted_in_batches(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(embed, "DELETE_BATCH_SIZE", 2)
+    pdf = write_pdf(tmp_path / "docs" / "book.pdf", [f"chunk {i}" for i in range(6)])
+    embed.ingest([pdf], persist_directory=str(tmp_path))
+
+    write_pdf(tmp_path / "docs" / "book.pdf", ["chunk 0"])
+    assert embed.ingest([pdf], persist_directory=str(tmp_path))["deleted"] == 5
+    assert store._collection.delete_calls == [2, 2, 1]
+
+
+def test_prune_drops_unlisted_sources(store, tmp_path):
+    kept = write_pdf(tmp_path / "a" / "book.pdf", ["dialysis"])
+    dropped = write_pdf(tmp_path / "b" / "book.pdf", ["transplant"])
+    embed.ingest([kept, dropped], persist_directory=str(tmp_path))
+
+    stats = embed.ingest([kept], persist_directory=str(tmp_path), prune=True)
+    assert stats["deleted"] == 1
+    assert [text for text, _ in store._collection.items.values()] == ["dialysis"]
+    assert list(embed.load_manifest(str(tmp_path))) == [embed.source_path(kept)]
+
+
+def test_source_path_is_relative_to_the_project_root():
+    assert embed.source_path(os.path.join(embed.PROJECT_ROOT, "docs", "book.pdf")) == "docs/book.pdf"
+
+
+def test_chunks_from_a_name_keyed_index_are_replaced(store, tmp_path):
+    pdf = write_pdf(tmp_path / "docs" / "book.pdf", ["potassium"])
+    store._collection.items["legacy"] = ("potassium", {"source": "book.pdf", "page": 1})
+    stats = embed.ingest([pdf], persist_directory=str(tmp_path))
+    assert (stats["added"], stats["deleted"]) == (1, 1)
+    assert "legacy" not in store._collection.items
+
+
+def test_heading_detection():
+    assert embed.is_heading("12.3 Acute Kidney Injury")
+    assert embed.is_heading("CHRONIC KIDNEY DISEASE")
+    assert embed.is_heading("Management of Hyperkalemia")
+    assert not embed.is_heading("Patients should limit potassium intake.")
+    assert not embed.is_heading("the serum creatinine rises")
+    page = "Intro text line\nDIALYSIS ACCESS\nFistulas mature over weeks\n"
+    assert embed.find_headings(page) == [(16, "DIALYSIS ACCESS")]
+
+
+def test_chunks_carry_page_and_section_citations(monkeypatch):
+    pytest.importorskip("langchain.text_splitter")
+    pages = [
+        "CHRONIC KIDNEY DISEASE\nStages are defined by eGFR.",
+        "Staging continues on this page.\nDIETARY POTASSIUM\nLimit bananas.",
+    ]
+    monkeypatch.setattr(embed, "iter_pages", lambda pdf_path, workers=None: enumerate(pages))
+    chunks = list(embed.iter_chunks("refs/nephrology.pdf", chunk_size=40, chunk_overlap=0))
+    citations = [(metadata["page"], metadata["section"]) for _, _, metadata in chunks]
+    assert citations[0] == (1, "CHRONIC KIDNEY DISEASE")
+    assert (2, "CHRONIC KIDNEY DISEASE") in citations  # carried over the page break
+    assert citations[-1] == (2, "DIETARY POTASSIUM")
+    assert {metadata["source"] for _, _, metadata in chunks} == {"nephrology.pdf"}
+
+
+def test_citation_format():
+    from rag.retrieve import format_citation
+
+    assert format_citation({"source": "nephrology.pdf", "page": 12, "section": "Hyperkalemia"}) == (
+        'nephrology.pdf, p. 12, section "Hyperkalemia"'
+    )
+    assert format_citation({}) == "Nephrology reference index"
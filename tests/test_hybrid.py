@@ -0,0 +1,74 @@
+from types import SimpleNamespace
+
+import pytest
+
+from rag import hybrid
+from rag.cache import TTLCache
+from rag.hybrid import BM25Index, hybrid_search, hybrid_search_batch, tokenize
+
+
+def test_bm25_ranks_matching_chunk_first():
+    index = BM25Index(
+        ["a", "b", "c"],
+        ["Limit potassium: bananas, oranges and potatoes.", "eGFR is estimated from creatinine.",
+         "NSAIDs such as ibuprofen can harm the kidneys."],
+        [{}, {}, {}],
+    )
+    assert index.ids[index.search("is ibuprofen safe for my kidneys", 1)[0][0]] == "c"
+    assert "the" not in tokenize("What is the eGFR")
+
+
+@pytest.fixture
+def fused_rankings(monkeypatch):
+    """Fixed vector rankings per query, fused as-is; records collection queries."""
+    rankings = {
+        "diet": ["potassium", "sodium", "fluids", "protein"],
+        "meds": ["potassium", "nsaids", "dosing", "sodium"],
+    }
+    vector_calls = []
+
+    def fake_vector_rankings(query_texts, n, persist_directory):
+        vector_calls.append(list(query_texts))
+        return [[(text, text, {"source": "ref.pdf"}) for text in rankings[query][:n]] for query in query_texts]
+
+    def fake_fuse(query_text, vector_hits, candidates, rerank, persist_directory):
+        return [SimpleNamespace(page_content=text, metadata=metadata) for _, text, metadata in vector_hits]
+
+    def no_single_query(*args):
+        raise AssertionError("expected a cached ranking")
+
+    monkeypatch.setattr(hybrid, "_vector_rankings", fake_vector_rankings)
+    monkeypatch.setattr(hybrid, "_vector_ranking", no_single_query)
+    monkeypatch.setattr(hybrid, "_fuse", fake_fuse)
+    monkeypatch.setattr(hybrid.runtime, "result_cache", TTLCache(max_size=16, ttl=60))
+    return vector_calls
+
+
+def test_batch_queries_the_collection_once_and_dedupes(fused_rankings):
+    batches = hybrid_search_batch(["diet", "meds", "Diet?"], k=2)
+    assert [[d.page_content for d in batch] for batch in batches] == [
+        ["potassium", "sodium"], ["nsaids", "dosing"], ["fluids", "protein"],
+    ]
+    # One collection query for the distinct questions
+    assert fused_rankings == [["diet", "meds"]]
+
+
+def test_batch_and_single_lookups_share_cached_rankings(fused_rankings):
+    hybrid_search_batch(["diet", "meds"], k=2)
+    assert [d.page_content for d in hybrid_search("meds", k=3)] == ["potassium", "nsaids", "dosing"]
+    hybrid_search_batch(["diet", "meds"], k=3, dedupe=False)
+    assert fused_rankings == [["diet", "meds"]]
+
+
+def test_fuse_combines_vector_and_bm25_rankings(monkeypatch):
+    pytest.importorskip("langchain.schema")
+    index = BM25Index(
+        ["nsaid", "egfr"],
+        ["NSAIDs such as ibuprofen can harm the kidneys.", "eGFR is estimated from creatinine."],
+        [{"page": 2}, {"page": 3}],
+    )
+    monkeypatch.setattr(hybrid, "get_bm25_index", lambda persist_directory: index)
+    vector_hits = [("diet", "Limit potassium.", {"page": 1}), ("nsaid", index.documents[0], {"page": 2})]
+    ranked = hybrid._fuse("ibuprofen kidneys", vector_hits, 20, False, "rag_db")
+    # In both rankings, so it overtakes the vector-only top hit
+    assert [d.metadata["page"] for d in ranked] == [2, 1]
@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+from jobs import Job
+
+
+def test_stream_reset_discards_partial_response():
+    job = Job("Maria Lopez")
+    for token in ("Keep to ", "your fluid"):
+        job.add_event("token", token)
+    job.add_event("stream_reset", "The partial answer was discarded; generating it again.")
+    job.add_event("token", "Keep to your fluid limit.")
+    status = job.to_dict()
+    assert status["partial_response"] == "Keep to your fluid limit."
+    assert [event["stage"] for event in status["events"]] == ["stream_reset"]
+
+
+def test_waiter_sees_terminal_event_once_finished():
+    job = Job("Maria Lopez")
+    job.add_event("queued")
+    job.finish("failed", error="<b>model unavailable</b>")
+    events = job.wait_for_events(1, timeout=0)
+    assert job.finished
+    assert [(event["stage"], event["detail"]) for event in events] == [("failed", "<b>model unavailable</b>")]
+
+
+def test_job_queue_reports_failure():
+    from jobs import JobQueue
+
+    def handler(patient_name, user_query):
+        raise RuntimeError("boom")
+
+    queue = JobQueue(handler, max_workers=1)
+    job = queue.submit("Maria Lopez", "What can I eat?")
+    seen = []
+    while not seen or seen[-1]["stage"] not in ("done", "failed"):
+        seen.extend(job.wait_for_events(len(seen), timeout=5))
+    assert seen[-1]["stage"] == "failed" and job.error == "boom"
+
+
+def test_answers_in_the_same_second_get_their_own_result(monkeypatch):
+    pytest.importorskip("flask")
+    pytest.importorskip("langchain_core")
+    monkeypatch.setenv("LLM_BACKEND", "stub")
+    monkeypatch.setenv("TRACING", "0")
+    monkeypatch.chdir(os.path.join(os.path.dirname(__file__), ".."))
+    import app as web_app
+
+    answers = iter(["First answer", "Second answer"])
+    monkeypatch.setattr(web_app, "run_post_discharge_workflow", lambda patient_name, user_query: {
+        "success": True, "mode": "fast_path", "message": next(answers)})
+    monkeypatch.setattr(web_app, "STREAM_RESPONSES", False)
+    monkeypatch.setattr(web_app, "log_conversation", None)
+
+    first = web_app._answer_query("Alice Johnson", "What are my medications?")
+    second = web_app._answer_query("Alice Johnson", "What are my medications?")
+    assert first != second and "Alice" not in first
+    assert web_app.responses.get(first)["response"] == "First answer"
+    assert web_app.responses.get(second)["response"] == "Second answer"
+    assert web_app.app.test_client().get("/jobs/not-a-job").status_code == 404
@@ -0,0 +1,76 @@
+import gzip
+import json
+
+import pytest
+
+import logs
+from logs import ConversationLogger, FileLock
+
+
+@pytest.fixture
+def make_logger(tmp_path, monkeypatch):
+    monkeypatch.setattr(logs, "MIRROR_TO_STORE", False)
+
+    def make(**kwargs):
+        kwargs.setdefault("flush_interval", 0)
+        return ConversationLogger(str(tmp_path / "conversation_logs.jsonl"), **kwargs)
+    return make
+
+
+def conversation(text):
+    return [{"role": "user", "content": text, "timestamp": "09:00"}]
+
+
+def read_entries(path):
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_sessions_are_written_with_unique_ids(make_logger):
+    logger = make_logger()
+    logger.log_session("Alice Johnson", conversation("Can I eat bananas?"))
+    logger.log_session("Alice Johnson", conversation("Can I eat bananas?"))
+    assert logger.flush()
+
+    entries = read_entries(logger.log_file)
+    assert [entry["messages"][0]["content"] for entry in entries] == ["Can I eat bananas?"] * 2
+    assert entries[0]["session_id"] != entries[1]["session_id"]
+    assert logger.stats()["written"] == 2
+
+
+def test_full_file_is_rotated_and_gzipped(make_logger, tmp_path):
+    logger = make_logger(max_bytes=1)
+    logger.log_session("Alice Johnson", conversation("first"))
+    assert logger.flush()
+    logger.log_session("Alice Johnson", conversation("second"))
+    assert logger.flush()
+
+    rotated = list(tmp_path.glob("conversation_logs.*.jsonl.gz"))
+    assert len(rotated) == 1 and logger.stats()["rotations"] == 1
+    assert read_entries(rotated[0])[0]["messages"][0]["content"] == "first"
+    assert read_entries(logger.log_file)[0]["messages"][0]["content"] == "second"
+
+
+def test_writer_waits_for_the_file_lock(make_logger):
+    logger = make_logger()
+    # Another process holding the lock
+    with FileLock(logger._lock.path):
+        logger.log_session("Alice Johnson", conversation("locked out"))
+        assert not logger.flush(timeout=0.2)
+        assert not logger.log_file.exists()
+    assert logger.flush()
+    assert len(read_entries(logger.log_file)) == 1
+
+
+def test_full_queue_drops_sessions_without_blocking(make_logger):
+    logger = make_logger(queue_size=1)
+    logger._ensure_writer = lambda: None  # no writer draining the queue yet
+    for i in range(3):
+        logger.log_session("Alice Johnson", conversation(f"question {i}"))
+    assert logger.stats()["dropped"] == 2 and logger.stats()["queued"] == 1
+
+    del logger._ensure_writer
+    logger._ensure_writer()
+    assert logger.flush()
+    assert [entry["messages"][0]["content"] for entry in read_entries(logger.log_file)] == ["question 0"]
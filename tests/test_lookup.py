@@ -0,0 +1,100 @@
+import sqlite3
+import threading
+
+import pytest
+
+from patient_data.lookup import PatientLookup, name_trigrams, normalize_name
+from patient_data.migrations import MIGRATIONS, get_schema_version, migrate
+
+
+def test_fetch_by_name_ignores_case_and_whitespace(discharge_db):
+    lookup = PatientLookup(discharge_db)
+    record = lookup.fetch_by_name("  ROBERT brown ")
+    assert record["patient_name"] == "Robert Brown"
+    assert record["primary_diagnosis"] == "Congestive Heart Failure (CHF)"
+    assert lookup.fetch_by_id(record["discharge_id"])["patient_name"] == "Robert Brown"
+    assert lookup.fetch_by_name("Nobody Here") is None
+
+
+def test_fetch_by_name_returns_latest_discharge(discharge_db):
+    lookup = PatientLookup(discharge_db)
+    lookup.get_connection().execute(
+        "INSERT INTO discharge_summaries (patient_name, discharge_date, primary_diagnosis) "
+        "VALUES ('Alice Johnson', '2025-01-01', 'Acute Kidney Injury')"
+    )
+    assert lookup.fetch_by_name("alice johnson")["primary_diagnosis"] == "Acute Kidney Injury"
+
+
+def test_connections_are_pooled_per_thread(discharge_db):
+    lookup = PatientLookup(discharge_db)
+    assert lookup.get_connection() is lookup.get_connection()
+    other = []
+    thread = threading.Thread(target=lambda: other.append(lookup.get_connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not lookup.get_connection()
+
+
+def test_migrate_is_idempotent(discharge_db):
+    conn = sqlite3.connect(discharge_db, isolation_level=None)
+    assert get_schema_version(conn) == 0
+    latest = MIGRATIONS[-1][0]
+    assert migrate(conn) == latest
+    assert migrate(conn) == latest
+    assert conn.execute(
+        "SELECT COUNT(*) FROM discharge_summaries WHERE patient_name_norm IS NULL"
+    ).fetchone()[0] == 0
+    # New rows written without the new columns are kept in sync by triggers
+    conn.execute("INSERT INTO discharge_summaries (patient_name, discharge_date, primary_diagnosis) "
+                 "VALUES ('  Zoe QUINN', '2024-05-01', 'CKD')")
+    assert conn.execute("SELECT patient_name_norm FROM discharge_summaries WHERE patient_name = '  Zoe QUINN'"
+                        ).fetchone()[0] == "zoe quinn"
+
+
+def test_failed_begin_keeps_the_original_error(discharge_db):
+    holder = sqlite3.connect(discharge_db, isolation_level=None)
+    holder.execute("BEGIN IMMEDIATE")
+    conn = sqlite3.connect(discharge_db, isolation_level=None, timeout=0)
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            migrate(conn)
+    finally:
+        holder.execute("ROLLBACK")
+    assert get_schema_version(conn) == 0
+
+
+def test_normalize_name():
+    assert normalize_name("  Grace LEE ") == "grace lee"
+
+
+def test_name_trigrams_are_distinct_and_ordered():
+    assert name_trigrams("Ann  Anna") == ["ann", "nn ", "n a", " an", "nna"]
+    assert name_trigrams("Al") == []
+
+
+def test_search_by_name_tolerates_typos(discharge_db):
+    results = PatientLookup(discharge_db).search_by_name("Robret Brwon")
+    assert results[0]["patient_name"] == "Robert Brown"
+    assert results[0]["score"] < 1
+    assert [r["score"] for r in results] == sorted((r["score"] for r in results), reverse=True)
+
+
+def test_search_by_name_matches_one_part_of_the_name(discharge_db):
+    results = PatientLookup(discharge_db).search_by_name("martinez")
+    assert results[0]["patient_name"] == "Eva Martinez"
+    assert results[0]["score"] == 1.0
+
+
+def test_search_by_name_finds_rows_added_after_migration(discharge_db):
+    lookup = PatientLookup(discharge_db)
+    lookup.get_connection().execute(
+        "INSERT INTO discharge_summaries (patient_name, discharge_date, primary_diagnosis) "
+        "VALUES ('Xiomara Quetzal', '2024-05-01', 'CKD')"
+    )
+    assert lookup.search_by_name("Xiomara Quetzl")[0]["patient_name"] == "Xiomara Quetzal"
+
+
+def test_search_by_name_without_a_match(discharge_db):
+    lookup = PatientLookup(discharge_db)
+    assert lookup.search_by_name("Zz") == []
+    assert lookup.search_by_name("Qqqqq Vvvvv") == []
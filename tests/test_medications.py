@@ -0,0 +1,39 @@
+from patient_data.lookup import PatientLookup
+from patient_data.medications import normalize_drug, parse_medication, parse_medications
+
+
+def test_parse_medication():
+    assert parse_medication("Metformin 500mg twice daily") == {
+        "drug": "Metformin", "dose": "500mg", "frequency": "twice daily", "raw": "Metformin 500mg twice daily",
+    }
+    assert parse_medication("Erythropoietin (Procrit) 4000 units weekly")["drug"] == "Erythropoietin (Procrit)"
+    assert parse_medication("Warfarin (dose per INR protocol)")["dose"] == "dose per INR protocol"
+
+
+def test_parse_medications_keeps_thousands_separators():
+    assert [m["dose"] for m in parse_medications("Vitamin D 50,000 units weekly, Aspirin 81mg daily")] == [
+        "50,000 units", "81mg",
+    ]
+
+
+def test_normalize_drug_drops_brand():
+    assert normalize_drug("Erythropoietin (Procrit)") == "erythropoietin"
+
+
+def test_record_medications_are_parsed(discharge_db):
+    lookup = PatientLookup(discharge_db)
+    record = lookup.fetch_by_name("alice johnson")
+    assert record["medications"] == [
+        {"drug": "Metformin", "dose": "500mg", "frequency": "twice daily"},
+        {"drug": "Insulin Glargine", "dose": "10 units", "frequency": "nightly"},
+    ]
+    assert "Alice Johnson" in [p["patient_name"] for p in lookup.patients_on("METFORMIN")]
+
+
+def test_edited_medications_are_resynced(discharge_db):
+    lookup = PatientLookup(discharge_db)
+    lookup.fetch_by_name("Alice Johnson")
+    lookup.get_connection().execute(
+        "UPDATE discharge_summaries SET medications = 'Ramipril 5mg daily' WHERE patient_name = 'Alice Johnson'"
+    )
+    assert [m["drug"] for m in lookup.fetch_by_name("Alice Johnson")["medications"]] == ["Ramipril"]
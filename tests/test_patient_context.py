@@ -0,0 +1,30 @@
+from patient_data.lookup import PATIENT_COLUMNS, PatientLookup
+from rag.patient_context import render_patient_documents
+
+
+def add_discharge(lookup, **values):
+    row = dict.fromkeys(PATIENT_COLUMNS, "")
+    row.update(values)
+    return lookup.get_connection().execute(
+        f"INSERT INTO discharge_summaries ({', '.join(PATIENT_COLUMNS)}) "
+        f"VALUES ({', '.join('?' for _ in PATIENT_COLUMNS)})", [row[c] for c in PATIENT_COLUMNS]
+    ).lastrowid
+
+
+def test_lookup_returns_latest_discharge(discharge_db):
+    lookup = PatientLookup(discharge_db)
+    first = lookup.fetch_by_name("Alice Johnson")
+    readmission = add_discharge(lookup, patient_name="Alice Johnson", discharge_date="2099-01-01",
+                                primary_diagnosis="Acute Kidney Injury", medications="Furosemide 40mg daily")
+    latest = lookup.fetch_by_name("alice johnson")
+    assert latest["discharge_id"] == readmission != first["discharge_id"]
+    assert [m["drug"] for m in latest["medications"]] == ["Furosemide"]
+
+
+def test_sections_are_tagged_with_their_discharge(discharge_db):
+    lookup = PatientLookup(discharge_db)
+    record = lookup.fetch_by_name("Alice Johnson")
+    documents = render_patient_documents(record["discharge_id"], record)
+    assert {metadata["discharge_id"] for _, _, metadata in documents} == {record["discharge_id"]}
+    medications = next(text for _, text, metadata in documents if metadata["section"] == "Medications")
+    assert medications == "Discharge medications: Metformin 500mg twice daily; Insulin Glargine 10 units nightly"
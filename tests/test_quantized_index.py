@@ -0,0 +1,57 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from rag import quantized_index, runtime
+from rag.quantized_index import FORMAT_VERSION, QuantizedIndex, get_quantized_index
+
+
+def write_index(index_dir, vectors, collection_version):
+    """An export as export_index writes it, from float vectors."""
+    os.makedirs(index_dir, exist_ok=True)
+    vectors = np.asarray(vectors, dtype="float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    np.save(os.path.join(index_dir, "vectors.npy"), np.round(vectors / scales[:, None]).astype("int8"))
+    np.save(os.path.join(index_dir, "scales.npy"), scales.astype("float32"))
+    db = sqlite3.connect(os.path.join(index_dir, "chunks.sqlite3"))
+    db.execute("CREATE TABLE chunks (row INTEGER PRIMARY KEY, chunk_id TEXT, document TEXT, metadata TEXT)")
+    db.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?)",
+                   [(i, f"chunk-{i}", f"text {i}", json.dumps({"page": i})) for i in range(len(vectors))])
+    db.commit()
+    db.close()
+    with open(os.path.join(index_dir, "index.json"), "w") as f:
+        json.dump({"format_version": FORMAT_VERSION, "count": len(vectors), "dimension": vectors.shape[1],
+                   "collection_version": collection_version, "exported_at": 0}, f)
+
+
+def test_search_matches_exact_ranking(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 32))
+    write_index(str(tmp_path), vectors, None)
+    index = QuantizedIndex(str(tmp_path))
+    query = rng.normal(size=32)
+
+    exact = np.argsort(-(vectors / np.linalg.norm(vectors, axis=1, keepdims=True)) @ query)[:5]
+    hits = [row for row, _ in index.search_vector(query, k=5)]
+    assert len(set(hits) & set(exact.tolist())) >= 4
+    assert index.chunks(hits[:1])[0] == (f"chunk-{hits[0]}", f"text {hits[0]}", {"page": hits[0]})
+
+
+def test_stale_index_is_not_served(tmp_path, monkeypatch):
+    rag_db = tmp_path / "rag_db"
+    rag_db.mkdir()
+    (rag_db / "chroma.sqlite3").write_bytes(b"")
+    monkeypatch.setattr(runtime, "PERSIST_DIRECTORY", str(rag_db))
+    monkeypatch.setattr(quantized_index, "_index", None)
+    index_dir = str(tmp_path / "quantized")
+
+    write_index(index_dir, np.eye(4), runtime.collection_version())
+    assert get_quantized_index(index_dir) is not None
+
+    os.utime(rag_db / "chroma.sqlite3", ns=(1, 1))  # collection changed after the export
+    assert get_quantized_index(index_dir) is None
@@ -0,0 +1,62 @@
+import threading
+
+from result_store import MemoryResultStore, SQLiteResultStore, create_result_store
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryResultStore(max_items=2)
+    store.set("a", {"response": "A"})
+    store.set("b", {"response": "B"})
+    store.get("a")
+    store.set("c", {"response": "C"})
+    assert store.get("b") is None
+    assert store.get("a") == {"response": "A"} and store.get("c") == {"response": "C"}
+    assert store.stats()["evictions"] == 1
+
+
+def test_memory_store_is_bounded_by_bytes():
+    store = MemoryResultStore(max_bytes=300)
+    for i in range(10):
+        store.set(f"r{i}", {"response": "x" * 100})
+    assert len(store) == 2 and store.stats()["bytes"] <= 300
+    store.set("r9", {"response": "short"})  # replacing frees the old size
+    assert store.get("r9") == {"response": "short"}
+
+
+def test_memory_store_expires_results():
+    store = MemoryResultStore(ttl=-1)
+    store.set("a", {"response": "A"})
+    assert store.get("a") is None and len(store) == 0
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    writer, reader = SQLiteResultStore(path), SQLiteResultStore(path)
+    writer.set("a", {"response": "A", "success": True})
+    assert reader.get("a") == {"response": "A", "success": True}
+
+    # Each thread uses its own connection to the same file
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(reader.get("a")))
+    thread.start()
+    thread.join()
+    assert seen == [{"response": "A", "success": True}]
+
+
+def test_sqlite_store_expires_and_purges(tmp_path):
+    path = str(tmp_path / "results.sqlite3")
+    expired = SQLiteResultStore(path, ttl=-1, purge_interval=3600)
+    expired.set("first", {"response": "A"})  # the first write purges
+    expired.set("old", {"response": "A"})
+    assert expired.get("old") is None and len(expired) == 1
+
+    store = SQLiteResultStore(path, purge_interval=0)
+    store.set("new", {"response": "B"})  # purges everything already expired
+    assert len(store) == 1 and store.get("new") == {"response": "B"}
+
+
+def test_store_is_selected_by_environment(tmp_path, monkeypatch):
+    assert isinstance(create_result_store(), MemoryResultStore)
+    monkeypatch.setenv("RESULT_STORE", "sqlite")
+    monkeypatch.setenv("RESULT_STORE_PATH", str(tmp_path / "results.sqlite3"))
+    assert isinstance(create_result_store(), SQLiteResultStore)
@@ -0,0 +1,60 @@
+import pytest
+
+from router import classify, render_answer
+
+
+@pytest.mark.parametrize("question, intent", [
+    ("What medications should I take?", "medications"),
+    ("Can you list my meds", "medications"),
+    ("When is my follow-up appointment?", "follow_up"),
+    ("What diet do I need to follow?", "dietary_restrictions"),
+    ("What are the warning signs?", "warning_signs"),
+    ("Why was I admitted?", "diagnosis"),
+    ("Why was I in the hospital", "diagnosis"),
+    ("What is my diagnosis?", "diagnosis"),
+    ("Hi, can you tell me my medications please?", "medications"),
+    ("When is my next appointment", "follow_up"),
+    ("What should I watch out for?", "warning_signs"),
+    ("What should I do at home?", "discharge_instructions"),
+])
+def test_field_questions_take_the_fast_path(question, intent):
+    assert classify(question) == intent
+
+
+@pytest.mark.parametrize("question", [
+    "What medications should I avoid?",
+    "Which foods should I avoid?",
+    "Should I stop taking my pills?",
+    "When can I stop my medications?",
+    "What can I take instead of ibuprofen?",
+    "Which medicines should I not take together?",
+    "Why do I need this medication?",
+    "Can I drink alcohol with my medications?",
+    "My medications make me dizzy",
+    "What are my medications and when is my follow-up?",
+])
+def test_open_questions_go_to_the_crew(question):
+    assert classify(question) is None
+
+
+@pytest.mark.parametrize("question", [
+    "Is my medication causing this rash?",
+    "Could my pills be why I am so tired?",
+    "I get headaches since starting the new meds",
+    "Does my diet affect my blood pressure?",
+    "Is it normal to feel tired after my follow-up appointment?",
+    "My ankles are swollen, is that one of the warning signs?",
+    "Why is my diagnosis causing back pain?",
+    "What happens if I skip my medications?",
+])
+def test_questions_that_mention_a_field_go_to_the_crew(question):
+    assert classify(question) is None
+
+
+def test_medications_are_rendered_from_parsed_list():
+    record = {"patient_name": "Alice Johnson", "medications": [
+        {"drug": "Metformin", "dose": "500mg", "frequency": "twice daily"},
+        {"drug": "Insulin Glargine", "dose": "10 units", "frequency": None},
+    ]}
+    answer = render_answer("medications", record)
+    assert "- Metformin 500mg twice daily\n- Insulin Glargine 10 units\n" in answer
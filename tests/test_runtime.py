@@ -0,0 +1,128 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+HEAVY_MODULES = ("sentence_transformers", "chromadb", "langchain.embeddings", "langchain.vectorstores")
+
+
+def imported_after(*modules) -> dict:
+    """Import modules in a fresh interpreter and report what got loaded."""
+    script = f"""
+import json, sys
+sys.path[:0] = [{ROOT + '/src'!r}, {ROOT + '/src/agent_folder'!r}]
+for name in {list(modules)!r}:
+    __import__(name)
+from rag import runtime
+print(json.dumps({{
+    "heavy": [m for m in {list(HEAVY_MODULES)!r} if m in sys.modules],
+    "model_loaded": runtime.is_loaded(),
+    "vectorstores": len(runtime._vectorstores),
+}}))
+"""
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_importing_retrieval_modules_loads_nothing():
+    loaded = imported_after("rag.runtime", "rag.hybrid", "rag.retrieve", "rag.patient_context")
+    assert loaded == {"heavy": [], "model_loaded": False, "vectorstores": 0}
+
+
+def test_importing_agent_tools_loads_nothing():
+    pytest.importorskip("crewai_tools")
+    loaded = imported_after("tools")
+    assert loaded["model_loaded"] is False and loaded["vectorstores"] == 0
+
+
+def test_first_search_loads_model_and_store_once(tmp_path, monkeypatch):
+    embeddings = pytest.importorskip("langchain.embeddings")
+    pytest.importorskip("chromadb")
+    from rag import runtime
+
+    loads = []
+
+    def load_model(model_name):
+        loads.append(model_name)
+        return embeddings.FakeEmbeddings(size=16)
+
+    monkeypatch.setattr(embeddings, "HuggingFaceEmbeddings", load_model)
+    monkeypatch.setattr(runtime, "_embedding_model", None)
+    monkeypatch.setattr(runtime, "_vectorstores", {})
+    store_dir = str(tmp_path / "rag_db")
+    from langchain.vectorstores import Chroma
+    Chroma.from_texts(["Limit potassium.", "Check your weight daily."], embeddings.FakeEmbeddings(size=16),
+                      persist_directory=store_dir)
+    assert loads == [] and not runtime.is_loaded()
+
+    runtime.similarity_search("potassium", k=1, persist_directory=store_dir)
+    runtime.similarity_search("weight", k=1, persist_directory=store_dir)
+    assert runtime.is_loaded()
+    assert loads == [runtime.EMBEDDING_MODEL_NAME]
+    assert list(runtime._vectorstores) == [store_dir]
+
+
+class RecordingModel:
+    def __init__(self):
+        self.embedded = []
+
+    def embed_query(self, text):
+        self.embedded.append(text)
+        return [float(len(text))]
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text))] for text in texts]
+
+
+@pytest.fixture
+def recording_model(monkeypatch):
+    from rag import runtime
+    from rag.cache import TTLCache
+
+    model = RecordingModel()
+    monkeypatch.setattr(runtime, "get_embedding_model", lambda: model)
+    monkeypatch.setattr(runtime, "embedding_cache", TTLCache(max_size=16, ttl=60))
+    return model
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    from rag.cache import TTLCache
+
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the oldest
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1 and cache.stats()["hits"] == 3
+
+
+def test_ttl_cache_expires_entries():
+    from rag.cache import TTLCache
+
+    cache = TTLCache(max_size=2, ttl=-1)
+    cache.set("a", 1)
+    assert cache.get("a", "gone") == "gone"
+    assert len(cache) == 0 and cache.stats()["misses"] == 1
+
+
+def test_embed_query_embeds_original_text_and_caches_normalized(recording_model):
+    from rag import runtime
+
+    first = runtime.embed_query("Can I eat Bananas?")
+    assert runtime.embed_query("can i eat bananas") == first
+    assert recording_model.embedded == ["Can I eat Bananas?"]
+
+
+def test_embed_queries_batches_misses_with_original_text(recording_model):
+    from rag import runtime
+
+    runtime.embed_query("What is eGFR?")
+    embeddings = runtime.embed_queries(["what is egfr", "Is CKD curable?", "is ckd curable", "Dialysis?"])
+    assert recording_model.embedded == ["What is eGFR?", "Is CKD curable?", "Dialysis?"]
+    assert embeddings[1] == embeddings[2] == [15.0]
@@ -0,0 +1,65 @@
+from semantic_cache import SemanticAnswerCache, personalize, templatize
+
+# Shape of a session record: the database tool's "data" object
+RECORD = {
+    "patient_name": "Maria Lopez",
+    "discharge_date": "2024-03-02",
+    "primary_diagnosis": "Chronic Kidney Disease Stage 3",
+    "medications": [
+        {"drug": "Lisinopril", "dose": "10mg", "frequency": "once daily"},
+        {"drug": "Furosemide", "dose": "40mg", "frequency": "twice daily"},
+    ],
+    "dietary_restrictions": "Low sodium (2g/day), fluid restriction 1.5L/day",
+    "follow_up": "Nephrology clinic in 2 weeks",
+    "warning_signs": "Swelling, shortness of breath",
+    "discharge_instructions": "Weigh yourself daily",
+}
+
+OTHER = dict(RECORD, patient_name="John Smith", follow_up="Nephrology clinic in 1 week",
+             medications=[{"drug": "Metformin", "dose": "500mg", "frequency": "twice daily"}])
+
+
+def answer(text):
+    return {"answer": text, "citations": [], "warnings": [], "follow_up": []}
+
+
+def test_medication_specific_answer_is_not_templatized():
+    assert templatize(answer("Keep taking your lisinopril 10mg each morning."), RECORD) is None
+
+
+def test_medication_specific_answer_is_not_cached():
+    cache = SemanticAnswerCache(prompt_version="test")
+    stored = cache.store(RECORD["primary_diagnosis"], "Can I take my blood pressure pill with food?",
+                         answer("Yes, Furosemide can be taken with or without food."), RECORD)
+    assert stored is False
+    assert cache.stats()["entries"] == 0
+
+
+def test_general_answer_is_personalized_for_another_patient():
+    template = templatize(answer("Maria, your next visit is: Nephrology clinic in 2 weeks."), RECORD)
+    assert template is not None
+    assert "Maria" not in template["answer"]
+    assert personalize(template, OTHER)["answer"] == "John, your next visit is: Nephrology clinic in 1 week."
+
+
+def test_name_inside_other_words_is_left_alone():
+    ren = dict(RECORD, patient_name="Ren Ng")
+    template = templatize(answer("Ren, normal renal function matters, as it does for children."), ren)
+    assert template["answer"] == "{{first_name}}, normal renal function matters, as it does for children."
+    assert personalize(template, OTHER)["answer"] == "John, normal renal function matters, as it does for children."
+
+
+def test_short_first_name_is_never_substituted():
+    al = dict(RECORD, patient_name="Al Ng")
+    template = templatize(answer("Normal renal function is the goal."), al)
+    assert personalize(template, OTHER)["answer"] == "Normal renal function is the goal."
+    # Addressed by a name too short to swap safely: not shared at all
+    assert templatize(answer("Al, normal renal function is the goal."), al) is None
+
+
+def test_field_values_are_matched_as_whole_phrases():
+    record = dict(RECORD, warning_signs="Swelling")
+    text = "Swelling of the ankles is common; see Swellington Clinic."
+    assert templatize(answer(text), record)["answer"] == (
+        "{{warning_signs}} of the ankles is common; see Swellington Clinic."
+    )
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from session import SessionManager
+
+RECORD = {"patient_name": "Alice Johnson", "primary_diagnosis": "Type 2 Diabetes", "medications": []}
+
+
+def fake_database_tool(patient_name):
+    if patient_name.lower() == "alice johnson":
+        return json.dumps({"status": "success", "data": RECORD})
+    return json.dumps({
+        "status": "error",
+        "message": f"No record found for patient '{patient_name}'.",
+        "candidates": [{"patient_name": "Alice Johnson", "score": 0.93}],
+    })
+
+
+def test_session_is_fetched_once():
+    calls = []
+    manager = SessionManager(fetch_record=lambda name: calls.append(name) or fake_database_tool(name))
+    first, _ = manager.get_or_create("Alice Johnson")
+    second, _ = manager.get_or_create("  alice johnson ")
+    assert first is second and len(calls) == 1
+
+
+def test_unknown_patient_keeps_candidates():
+    session, error = SessionManager(fetch_record=fake_database_tool).get_or_create("Alise Jonson")
+    assert session is None
+    assert error["message"].startswith("No record found")
+    assert [c["patient_name"] for c in error["candidates"]] == ["Alice Johnson"]
+
+
+def test_each_kickoff_gets_unformatted_tasks(monkeypatch):
+    pytest.importorskip("crewai")
+    pytest.importorskip("crewai_tools")
+    monkeypatch.setenv("LLM_BACKEND", "stub")
+    import crew
+
+    manager = SessionManager(fetch_record=fake_database_tool)
+    session, _ = manager.get_or_create("Alice Johnson")
+
+    first = crew.get_chat_crew()
+    # What kickoff does first: format every task in place with the inputs
+    first._interpolate_inputs(session.crew_inputs("Can I eat bananas?"))
+    assert "Can I eat bananas?" in first.tasks[0].description
+
+    second = crew.get_chat_crew()
+    assert second.agents[0] is first.agents[0]
+    assert "{user_query}" in second.tasks[0].description
+    second._interpolate_inputs(session.crew_inputs("Is my medication causing this rash?"))
+    assert "rash" in second.tasks[0].description and "bananas" not in second.tasks[0].description
@@ -0,0 +1,72 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import tracing
+from tracing import Tracer, _usage_from_result
+
+
+@pytest.fixture
+def tracer(tmp_path, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", True)
+    return Tracer(path=str(tmp_path / "traces.jsonl"))
+
+
+def read_spans(tracer):
+    with open(tracer.path) as f:
+        return {span["name"]: span for span in map(json.loads, f)}
+
+
+def test_spans_nest_and_roll_up_tokens(tracer):
+    with tracer.span("process", kind="request", patient_name="Alice Johnson"):
+        with tracer.span("crew_kickoff", kind="workflow"):
+            for tokens in (100, 50):
+                llm = tracer.start_span("agent_llm", kind="llm", iteration=tracer.next_iteration())
+                tracer.end_span(llm, input_tokens=tokens, output_tokens=10)
+
+    spans = read_spans(tracer)
+    request, workflow, llm = spans["process"], spans["crew_kickoff"], spans["agent_llm"]
+    assert request["parentSpanId"] == "" and workflow["parentSpanId"] == request["spanId"]
+    assert llm["parentSpanId"] == workflow["spanId"]
+    assert {llm["traceId"], workflow["traceId"]} == {request["traceId"]}
+    attributes = {a["key"]: a["value"] for a in request["attributes"]}
+    assert (attributes["input_tokens"], attributes["output_tokens"], attributes["llm_calls"]) == (150, 20, 2)
+    assert attributes["patient_name"] == "Alice Johnson"
+
+
+def test_failed_span_is_recorded_and_closes_children(tracer):
+    with pytest.raises(ValueError):
+        with tracer.span("process", kind="request"):
+            tracer.start_span("never_closed", kind="tool")
+            raise ValueError("boom")
+
+    assert read_spans(tracer)["process"]["status"] == {"code": "ERROR", "message": "boom"}
+    assert tracer.current_trace_id() is None
+    assert tracer.summary()["request:process"]["errors"] == 1
+
+
+def test_summary_reports_mean_and_p95(tracer):
+    for ms in range(1, 101):
+        span = {"name": "search", "kind": "tool", "attributes": {}}
+        tracer._record(span, ms / 1000, None)
+
+    summary = tracer.summary()["tool:search"]
+    assert (summary["count"], summary["errors"]) == (100, 0)
+    assert summary["mean_ms"] == 50.5
+    assert summary["p95_ms"] == 96.0
+
+
+def test_disabled_tracing_records_nothing(tracer, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+    with tracer.span("process", kind="request") as span:
+        assert span == {}
+    assert tracer.summary() == {}
+
+
+def test_token_usage_from_either_provider_field():
+    openai_style = SimpleNamespace(llm_output={"token_usage": {"prompt_tokens": 12, "completion_tokens": 3}})
+    gemini_style = SimpleNamespace(llm_output=None, generations=[[SimpleNamespace(
+        message=SimpleNamespace(usage_metadata={"input_tokens": 7, "output_tokens": 2}))]])
+    assert _usage_from_result(openai_style) == {"input_tokens": 12, "output_tokens": 3}
+    assert _usage_from_result(gemini_style) == {"input_tokens": 7, "output_tokens": 2}
@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("requests")
+
+from serp_stub import SerpStubServer
+from web_search_support import SearchCache, SearchError, SerpClient, TokenBucket
+
+
+@pytest.fixture
+def serp_server():
+    with SerpStubServer() as server:
+        yield server
+
+
+def make_client(server, tmp_path, **kwargs):
+    return SerpClient("stub", server.url, timeout=2.0, cache_path=str(tmp_path / "cache.db"), **kwargs)
+
+
+def test_token_bucket_allows_a_burst_then_waits():
+    bucket = TokenBucket(rate=20, capacity=3)
+    assert all(bucket.acquire(timeout=0) for _ in range(3))
+    assert not bucket.acquire(timeout=0)
+    start = time.monotonic()
+    assert bucket.acquire(timeout=1)
+    assert time.monotonic() - start >= 0.03  # one token refills in 1/20 s
+
+
+def test_token_bucket_is_shared_between_threads():
+    bucket = TokenBucket(rate=0.001, capacity=5)
+    granted = []
+    threads = [threading.Thread(target=lambda: granted.append(bucket.acquire(timeout=0.05))) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert granted.count(True) == 5
+
+
+def test_search_cache_normalizes_keys_and_expires(tmp_path):
+    cache = SearchCache(str(tmp_path / "cache.db"), ttl=60)
+    assert SearchCache.make_key("e", "  Kidney   Stones ", 5) == SearchCache.make_key("e", "kidney stones", 5)
+    cache.set("k", {"organic_results": []})
+    assert cache.get("k") == {"organic_results": []}
+
+    expired = SearchCache(str(tmp_path / "cache.db"), ttl=-1)
+    assert expired.get("k") is None
+    assert expired.purge_expired() == 1
+    assert cache.get("k") is None
+
+
+def test_repeated_search_is_served_from_cache(serp_server, tmp_path):
+    client = make_client(serp_server, tmp_path)
+    data, cached = client.search("low sodium diet")
+    assert not cached and len(data["organic_results"]) == 5
+    data, cached = client.search("Low  sodium DIET")
+    assert cached and serp_server.request_count == 1
+
+
+def test_searches_reuse_one_pooled_connection(serp_server, tmp_path):
+    client = make_client(serp_server, tmp_path)
+    for query in ("dialysis", "potassium", "edema"):
+        client.search(query)
+    client.session.close()
+    assert serp_server.request_count == 3
+    assert serp_server.connection_count == 1
+
+
+def test_rate_limited_search_raises(serp_server, tmp_path):
+    client = make_client(serp_server, tmp_path, requests_per_second=0.001, burst=1)
+    client.search("first")
+    client.timeout = 0  # don't wait for a token
+    with pytest.raises(SearchError, match="rate limit"):
+        client.search("second")
+    assert serp_server.request_count == 1
+
+
+def test_http_errors_are_not_cached(serp_server, tmp_path):
+    client = make_client(serp_server, tmp_path)
+    serp_server.status = 503
+    with pytest.raises(SearchError, match="HTTP 503: Stub failure"):
+        client.search("creatinine")
+
+    serp_server.status = 200
+    data, cached = client.search("creatinine")
+    assert not cached and data["organic_results"]
+    assert serp_server.request_count == 2